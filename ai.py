@@ -1,4 +1,18 @@
+import json
+import os
+import time
+import warnings
+import zlib
+from array import array
+
+import endgame
 import game_rules as do
+import movegen
+import symmetry
+from game_rules import POW3, WIN_LINES, board_full, check_win   # pure helpers on cell lists, same for every backend
+from transposition import TranspositionTable, EXACT, LOWER, UPPER
+from move_ordering import MoveOrderer
+from book import BOOK_PATH, OpeningBook
 
 
 #POV + big terminal scores 
@@ -20,10 +34,92 @@ POS_CORNER = 1  # owning mini corners
 MICRO_FORCED_MULT = 1.5  # weight micro more on the forced mini
 MICRO_SCALE = 1.0        # overall multiplier for micro part
 
+WEIGHT_NAMES = ("W_CLAIM", "W_TWO", "W_ONE", "WM_TWO", "WM_ONE", "WM_FORK",
+                "POS_CENTER", "POS_CORNER", "MICRO_FORCED_MULT", "MICRO_SCALE")
+DEFAULT_WEIGHTS = {name: globals()[name] for name in WEIGHT_NAMES}   # the hand-picked values above
+WEIGHTS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "weights.json")   # tune.py output, loaded at import
+
+#Lookup tables (see micro_table / macro_table)
+MICRO_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache")
+_micro_table = None
+_macro_table = None
+_tables_by_weights = {}   # weight values -> (micro, macro) tables, kept by use_weights
+_status_tables = None
+INCREMENTAL_EVAL = True  # searches attach an IncrementalEval to the state
+EVAL_DEBUG = False       # cross-check the incremental evaluator against a full recompute
+
+#Search
+TT_MB = 64               # memory cap for the shared transposition table
+TT = TranspositionTable(TT_MB)
+ORDERER = MoveOrderer()  # shared killer/history tables
+SYMMETRY_PLIES = 2       # skip mirror-image moves this close to the root (see symmetry.unique_moves)
+
+#Endgame solver (see endgame.py)
+ENDGAME_CELLS = 18       # solve exactly once this few empty playable cells are left (0 = never)
+ENDGAME_SOLVER = endgame.Solver()
+
+#Opening book (see book.py)
+USE_BOOK = True
+_book = None             # OpeningBook, or False once we know there's no usable book file
+
+
+USE_PVS = True           # best_move_* search with negamax + PVS instead of minimax
+NULL_WINDOW = 1e-6       # width of PVS scout windows (scores aren't always integers)
+ASPIRATION_WINDOW = 32   # iterative deepening starts each depth at previous score +/- this (0 = off)
+                         # about one board claim; at 16 middlegame windows failed often enough to cost
+                         # more nodes than plain minimax (bench.py pvs, phase totals)
+
+DEADLINE_CHECK_MASK = 63  # look at the clock every 64 nodes
+
+
+class SearchTimeout(Exception):
+    """Raised inside minimax when the search deadline has passed or it was asked to stop."""
+
+
+class SearchContext:
+    """Per-search state threaded through minimax (cache, counters, limits, PV)."""
+
+    def __init__(self, tt=None, deadline=None, orderer=None, stop=None, instrument=None) -> None:
+        self.tt = tt
+        self.orderer = orderer
+        self.instrument = instrument  # SearchStats, or None for no instrumentation
+        self.deadline = deadline    # time.perf_counter() value, or None for no limit
+        self.stop = stop            # threading.Event that cancels the search when set
+        self.nodes = 0
+        self.root_depth = 0
+        self.depth_reached = 0      # last fully completed depth
+        self.pv_table = [[] for _ in range(82)]   # pv_table[ply] = best line from that ply
+        self.pv = []                # principal variation of the last completed iteration
+        self.pv_moves = {}          # hash -> PV move, used to order the next iteration
+        self.attached = False       # True if this search attached state.tracker itself
+        self.proven = None          # (result, plies) for the side to move if the endgame solver decided
+
+    def set_pv(self, state, pv):
+        """Remember `pv` (played from `state`) so the next iteration searches it first."""
+        self.pv = pv
+        self.pv_moves = {}
+        n = 0
+        for b, c in pv:
+            self.pv_moves[state.hash] = (b, c)
+            do.apply_move(state, b, c, state.current_turn)
+            n += 1
+        for _ in range(n):
+            do.undo_move(state)
+
+    def stats(self):
+        out = {"nodes": self.nodes, "depth": self.depth_reached}
+        if self.tt is not None:
+            out.update(tt_probes=self.tt.probes, tt_hits=self.tt.hits, tt_hit_rate=self.tt.hit_rate())
+        return out
+
+last_search = None   # SearchContext of the most recent best_move_minimax call
+
 
 def terminal_value(state):
     """Check if the game is over and return the score."""
-    win = do.check_win(state.main_board)
+    if state.tracker is not None:
+        return state.tracker.terminal(state)
+    win = check_win(state.main_board)
     if win == AI:
         return True, +INF
     elif win == HUMAN:
@@ -33,13 +129,56 @@ def terminal_value(state):
     return False, 0
 
 def legal_moves(state):
-    moves = []
-    for b in do.playable_boards_list(state):
-        for c in range(9):
-            if state.boards[b][c] == 0:
-                moves.append((b, c))
+    return movegen.legal_moves(state)
+
+def _ordered_moves(state, ctx, ply, instr, skip=()):
+    """Every legal move of a search node, symmetry-pruned near the root and ordered, minus `skip`."""
+    if instr is None:
+        moves = legal_moves(state)
+    else:
+        t0 = time.perf_counter()
+        moves = legal_moves(state)
+        instr.movegen_time += time.perf_counter() - t0
+        instr.movegen_calls += 1
+    if ctx is None:
+        return moves
+    if ply < SYMMETRY_PLIES:
+        moves = symmetry.unique_moves(state, moves)
+    if ctx.orderer is not None:
+        moves = ctx.orderer.order(state, moves, ply)
+    if skip:
+        moves = [m for m in moves if m not in skip]
     return moves
 
+def _staged_moves(state, ctx, ply, instr, first):
+    yield from first
+    # only reached if none of `first` caused a cutoff (the state is back at this node by then)
+    yield from _ordered_moves(state, ctx, ply, instr, first)
+
+def search_moves(state, ctx, ply, instr=None, tt_move=None):
+    """
+    The moves of a search node in search order: the previous iteration's PV
+    move, then the TT move, then the rest by the move orderer. The PV / TT
+    moves only need a legality check, so they are tried before anything else
+    is generated and a cutoff on one of them skips move generation and
+    ordering for the node (the rest come from a lazy generator).
+    """
+    first = []
+    pv_move = ctx.pv_moves.get(state.hash) if ctx is not None and ctx.pv_moves else None
+    if ctx is not None and ply < SYMMETRY_PLIES:
+        # symmetry pruning may drop either move, so build the full list here
+        moves = _ordered_moves(state, ctx, ply, instr)
+        for m in (pv_move, tt_move):
+            if m is not None and m not in first and m in moves:
+                first.append(m)
+        return first + [m for m in moves if m not in first] if first else moves
+    for m in (pv_move, tt_move):
+        if m is not None and m not in first and do.is_legal_move(state, m[0], m[1]):
+            first.append(m)
+    if not first:
+        return _ordered_moves(state, ctx, ply, instr)
+    return _staged_moves(state, ctx, ply, instr, first)
+
 def evaluate_nonterminal(state):
     main_board = state.main_board
 
@@ -52,7 +191,7 @@ def evaluate_nonterminal(state):
     ai_two = hum_two = 0
     ai_one = hum_one = 0
 
-    for a, b, c in do.WIN_LINES:
+    for a, b, c in WIN_LINES:
         line = (main_board[a], main_board[b], main_board[c])
         empty = line.count(0)
         ai_n = line.count(AI)
@@ -83,7 +222,7 @@ def score_microBoard(cells):
     ai_two = hum_two = ai_one = hum_one = 0
 
     # line patterns
-    for a, b, c in do.WIN_LINES:
+    for a, b, c in WIN_LINES:
         line  = (cells[a], cells[b], cells[c])
         empty = line.count(0)
         ai_n  = line.count(AI)
@@ -111,7 +250,7 @@ def score_microBoard(cells):
             old = cells[idx]
             cells[idx] = player
             count = 0
-            for a, b, c in do.WIN_LINES:
+            for a, b, c in WIN_LINES:
                 line  = (cells[a], cells[b], cells[c])
                 if line.count(player) == 2 and line.count(0) == 1:
                     count += 1
@@ -140,13 +279,191 @@ def score_microBoard(cells):
         pos
     )
 
+def decode_micro_key(key):
+    """Cells of a mini-board from its base-3 key (digit 1 = X, 2 = O)."""
+    cells = []
+    for _ in range(9):
+        key, d = divmod(key, 3)
+        cells.append(HUMAN if d == 1 else (AI if d == 2 else 0))
+    return cells
+
+def _table_path(name, weights):
+    sig = f"{zlib.crc32(repr(weights).encode()):08x}"
+    return os.path.join(MICRO_CACHE_DIR, f"{name}_{sig}.bin")
+
+def _load_table(name, weights, build):
+    """Load a 3^9 table of doubles from MICRO_CACHE_DIR, or build it and try to save it."""
+    path = _table_path(name, weights)
+    table = array("d")
+    try:
+        with open(path, "rb") as f:
+            table.fromfile(f, 3 ** 9)
+    except (OSError, EOFError):
+        table = build()
+        try:
+            os.makedirs(MICRO_CACHE_DIR, exist_ok=True)
+            tmp = f"{path}.{os.getpid()}.tmp"
+            with open(tmp, "wb") as f:
+                table.tofile(f)
+            os.replace(tmp, path)
+        except OSError:
+            pass  # read-only checkout: just keep the table in memory
+    return table
+
+def build_micro_table():
+    """
+    score_microBoard for all 3^9 mini-boards, indexed by base-3 key.
+    Claimed (has a line) and full boards score 0, so evaluate_micro can sum
+    all nine boards without checking which ones are still open.
+    """
+    table = array("d", bytes(8 * 3 ** 9))
+    for key in range(3 ** 9):
+        cells = decode_micro_key(key)
+        if check_win(cells) != 0 or board_full(cells):
+            continue
+        table[key] = score_microBoard(cells)
+    return table
+
+def build_macro_table():
+    """evaluate_nonterminal for every main board, indexed by the same base-3 key."""
+    class _Main:
+        main_board = None
+    probe = _Main()
+    table = array("d", bytes(8 * 3 ** 9))
+    for key in range(3 ** 9):
+        probe.main_board = decode_micro_key(key)
+        table[key] = evaluate_nonterminal(probe)
+    return table
+
+def micro_table():
+    """The micro score table, loaded from MICRO_CACHE_DIR or built on first use."""
+    global _micro_table
+    if _micro_table is None:
+        _micro_table = _load_table("micro", (AI, WM_TWO, WM_ONE, WM_FORK, POS_CENTER, POS_CORNER),
+                                   build_micro_table)
+    return _micro_table
+
+def macro_table():
+    """evaluate_nonterminal for every main board (see build_macro_table)."""
+    global _macro_table
+    if _macro_table is None:
+        _macro_table = _load_table("macro", (AI, W_CLAIM, W_TWO, W_ONE), build_macro_table)
+    return _macro_table
+
+def status_tables():
+    """
+    Weight-independent tables over base-3 keys: (winner, done) where winner[key]
+    is 1 / -1 / 0 for a line of X / O / nobody and done[key] is 1 if the board
+    has a line or is full.
+    """
+    global _status_tables
+    if _status_tables is None:
+        winner = array("b", bytes(3 ** 9))
+        done = bytearray(3 ** 9)
+        for key in range(3 ** 9):
+            cells = decode_micro_key(key)
+            w = check_win(cells)
+            winner[key] = w
+            done[key] = 1 if w != 0 or board_full(cells) else 0
+        _status_tables = (winner, done)
+    return _status_tables
+
+def set_weights(**weights):
+    """
+    Change evaluation weights (e.g. set_weights(WM_FORK=10)). Use this rather than
+    assigning the module constants so the lookup table and shared caches are rebuilt.
+    """
+    global _micro_table, _macro_table
+    g = globals()
+    changed = False
+    for name, value in weights.items():
+        if name not in WEIGHT_NAMES:
+            raise ValueError(f"unknown weight {name!r}")
+        if g[name] != value:
+            g[name] = value
+            changed = True
+    if changed:
+        _micro_table = _macro_table = None
+        TT.clear()
+
+def use_weights(weights):
+    """
+    Switch to a complete weight set ({name: value} for all of WEIGHT_NAMES), for
+    callers that alternate between a few sets (selfplay). Does nothing if the
+    set is already active, and keeps the lookup tables built for every set
+    seen, so switching back doesn't rebuild them. Unlike set_weights it
+    leaves TT alone: give each weight set its own table.
+    """
+    global _micro_table, _macro_table
+    g = globals()
+    current = tuple(g[name] for name in WEIGHT_NAMES)
+    wanted = tuple(weights[name] for name in WEIGHT_NAMES)
+    if wanted == current:
+        return
+    if _micro_table is not None and _macro_table is not None:
+        _tables_by_weights[current] = (_micro_table, _macro_table)
+    g.update(zip(WEIGHT_NAMES, wanted))
+    _micro_table, _macro_table = _tables_by_weights.get(wanted, (None, None))
+
+def get_weights():
+    return {name: globals()[name] for name in WEIGHT_NAMES}
+
+def read_weights(path=WEIGHTS_PATH):
+    """
+    {name: value} from a weights file written by tune.py. ValueError on bad
+    JSON or unknown names, TypeError if it isn't an object of numbers.
+    """
+    with open(path) as f:
+        weights = json.load(f)
+    if not isinstance(weights, dict):
+        raise TypeError(f"{path}: expected a JSON object of weights")
+    unknown = set(weights) - set(WEIGHT_NAMES)
+    if unknown:
+        raise ValueError(f"{path}: unknown weights {sorted(unknown)}")
+    for name, value in weights.items():
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            raise TypeError(f"{path}: weight {name} is {value!r}, not a number")
+    return weights
+
+def load_weights(path=WEIGHTS_PATH):
+    """Set the weights from a tune.py weights file (names it doesn't list keep their value). Returns them."""
+    weights = read_weights(path)
+    set_weights(**weights)
+    return weights
+
+def load_weights_or_defaults(path=WEIGHTS_PATH):
+    """
+    load_weights, but a broken file only warns and leaves the hand-picked
+    DEFAULT_WEIGHTS in place (so a bad weights.json can't stop the game from starting).
+    """
+    try:
+        return load_weights(path)
+    except (ValueError, TypeError) as e:
+        warnings.warn(f"ignoring {path}, using the default weights: {e}")
+        set_weights(**DEFAULT_WEIGHTS)
+        return None
+
+if os.path.exists(WEIGHTS_PATH):
+    load_weights_or_defaults()
+
 def evaluate_micro(state):
+    """Micro score of all open boards: nine lookups into micro_table()."""
+    table = _micro_table or micro_table()
+    keys = state.micro_keys
+    total = sum(map(table.__getitem__, keys))
+    fb = state.forced_board
+    if fb is not None:
+        total += (MICRO_FORCED_MULT - 1) * table[keys[fb]]
+    return total
+
+def evaluate_micro_full(state):
+    """Reference version of evaluate_micro that scores every open board from scratch."""
     total = 0
     fb = state.forced_board
     for i in range(9):
         if state.main_board[i] != 0:
             continue
-        if do.board_full(state.boards[i]):
+        if board_full(state.boards[i]):
             continue
         m = score_microBoard(state.boards[i])
         if fb is not None and i == fb:
@@ -154,7 +471,77 @@ def evaluate_micro(state):
         total += m
     return total
 
+class IncrementalEval:
+    """
+    Running evaluation components, kept up to date by game_rules.apply_move /
+    undo_move while attached as state.tracker (see attach_incremental).
+
+    The macro part is one lookup on state.main_key. The micro part is a running
+    sum over all boards that changes by one table delta per move, plus the
+    forced-board bonus. With debug=True every value is checked against a full
+    recomputation.
+    """
+
+    def __init__(self, state, debug=False) -> None:
+        self.micro = micro_table()
+        self.macro = macro_table()
+        self.winner, self.done_table = status_tables()
+        self.debug = debug
+        keys = state.micro_keys
+        self.micro_sum = sum(self.micro[k] for k in keys)
+        self.done = sum(self.done_table[k] for k in keys)
+        self.stack = []
+
+    def on_apply(self, s, b, c):
+        self.stack.append((self.micro_sum, self.done))
+        key = s.micro_keys[b]
+        old = key - POW3[c] * (-s.current_turn % 3)   # the mover is the side not to move now
+        self.micro_sum += self.micro[key] - self.micro[old]
+        self.done += self.done_table[key] - self.done_table[old]
+
+    def on_undo(self, s, b, c):
+        self.micro_sum, self.done = self.stack.pop()
+
+    def terminal(self, s):
+        win = self.winner[s.main_key]
+        if win == AI:
+            return True, +INF
+        elif win == HUMAN:
+            return True, -INF
+        if self.done == 9:
+            return True, 0
+        return False, 0
+
+    def value(self, s):
+        is_term, score = self.terminal(s)
+        if not is_term:
+            micro = self.micro_sum
+            fb = s.forced_board
+            if fb is not None:
+                micro += (MICRO_FORCED_MULT - 1) * self.micro[s.micro_keys[fb]]
+            score = self.macro[s.main_key] + MICRO_SCALE * micro
+        if self.debug:
+            full = evaluate_full(s)
+            assert abs(score - full) < 1e-6, f"incremental eval {score} != full eval {full}"
+        return score
+
+def attach_incremental(state, debug=None):
+    """Start tracking evaluation components on `state` (state.tracker); returns the tracker."""
+    state.tracker = IncrementalEval(state, EVAL_DEBUG if debug is None else debug)
+    return state.tracker
+
+def evaluate_full(state):
+    """evaluate() from scratch, ignoring any attached tracker."""
+    win = check_win(state.main_board)
+    if win != 0:
+        return +INF if win == AI else -INF
+    if do.all_mini_boards_done(state):
+        return 0
+    return evaluate_nonterminal(state) + MICRO_SCALE * evaluate_micro_full(state)
+
 def evaluate(state):
+    if state.tracker is not None:
+        return state.tracker.value(state)
     is_terminal, score = terminal_value(state)
     if is_terminal:
         return score
@@ -162,49 +549,401 @@ def evaluate(state):
     micro = evaluate_micro(state)
     return macro + MICRO_SCALE * micro
 
-def minimax(state, depth, alpha=-INF, beta=INF):
+def _enter_node(state, depth, ctx):
+    """
+    Bookkeeping shared by minimax and negamax on entering a node: count it, look
+    at the clock and the stop event every DEADLINE_CHECK_MASK + 1 nodes, and feed
+    the instrumentation. Returns (ply, instrument).
+    """
+    if ctx is None:
+        return 0, None
+    ctx.nodes += 1
+    if ctx.nodes & DEADLINE_CHECK_MASK == 0:
+        if ctx.deadline is not None and time.perf_counter() > ctx.deadline:
+            raise SearchTimeout
+        if ctx.stop is not None and ctx.stop.is_set():
+            raise SearchTimeout
+    ply = ctx.root_depth - depth
+    instr = ctx.instrument
+    if instr is not None:
+        instr.nodes_per_ply[ply] += 1
+        if instr.on_sample is not None and ctx.nodes % instr.sample_every == 0:
+            instr.on_sample(instr, state, ply)
+    return ply, instr
+
+def _leaf_score(state, instr):
+    """evaluate(state), timed into `instr` if there is one."""
+    if instr is None:
+        return evaluate(state)
+    t0 = time.perf_counter()
+    score = evaluate(state)
+    instr.eval_time += time.perf_counter() - t0
+    instr.eval_calls += 1
+    return score
+
+def minimax(state, depth, alpha=-INF, beta=INF, ctx=None):
+    ply, instr = _enter_node(state, depth, ctx)
+    if ctx is not None:
+        ctx.pv_table[ply] = []
     is_term, val = terminal_value(state)
     if depth  == 0 or is_term:
-        return None, evaluate(state)
-    
+        return None, _leaf_score(state, instr)
+
+    # Transposition table: take a cutoff if the stored result is deep enough,
+    # otherwise try the stored move first.
+    tt = ctx.tt if ctx is not None else None
+    tt_move = None
+    if tt is not None:
+        alpha_orig, beta_orig = alpha, beta
+        entry = tt.probe(state.hash)
+        if entry is not None:
+            _, e_depth, flag, e_val, tt_move, _ = entry
+            if e_depth >= depth:
+                if flag == EXACT:
+                    ctx.pv_table[ply] = [tt_move]
+                    return tt_move, e_val
+                if flag == LOWER:
+                    alpha = max(alpha, e_val)
+                else:
+                    beta = min(beta, e_val)
+                if beta <= alpha:
+                    ctx.pv_table[ply] = [tt_move]
+                    return tt_move, e_val
+
+    moves = search_moves(state, ctx, ply, instr, tt_move)
+    orderer = ctx.orderer if ctx is not None else None
+    best_move = None
+    if instr is not None:
+        instr.interior_nodes += 1
+
     if state.current_turn == AI:
         max_eval = -INF
-        best_move = None
-        for move in legal_moves(state):
+        for i, move in enumerate(moves):
+            if i == 0:
+                best_move = move   # so a lost position still returns a move
             b, c = move
             do.apply_move(state, b, c, state.current_turn)
-            _, child_score = minimax(state, depth - 1, alpha, beta)
+            _, child_score = minimax(state, depth - 1, alpha, beta, ctx)
             do.undo_move(state)
               
             if child_score > max_eval:
                 max_eval = child_score
                 best_move = move
+                if ctx is not None:
+                    ctx.pv_table[ply] = [move] + ctx.pv_table[ply + 1]
 
             # Alpha-Beta Pruning
             alpha = max(alpha, max_eval)
             if beta <= alpha:
+                if orderer is not None:
+                    orderer.record_cutoff(state, move, ply, depth)
+                if instr is not None:
+                    instr.record_cutoff(i)
                 break
+        best_eval = max_eval
 
-        return best_move, max_eval
-    
-    elif state.current_turn == HUMAN:
+    else:
         min_eval = INF
-        best_move = None
-        for move in legal_moves(state):
+        for i, move in enumerate(moves):
+            if i == 0:
+                best_move = move
             b, c = move
             do.apply_move(state, b, c, state.current_turn)
-            _, child_score = minimax(state, depth - 1, alpha, beta)
+            _, child_score = minimax(state, depth - 1, alpha, beta, ctx)
             do.undo_move(state)
             if child_score < min_eval:
                 min_eval = child_score
                 best_move = move
+                if ctx is not None:
+                    ctx.pv_table[ply] = [move] + ctx.pv_table[ply + 1]
 
             # Alpha-Beta Pruning
             beta = min(beta, min_eval)
             if beta <= alpha:
+                if orderer is not None:
+                    orderer.record_cutoff(state, move, ply, depth)
+                if instr is not None:
+                    instr.record_cutoff(i)
                 break
-        return best_move, min_eval
+        best_eval = min_eval
+
+    if tt is not None:
+        if best_eval <= alpha_orig:
+            flag = UPPER
+        elif best_eval >= beta_orig:
+            flag = LOWER
+        else:
+            flag = EXACT
+        tt.store(state.hash, depth, flag, best_eval, best_move)
+
+    return best_move, best_eval
     
-def best_move_minimax(state, depth=3):
-    best_move, best_score = minimax(state, depth) 
-    return best_move, best_score
\ No newline at end of file
+def _flip_bound(flag):
+    return LOWER if flag == UPPER else UPPER if flag == LOWER else flag
+
+def negamax(state, depth, alpha=-INF, beta=INF, ctx=None):
+    """
+    minimax in negamax form with principal variation search: the first move is
+    searched with the full window, the rest with a null window around alpha, and
+    re-searched only if they turn out better. Scores are from the side to move's
+    point of view (minimax's AI-relative score, negated when X is to move).
+    Returns (score, principal variation). The TT holds AI-relative values, so it
+    can be shared with minimax.
+    """
+    sign = 1 if state.current_turn == AI else -1
+    ply, instr = _enter_node(state, depth, ctx)
+    is_term, _ = terminal_value(state)
+    if depth == 0 or is_term:
+        return sign * _leaf_score(state, instr), []
+
+    tt = ctx.tt if ctx is not None else None
+    alpha_orig = alpha
+    tt_move = None
+    if tt is not None:
+        entry = tt.probe(state.hash)
+        if entry is not None:
+            _, e_depth, flag, e_val, tt_move, _ = entry
+            if sign < 0:
+                flag, e_val = _flip_bound(flag), -e_val
+            if e_depth >= depth:
+                if flag == EXACT:
+                    return e_val, [tt_move]
+                if flag == LOWER:
+                    alpha = max(alpha, e_val)
+                else:
+                    beta = min(beta, e_val)
+                if beta <= alpha:
+                    return e_val, [tt_move]
+
+    moves = search_moves(state, ctx, ply, instr, tt_move)
+    orderer = ctx.orderer if ctx is not None else None
+    if instr is not None:
+        instr.interior_nodes += 1
+
+    best, pv = -INF, None
+    for i, move in enumerate(moves):
+        if i == 0:
+            pv = [move]
+        b, c = move
+        do.apply_move(state, b, c, state.current_turn)
+        if i == 0:
+            score, child_pv = negamax(state, depth - 1, -beta, -alpha, ctx)
+            score = -score
+        else:
+            score, child_pv = negamax(state, depth - 1, -alpha - NULL_WINDOW, -alpha, ctx)
+            score = -score
+            if alpha < score < beta:
+                score, child_pv = negamax(state, depth - 1, -beta, -alpha, ctx)
+                score = -score
+        do.undo_move(state)
+
+        if score > best:
+            best = score
+            pv = [move] + child_pv
+        if best > alpha:
+            alpha = best
+        if alpha >= beta:
+            if orderer is not None:
+                orderer.record_cutoff(state, move, ply, depth)
+            if instr is not None:
+                instr.record_cutoff(i)
+            break
+
+    if tt is not None:
+        if best <= alpha_orig:
+            flag = UPPER
+        elif best >= beta:
+            flag = LOWER
+        else:
+            flag = EXACT
+        if sign < 0:
+            tt.store(state.hash, depth, _flip_bound(flag), -best, pv[0])
+        else:
+            tt.store(state.hash, depth, flag, best, pv[0])
+
+    return best, pv
+
+def _begin_search(state, tt, orderer, stats=None):
+    """New SearchContext for a root search; attaches the incremental evaluator if needed."""
+    global last_search
+    if tt is not None:
+        tt.new_search()
+    if orderer is not None:
+        orderer.new_search()
+    ctx = last_search = SearchContext(tt, orderer=orderer, instrument=stats)
+    if INCREMENTAL_EVAL and state.tracker is None:
+        attach_incremental(state)
+        ctx.attached = True
+    if stats is not None:
+        if tt is not None:
+            stats.tt_probes -= tt.probes
+            stats.tt_hits -= tt.hits
+        stats.start()
+    return ctx
+
+def _end_search(state, ctx):
+    if ctx.attached:
+        state.tracker = None
+    stats = ctx.instrument
+    if stats is not None:
+        stats.finish(ctx.nodes)
+        if ctx.tt is not None:
+            stats.tt_probes += ctx.tt.probes
+            stats.tt_hits += ctx.tt.hits
+
+def best_move_minimax(state, depth=3, tt=TT, orderer=ORDERER, alpha=-INF, beta=INF, stats=None):
+    """
+    Pass tt=None / orderer=None to search without the shared table / move ordering.
+    Pass a search_stats.SearchStats as `stats` to have it filled in.
+    """
+    ctx = _begin_search(state, tt, orderer, stats)
+    ctx.root_depth = depth
+    try:
+        if USE_PVS:
+            sign = 1 if state.current_turn == AI else -1
+            lo, hi = (alpha, beta) if sign > 0 else (-beta, -alpha)
+            score, ctx.pv = negamax(state, depth, lo, hi, ctx=ctx)
+            best_move, best_score = (ctx.pv[0] if ctx.pv else None), sign * score
+        else:
+            best_move, best_score = minimax(state, depth, alpha, beta, ctx=ctx)
+            ctx.pv = ctx.pv_table[0]
+        if stats is not None:
+            stats.depth_done(depth, ctx.nodes)
+    finally:
+        _end_search(state, ctx)
+    ctx.depth_reached = depth
+    return best_move, best_score
+
+def _aspiration_search(state, depth, prev, ctx):
+    """negamax at `depth` in a window around the previous iteration's (side-to-move) score, widened on failure."""
+    delta = ASPIRATION_WINDOW
+    if not delta or depth == 1 or abs(prev) >= INF:
+        return negamax(state, depth, -INF, INF, ctx)
+    lo, hi = prev - delta, prev + delta
+    while True:
+        score, pv = negamax(state, depth, lo, hi, ctx)
+        if score <= lo and lo > -INF:
+            delta *= 4
+            lo = prev - delta if delta < INF else -INF
+        elif score >= hi and hi < INF:
+            delta *= 4
+            hi = prev + delta if delta < INF else INF
+        else:
+            return score, pv
+
+def empty_playable_cells(state):
+    """Empty cells left in boards that are still open (upper bound on remaining plies)."""
+    return movegen.count_open_cells(state)
+
+def opening_book():
+    """The opening book at BOOK_PATH, or None if there isn't one."""
+    global _book
+    if _book is None:
+        try:
+            _book = OpeningBook(BOOK_PATH)
+        except (OSError, ValueError):
+            _book = False
+    return _book or None
+
+def book_move(state):
+    """(move, score) from the opening book, or None if the position isn't in it."""
+    book = opening_book() if USE_BOOK else None
+    if book is None:
+        return None
+    key, sym = symmetry.canonical(state)
+    entry = book.lookup(key)
+    if entry is None:
+        return None
+    move, _, score = entry
+    b, c = symmetry.inverse_move(move, sym)
+    if not do.is_legal_move(state, b, c):   # hash collision
+        return None
+    return (b, c), score
+
+def solve_endgame(state, deadline=None, stop=None):
+    """
+    Exact (move, score) from the endgame solver, score being +INF / -INF / 0 as
+    in minimax, or None if it didn't finish by `deadline`. The result and the
+    distance to the end of the game go in last_search.proven.
+    """
+    global last_search
+    try:
+        move, result, plies = ENDGAME_SOLVER.solve(state, deadline, stop)
+    except endgame.SolveTimeout:
+        return None
+    ctx = last_search = SearchContext()
+    ctx.nodes = ENDGAME_SOLVER.nodes
+    ctx.proven = (result, plies)
+    winner = state.current_turn * result
+    return move, (INF if winner == AI else -INF if winner == HUMAN else 0)
+
+def best_move_iterative(state, time_budget=1.0, max_depth=64, tt=TT, orderer=ORDERER, stop=None, stats=None,
+                        use_book=True, use_solver=True):
+    """
+    Iterative deepening under a wall-clock budget (seconds).
+
+    Searches depth 1, 2, 3, ... and returns the best move of the last depth that
+    finished before the deadline. Depth 1 always runs to completion so there is
+    always a move, unless `stop` (a threading.Event) is set, which ends the search
+    right away. Each iteration searches the previous principal variation first.
+    `stats` works as in best_move_minimax and also records time to each depth;
+    its `source` says whether the move came from the book, the solver or a search.
+    With use_book, positions in the opening book are answered without searching.
+    With use_solver, positions with at most ENDGAME_CELLS empty playable cells
+    go to the endgame solver first, with half the budget; if it can't finish,
+    the normal search gets the rest. Both ignore max_depth, so turn them off
+    for deliberately weak play (main.py only uses them on Hard).
+    """
+    global last_search
+    start = time.perf_counter()
+    if use_book:
+        hit = book_move(state)
+        if hit is not None:
+            last_search = SearchContext(tt, orderer=orderer)
+            if stats is not None:
+                stats.answered("book", 0, 0, time.perf_counter() - start)
+            return hit
+
+    if use_solver and empty_playable_cells(state) <= ENDGAME_CELLS:
+        solved = solve_endgame(state, start + time_budget / 2, stop)
+        if solved is not None:
+            if stats is not None:
+                stats.answered("solver", last_search.proven[1], last_search.nodes, time.perf_counter() - start)
+            return solved
+    ctx = _begin_search(state, tt, orderer, stats)
+    ctx.stop = stop
+    max_depth = min(max_depth, empty_playable_cells(state), len(ctx.pv_table) - 1)
+    stack_len = len(state.move_stack)
+
+    best_move, best_score = None, 0
+    try:
+        for depth in range(1, max_depth + 1):
+            ctx.root_depth = depth
+            try:
+                if USE_PVS:
+                    sign = 1 if state.current_turn == AI else -1
+                    nm_score, pv = _aspiration_search(state, depth, sign * best_score, ctx)
+                    move, score = (pv[0] if pv else None), sign * nm_score
+                else:
+                    move, score = minimax(state, depth, ctx=ctx)
+                    pv = ctx.pv_table[0]
+            except SearchTimeout:
+                # unwind whatever the interrupted iteration left applied
+                while len(state.move_stack) > stack_len:
+                    do.undo_move(state)
+                break
+            best_move, best_score = move, score
+            ctx.depth_reached = depth
+            if stats is not None:
+                stats.depth_done(depth, ctx.nodes)
+            ctx.set_pv(state, pv)
+
+            if abs(score) >= INF:   # proven win/loss, deeper won't change it
+                break
+            ctx.deadline = start + time_budget
+            if time.perf_counter() >= ctx.deadline:
+                break
+    finally:
+        _end_search(state, ctx)
+
+    return best_move, best_score
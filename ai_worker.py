@@ -0,0 +1,301 @@
+"""
+Background AI search for the pygame loop.
+
+main.run must keep drawing at 60 FPS while the AI thinks, so the search runs on
+a worker thread against a copy of the game state. The search gives up the GIL
+every few milliseconds, which is plenty for the drawing loop, and it shares
+ai.TT with the rest of the process so later searches start warm.
+
+    worker = AIWorker()
+    worker.start(state, time_budget=2.0, max_depth=6)   # returns right away
+    ...
+    move = worker.poll(state)     # None until a result for this exact position is ready
+    worker.cancel()               # on reset/undo: stop the search and drop its result
+
+    worker.ponder(state, 2.0, 6)  # on the human's turn: search the likely replies ahead
+    worker.start(after_reply, 2.0, 6)   # a pondered reply is answered from the cache
+
+AnalysisWorker does the same for analysis.analyze (the hint heatmap), with
+results available after every completed depth.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import ai
+import analysis
+import game_rules as do
+from move_ordering import MoveOrderer
+from transposition import TranspositionTable
+
+ANALYSIS_TT_MB = 16
+PONDER_REPLIES = 6   # replies searched ahead per human turn, most likely first
+
+
+class AIWorker:
+
+    def __init__(self) -> None:
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ai-search")
+        self.future = None
+        self.stop = None
+        self.position = None   # (hash, move count) of the position being searched
+        self.want = None       # cache key start() is waiting on from the ponder run
+        # pondering; the ponder thread only writes these under `lock`, and only
+        # while its own stop event is clear, so a stopped run can't touch the next
+        self.lock = threading.Lock()
+        self.cache = {}        # (hash, move count, time_budget, max_depth, use_book, use_solver) -> move
+        self.ponder_future = None
+        self.ponder_stop = None
+        self.ponder_position = None
+        self.pondering = None  # cache key of the reply being searched right now
+        self.ponder_last = threading.Event()   # set: finish the current reply, then stop
+        self.hits = self.misses = 0
+
+    @property
+    def busy(self):
+        """True while a search is running or its result hasn't been collected."""
+        return self.future is not None or self.want is not None
+
+    def start(self, state, time_budget, max_depth, engine=None, use_book=True, use_solver=True):
+        """
+        Search with ai.best_move_iterative (use_book / use_solver as there), or
+        with engine.best_move (e.g. an mcts.MCTS) if given.
+        """
+        self._drop_search()
+        self.position = (state.hash, len(state.move_stack))
+        key = self.position + (time_budget, max_depth, use_book, use_solver)
+        with self.lock:
+            cached = engine is None and key in self.cache
+            running = engine is None and key == self.pondering
+            if running:
+                self.ponder_last.set()   # that search is ours now: let it finish, then stop pondering
+        if cached:
+            self.stop_pondering()
+        if cached or running:
+            self.want = key
+            self.hits += 1
+            return
+        if engine is None and self.ponder_position is not None:
+            self.misses += 1
+        self.stop_pondering()
+        self.stop = threading.Event()
+        snapshot = do.copy_state(state)
+        if engine is not None:
+            self.future = self.executor.submit(engine.best_move, snapshot, time_budget, stop=self.stop)
+        else:
+            self.future = self.executor.submit(ai.best_move_iterative, snapshot, time_budget, max_depth,
+                                               stop=self.stop, use_book=use_book, use_solver=use_solver)
+
+    def poll(self, state):
+        """The best move once the search is done, if the board hasn't changed since start()."""
+        if self.want is not None:
+            with self.lock:
+                move = self.cache.pop(self.want, None)
+            if move is None:
+                if self.ponder_future is None or self.ponder_future.done():
+                    self.want = None   # the ponder run ended without it; start() will search normally
+                return None
+            self.want = None
+            return move if self.position == (state.hash, len(state.move_stack)) else None
+        if self.future is None or not self.future.done():
+            return None
+        future, self.future = self.future, None
+        if self.position != (state.hash, len(state.move_stack)):
+            return None
+        move, _ = future.result()
+        return move
+
+    def ponder(self, state, time_budget, max_depth, use_book=True, use_solver=True, replies=PONDER_REPLIES):
+        """
+        Think on the opponent's time: search the positions after the most likely
+        replies to `state` (likely_replies order, at most `replies`), each with the
+        settings the real move will use, into self.cache. A later start() for one
+        of them answers from the cache, or takes over the search still running.
+        Searches share ai.TT, so even a miss starts warm.
+        """
+        self.stop_pondering()
+        with self.lock:
+            self.cache = {}
+            self.ponder_stop = threading.Event()
+            self.ponder_last = threading.Event()
+        self.ponder_position = (state.hash, len(state.move_stack))
+        settings = (time_budget, max_depth, use_book, use_solver)
+        self.ponder_future = self.executor.submit(self._ponder, do.copy_state(state), settings, replies,
+                                                  self.ponder_stop, self.ponder_last, self.cache)
+
+    def _ponder(self, snapshot, settings, replies, stop, last, cache):
+        """One ponder run. `stop`, `last` and `cache` are this run's own, so a later run never sees its writes."""
+        time_budget, max_depth, use_book, use_solver = settings
+        for b, c in likely_replies(snapshot)[:replies]:
+            if stop.is_set() or last.is_set():
+                break
+            do.apply_move(snapshot, b, c, snapshot.current_turn)
+            if not ai.terminal_value(snapshot)[0]:
+                key = (snapshot.hash, len(snapshot.move_stack)) + settings
+                with self.lock:
+                    if stop.is_set():
+                        break
+                    self.pondering = key
+                move, _ = ai.best_move_iterative(snapshot, time_budget, max_depth, stop=stop,
+                                                 use_book=use_book, use_solver=use_solver)
+                with self.lock:
+                    if stop.is_set():   # a stopped search only got part of the way
+                        break
+                    cache[key] = move
+                    self.pondering = None
+            do.undo_move(snapshot)
+
+    def stop_pondering(self):
+        with self.lock:
+            if self.ponder_stop is not None:
+                self.ponder_stop.set()
+            self.ponder_stop = None
+            self.pondering = None
+        self.ponder_future = None
+        self.ponder_position = None
+
+    def _drop_search(self):
+        if self.stop is not None:
+            self.stop.set()
+        self.future = None
+        self.stop = None
+        self.position = None
+        self.want = None
+
+    def cancel(self):
+        """Stop the running search and any pondering, and forget their results."""
+        self._drop_search()
+        self.stop_pondering()
+        with self.lock:
+            self.cache = {}
+
+    def shutdown(self):
+        self.cancel()
+        self.executor.shutdown(wait=True)
+
+
+def likely_replies(state, tt=ai.TT):
+    """
+    Legal moves of `state`, most likely first: the table's best move for the
+    position, then the others by the table's score of the position they lead to
+    (best for the side to move first), then moves the table knows nothing about.
+    After the AI's own search the table holds most of these.
+    """
+    entry = tt.probe(state.hash)
+    best = entry[4] if entry is not None else None
+    sign = 1 if state.current_turn == ai.AI else -1
+    keyed = []
+    for i, (b, c) in enumerate(ai.legal_moves(state)):
+        do.apply_move(state, b, c, state.current_turn)
+        child = tt.probe(state.hash)
+        do.undo_move(state)
+        keyed.append(((b, c) != best, child is None, -sign * child[3] if child else 0, i, (b, c)))
+    keyed.sort()
+    return [k[-1] for k in keyed]
+
+
+class AnalysisWorker:
+    """
+    Background multi-PV analysis of one position at a time. It has its own
+    table and move orderer, so it can run while an AIWorker search uses ai.TT.
+    """
+
+    def __init__(self) -> None:
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ai-analysis")
+        self.tt = TranspositionTable(ANALYSIS_TT_MB)
+        self.orderer = MoveOrderer()
+        self.future = None
+        self.stop = None
+        self.position = None   # (hash, move count) of the position being analysed
+        self.lines = []        # [(move, score, pv)] of the last completed depth
+        self.depth = 0
+
+    @property
+    def running(self):
+        return self.future is not None and not self.future.done()
+
+    def start(self, state, time_budget, max_depth):
+        self.cancel()
+        stop = self.stop = threading.Event()
+        self.position = (state.hash, len(state.move_stack))
+
+        def on_depth(depth, lines):
+            if self.stop is stop:   # ignore a cancelled run that is still unwinding
+                self.lines, self.depth = lines, depth
+
+        self.future = self.executor.submit(analysis.analyze, do.copy_state(state), None, max_depth, time_budget,
+                                           self.tt, self.orderer, stop, on_depth)
+
+    def is_for(self, state):
+        return self.position == (state.hash, len(state.move_stack))
+
+    def result(self, state):
+        """(lines, depth) so far for `state`, or ([], 0) if that isn't the position being analysed."""
+        if not self.is_for(state):
+            return [], 0
+        return self.lines, self.depth
+
+    def cancel(self):
+        if self.stop is not None:
+            self.stop.set()
+        self.future = None
+        self.stop = None
+        self.position = None
+        self.lines, self.depth = [], 0
+
+    def shutdown(self):
+        self.cancel()
+        self.executor.shutdown(wait=True)
+
+
+if __name__ == "__main__":
+    import argparse
+    import random
+    import time
+
+    parser = argparse.ArgumentParser(description="AI reply latency with and without pondering")
+    parser.add_argument("--games", type=int, default=2)
+    parser.add_argument("--moves", type=int, default=10, help="AI moves timed per game")
+    parser.add_argument("--think", type=float, default=3.0, help="seconds the simulated human takes per move")
+    parser.add_argument("--time", type=float, default=2.0)
+    parser.add_argument("--depth", type=int, default=6)
+    args = parser.parse_args()
+
+    def play(ponder, seed):
+        """The 'human' is a depth-2 search with a little randomness; returns the AI's reply times."""
+        rng = random.Random(seed)
+        ai.TT.clear()
+        worker = AIWorker()
+        state = do.new_game()
+        waits = []
+        while len(waits) < args.moves and not ai.terminal_value(state)[0]:
+            if state.current_turn == ai.AI:
+                t0 = time.perf_counter()
+                worker.start(state, args.time, args.depth)
+                while (move := worker.poll(state)) is None:
+                    time.sleep(0.002)
+                waits.append(time.perf_counter() - t0)
+                do.apply_move(state, *move, state.current_turn)
+                continue
+            if ponder:
+                worker.ponder(state, args.time, args.depth)
+            t0 = time.perf_counter()
+            moves = ai.legal_moves(state)
+            if rng.random() < 0.2:
+                move = rng.choice(moves)
+            else:
+                move, _ = ai.best_move_minimax(state, 2, tt=None, orderer=None)
+            time.sleep(max(0.0, args.think - (time.perf_counter() - t0)))
+            do.apply_move(state, *move, state.current_turn)
+        hits = worker.hits
+        worker.shutdown()
+        return waits, hits
+
+    for ponder in (False, True):
+        waits, hits = [], 0
+        for g in range(args.games):
+            w, h = play(ponder, g)
+            waits += w
+            hits += h
+        waits.sort()
+        print(f"ponder {'on ' if ponder else 'off'}: {len(waits)} replies, mean {sum(waits) / len(waits):.2f}s, "
+              f"median {waits[len(waits) // 2]:.2f}s, max {waits[-1]:.2f}s, ponder hits {hits}")
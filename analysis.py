@@ -0,0 +1,221 @@
+"""
+Position analysis: a score and principal variation for each root move (multi-PV).
+
+    lines = analyze(state, max_depth=5)          # every legal move, best first
+    lines = analyze(state, k=3, time_budget=1)   # top 3 only
+    for move, score, pv in lines: ...            # score is AI-relative like best_move_*, pv starts with move
+
+It is one iterative-deepening search over all the root moves rather than a
+search per move:
+  - every root move is searched in the same SearchContext, so they share the
+    transposition table, the move orderer and each other's PVs (each line's
+    previous PV is tried first at the next depth)
+  - mirror-image root moves (symmetry.move_classes) are searched once and the
+    score and transformed PV copied to the others
+  - each depth visits the root moves best first by the previous depth
+  - with k, the first k moves get full windows and the rest only a null-window
+    search against the k-th best score; a move that can't beat it is never
+    searched exactly and is left out
+
+main.py uses it (through ai_worker.AnalysisWorker) for the hint heatmap.
+
+    python analysis.py    # check against one search per move, then compare the time
+"""
+import random
+import time
+
+import ai
+import game_rules as do
+import symmetry
+from ai import AI, INF, NULL_WINDOW, SearchTimeout
+
+
+def analyze(state, k=None, max_depth=64, time_budget=None, tt=ai.TT, orderer=ai.ORDERER, stop=None,
+            on_depth=None):
+    """
+    [(move, score, pv)] for the root moves, best for the side to move first.
+    k=None scores every legal move exactly; otherwise only the best k are
+    returned. Without time_budget every depth up to max_depth is searched;
+    with it, deepening stops at the budget as in ai.best_move_iterative (depth
+    1 always completes). `stop` (threading.Event) ends the search and keeps the
+    last completed depth. on_depth(depth, lines) is called after each depth.
+    """
+    moves = ai.legal_moves(state)
+    if not moves or ai.terminal_value(state)[0]:
+        return []
+    classes = symmetry.move_classes(state, moves)
+    roots = [m for m in moves if classes[m][0] == m]
+    if orderer is not None:
+        roots = orderer.order(state, roots, 0)
+    sign = 1 if state.current_turn == AI else -1
+
+    ctx = ai._begin_search(state, tt, orderer)
+    ctx.stop = stop
+    max_depth = min(max_depth, ai.empty_playable_cells(state), len(ctx.pv_table) - 1)
+    stack_len = len(state.move_stack)
+    start = time.perf_counter()
+    lines = []
+    try:
+        for depth in range(1, max_depth + 1):
+            ctx.root_depth = depth
+            try:
+                scored = _search_roots(state, roots, depth, k, ctx)
+            except SearchTimeout:
+                while len(state.move_stack) > stack_len:
+                    do.undo_move(state)
+                break
+            roots = [m for m, _, _ in scored]
+            lines = _expand(scored, moves, classes, sign, k)
+            ctx.depth_reached = depth
+            ctx.pv = lines[0][2]
+            _remember_pvs(ctx, state, scored)
+            if on_depth is not None:
+                on_depth(depth, lines)
+            if time_budget is not None:
+                ctx.deadline = start + time_budget
+                if time.perf_counter() >= ctx.deadline:
+                    break
+    finally:
+        ai._end_search(state, ctx)
+    return lines
+
+def _search_roots(state, roots, depth, k, ctx):
+    """
+    Search each root move at `depth`. Returns [(move, score, pv)] with the
+    exactly scored moves first (best first, side-to-move scores), then the ones
+    that only proved they are no better than the k-th (score None), in order.
+    """
+    exact = []      # (score, move, pv)
+    rest = []
+    for move in roots:
+        b, c = move
+        do.apply_move(state, b, c, state.current_turn)
+        if k is None or len(exact) < k:
+            score, pv = ai.negamax(state, depth - 1, -INF, INF, ctx)
+            score = -score
+        else:
+            kth = sorted((s for s, _, _ in exact), reverse=True)[k - 1]
+            score, pv = ai.negamax(state, depth - 1, -kth - NULL_WINDOW, -kth, ctx)
+            score = -score
+            if score > kth:
+                score, pv = ai.negamax(state, depth - 1, -INF, INF, ctx)
+                score = -score
+            else:
+                score = None
+        do.undo_move(state)
+        if score is None:
+            rest.append((move, None, None))
+        else:
+            exact.append((score, move, [move] + pv))
+    exact.sort(key=lambda e: e[0], reverse=True)   # stable: ties keep the previous depth's order
+    return [(m, s, pv) for s, m, pv in exact] + rest
+
+def _expand(scored, moves, classes, sign, k):
+    """Exact results for every legal move (mirror images included), AI-relative, best first, cut to k."""
+    by_rep = {m: (s, pv) for m, s, pv in scored if s is not None}
+    lines = []
+    for m in moves:
+        rep, t = classes[m]
+        if rep not in by_rep:
+            continue
+        s, pv = by_rep[rep]
+        if t:
+            pv = [symmetry.inverse_move(x, t) for x in pv]
+        lines.append((m, s, pv))
+    lines.sort(key=lambda line: line[1], reverse=True)
+    if k is not None:
+        lines = lines[:k]
+    return [(m, sign * s, pv) for m, s, pv in lines]
+
+def _remember_pvs(ctx, state, scored):
+    """Every line's PV goes first at the next depth (like SearchContext.set_pv, for all lines)."""
+    ctx.pv_moves = {}
+    for _, s, pv in scored:
+        if s is None:
+            continue
+        n = 0
+        for b, c in pv:
+            ctx.pv_moves.setdefault(state.hash, (b, c))
+            do.apply_move(state, b, c, state.current_turn)
+            n += 1
+        for _ in range(n):
+            do.undo_move(state)
+
+
+# -------------------------
+# Check / timing
+# -------------------------
+def _per_move(state, depth, tt_mb=None):
+    """Reference: one best_move_minimax per legal move (fresh table each if tt_mb), AI-relative scores."""
+    from move_ordering import MoveOrderer
+    from transposition import TranspositionTable
+
+    out = {}
+    nodes = 0
+    for b, c in ai.legal_moves(state):
+        do.apply_move(state, b, c, state.current_turn)
+        if tt_mb is None:
+            _, score = ai.best_move_minimax(state, depth - 1, tt=None, orderer=None)
+        else:
+            _, score = ai.best_move_minimax(state, depth - 1, tt=TranspositionTable(tt_mb), orderer=MoveOrderer())
+        nodes += ai.last_search.nodes
+        do.undo_move(state)
+        out[(b, c)] = score
+    return out, nodes
+
+def random_position(rng, plies):
+    s = do.new_game()
+    for _ in range(plies):
+        if ai.terminal_value(s)[0]:
+            break
+        b, c = rng.choice(ai.legal_moves(s))
+        do.apply_move(s, b, c, s.current_turn)
+    return s
+
+def check(positions=30, depth=3, seed=0):
+    """Without a table, analyze's scores equal separate fixed-depth searches of each move, and the PVs are legal."""
+    rng = random.Random(seed)
+    checked = 0
+    for _ in range(positions):
+        s = random_position(rng, rng.randrange(0, 30))
+        if ai.terminal_value(s)[0]:
+            continue
+        want, _ = _per_move(s, depth)
+        lines = analyze(s, max_depth=depth, tt=None, orderer=None)
+        assert {m: score for m, score, _ in lines} == want
+        assert [score for _, score, _ in lines] == sorted(want.values(), reverse=s.current_turn == AI)
+        top = analyze(s, k=3, max_depth=depth, tt=None, orderer=None)
+        assert [score for _, score, _ in top] == [score for _, score, _ in lines[:3]]
+        for m, _, pv in lines:
+            assert pv[0] == m
+            for b, c in pv:
+                assert do.is_legal_move(s, b, c)
+                do.apply_move(s, b, c, s.current_turn)
+            for _ in pv:
+                do.undo_move(s)
+        checked += 1
+    return checked
+
+
+if __name__ == "__main__":
+    from move_ordering import MoveOrderer
+    from transposition import TranspositionTable
+
+    print(f"analyze matches per-move searches on {check()} positions")
+
+    rng = random.Random(1)
+    depth = 6
+    print(f"depth {depth}: per-move searches vs one analysis (all moves, then top 3)")
+    for plies in (0, 2, 6, 12, 20):
+        s = random_position(rng, plies)
+        t0 = time.perf_counter()
+        _, sep_nodes = _per_move(s, depth, tt_mb=16)
+        t_sep = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        lines = analyze(s, max_depth=depth, tt=TranspositionTable(16), orderer=MoveOrderer())
+        t_all, all_nodes = time.perf_counter() - t0, ai.last_search.nodes
+        t0 = time.perf_counter()
+        analyze(s, k=3, max_depth=depth, tt=TranspositionTable(16), orderer=MoveOrderer())
+        t_top, top_nodes = time.perf_counter() - t0, ai.last_search.nodes
+        print(f"ply {plies:>2}, {len(lines):>2} moves: separate {sep_nodes:>7} nodes {t_sep:6.2f}s | "
+              f"all {all_nodes:>7} nodes {t_all:6.2f}s | top 3 {top_nodes:>7} nodes {t_top:6.2f}s")
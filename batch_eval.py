@@ -0,0 +1,183 @@
+"""
+NumPy batch evaluation: score many positions at once with the same terms as
+ai.evaluate (evaluate_nonterminal + evaluate_micro, terminal scores included).
+
+Positions are arrays:
+    boards  (N, 9, 9) int8   cells, 1 = X, -1 = O, 0 = empty
+    forced  (N,)      int    forced board, -1 for a free move
+    turn    (N,)      int8   side to move (evaluate doesn't depend on it; kept for callers' convenience)
+
+The evaluation is linear in the weights, so batch_features() returns one column
+per weight (FEATURE_NAMES) and evaluate_batch() is a dot product with the
+current ai weights, which also makes the columns usable for fitting weights.
+
+    python batch_eval.py    # checks exact agreement with ai.evaluate and prints throughput
+"""
+import numpy as np
+
+import ai
+import game_rules as do
+
+FEATURE_NAMES = ("W_CLAIM", "W_TWO", "W_ONE", "WM_TWO", "WM_ONE", "WM_FORK", "POS_CENTER", "POS_CORNER")
+
+LINES = np.array(do.WIN_LINES, dtype=np.intp)            # (8, 3)
+# INCIDENCE[l, c] = 1 if cell c is on line l
+INCIDENCE = np.zeros((8, 9), dtype=np.int16)
+for _l, _line in enumerate(do.WIN_LINES):
+    INCIDENCE[_l, list(_line)] = 1
+CORNERS = np.array([0, 2, 6, 8], dtype=np.intp)
+
+
+def states_to_arrays(states):
+    """(boards, forced, turn) arrays for a list of game_rules.State / bitboard.BitState."""
+    n = len(states)
+    boards = np.zeros((n, 9, 9), dtype=np.int8)
+    forced = np.full(n, -1, dtype=np.int8)
+    turn = np.zeros(n, dtype=np.int8)
+    for i, s in enumerate(states):
+        boards[i] = s.boards
+        if s.forced_board is not None:
+            forced[i] = s.forced_board
+        turn[i] = s.current_turn
+    return boards, forced, turn
+
+def _line_counts(cells):
+    """cells (..., 9) -> (x count, o count, empty count) per line, each (..., 8)."""
+    lines = cells[..., LINES]                      # (..., 8, 3)
+    x = (lines == 1).sum(-1, dtype=np.int16)
+    o = (lines == -1).sum(-1, dtype=np.int16)
+    return x, o, 3 - x - o
+
+def _winner(cells):
+    """1 / -1 / 0 per 3x3 board (..., 9), like game_rules.check_win."""
+    sums = cells[..., LINES].sum(-1, dtype=np.int16)   # (..., 8)
+    x_line = (sums == 3)
+    o_line = (sums == -3)
+    # check_win returns the first line it finds, so the earlier line wins if both exist
+    first_x = np.where(x_line.any(-1), x_line.argmax(-1), 99)
+    first_o = np.where(o_line.any(-1), o_line.argmax(-1), 99)
+    return np.where(first_x < first_o, 1, np.where(first_o < first_x, -1, 0)).astype(np.int8)
+
+def _pattern_terms(x, o, empty, me, opp):
+    """(open twos, open ones) for `me` per line set, from per-line counts."""
+    mine, theirs = (x, o) if me == 1 else (o, x)
+    unblocked = theirs == 0
+    twos = (unblocked & (mine == 2) & (empty == 1)).sum(-1)
+    ones = (unblocked & (mine == 1) & (empty == 2)).sum(-1)
+    return twos, ones
+
+def _has_fork(cells, x, o, empty, player):
+    """
+    has_fork_for from ai.score_microBoard, vectorized: is there an empty cell such
+    that after playing it the board has >= 2 lines with two `player` marks and one
+    empty cell? Playing cell c turns open ones through c into open twos and open
+    twos through c into wins; every other line is unchanged.
+    """
+    mine = x if player == 1 else o
+    open2 = ((mine == 2) & (empty == 1)).astype(np.int16)    # (..., 8)
+    open1 = ((mine == 1) & (empty == 2)).astype(np.int16)
+    total = open2.sum(-1)[..., None]                          # (..., 1)
+    after = total - open2 @ INCIDENCE + open1 @ INCIDENCE     # (..., 9)
+    return ((cells == 0) & (after >= 2)).any(-1)
+
+def batch_features(boards, forced, forced_mult=None):
+    """
+    Returns (features, terminal, terminal_value):
+      features        (N, 8) float64, one column per FEATURE_NAMES entry
+      terminal        (N,) bool, game over
+      terminal_value  (N,) float64, +INF / -INF / 0 for finished games
+    Micro columns already include the forced-board multiplier but not MICRO_SCALE.
+    """
+    if forced_mult is None:
+        forced_mult = ai.MICRO_FORCED_MULT
+    boards = np.asarray(boards, dtype=np.int8)
+    forced = np.asarray(forced)
+    n = boards.shape[0]
+    AI, HUMAN = ai.AI, ai.HUMAN
+
+    # --- macro ---
+    main = _winner(boards)                                    # (N, 9)
+    full = (boards != 0).all(-1)                              # (N, 9)
+    done = (main != 0) | full
+    mx, mo, me = _line_counts(main)
+    ai_two, ai_one = _pattern_terms(mx, mo, me, AI, HUMAN)
+    hum_two, hum_one = _pattern_terms(mx, mo, me, HUMAN, AI)
+    claimed = (main == AI).sum(-1) - (main == HUMAN).sum(-1)
+
+    macro_winner = _winner(main)
+    terminal = (macro_winner != 0) | done.all(-1)
+    terminal_value = np.where(macro_winner == AI, float(ai.INF),
+                              np.where(macro_winner == HUMAN, -float(ai.INF), 0.0))
+
+    # --- micro, per board ---
+    x, o, e = _line_counts(boards)                            # (N, 9, 8)
+    b_ai_two, b_ai_one = _pattern_terms(x, o, e, AI, HUMAN)
+    b_hum_two, b_hum_one = _pattern_terms(x, o, e, HUMAN, AI)
+    fork = (_has_fork(boards, x, o, e, AI).astype(np.int16)
+            - _has_fork(boards, x, o, e, HUMAN).astype(np.int16))
+    center = (boards[..., 4] == AI).astype(np.int16) - (boards[..., 4] == HUMAN)
+    corner = (boards[..., CORNERS] == AI).sum(-1) - (boards[..., CORNERS] == HUMAN).sum(-1)
+
+    weight = (~done).astype(np.float64)                       # only open boards count
+    has_forced = forced >= 0
+    rows = np.nonzero(has_forced)[0]
+    weight[rows, forced[rows]] *= forced_mult
+
+    features = np.empty((n, len(FEATURE_NAMES)), dtype=np.float64)
+    features[:, 0] = claimed
+    features[:, 1] = ai_two - hum_two
+    features[:, 2] = ai_one - hum_one
+    features[:, 3] = ((b_ai_two - b_hum_two) * weight).sum(-1)
+    features[:, 4] = ((b_ai_one - b_hum_one) * weight).sum(-1)
+    features[:, 5] = (fork * weight).sum(-1)
+    features[:, 6] = (center * weight).sum(-1)
+    features[:, 7] = (corner * weight).sum(-1)
+    return features, terminal, terminal_value
+
+def weight_vector():
+    """Current ai weights as a vector matching FEATURE_NAMES (micro terms scaled by MICRO_SCALE)."""
+    w = ai.get_weights()
+    return np.array([w[name] * (ai.MICRO_SCALE if name.startswith(("WM_", "POS_")) else 1.0)
+                     for name in FEATURE_NAMES])
+
+def evaluate_batch(boards, forced, turn=None):
+    """ai.evaluate for N positions at once; returns an (N,) float64 vector."""
+    features, terminal, terminal_value = batch_features(boards, forced)
+    return np.where(terminal, terminal_value, features @ weight_vector())
+
+def check_agreement(games=200, seed=0):
+    """Compare evaluate_batch with ai.evaluate_full on every position of random games."""
+    import random
+
+    rng = random.Random(seed)
+    states = []
+    for _ in range(games):
+        s = do.new_game()
+        while True:
+            states.append(do.copy_state(s))
+            if ai.terminal_value(s)[0]:
+                break
+            b, c = rng.choice(ai.legal_moves(s))
+            do.apply_move(s, b, c, s.current_turn)
+
+    boards, forced, turn = states_to_arrays(states)
+    got = evaluate_batch(boards, forced, turn)
+    want = np.array([ai.evaluate_full(s) for s in states])
+    bad = np.nonzero(~np.isclose(got, want, rtol=0, atol=1e-6))[0]   # tuned (fractional) weights round differently
+    assert bad.size == 0, f"{bad.size} mismatches, first at {bad[0]}: {got[bad[0]]} != {want[bad[0]]}"
+    return len(states)
+
+
+if __name__ == "__main__":
+    import time
+
+    n = check_agreement()
+    print(f"evaluate_batch matches ai.evaluate on {n} positions")
+
+    rng = np.random.default_rng(0)
+    boards = rng.integers(-1, 2, size=(200_000, 9, 9), dtype=np.int8)
+    forced = rng.integers(-1, 9, size=200_000)
+    t0 = time.perf_counter()
+    evaluate_batch(boards, forced)
+    dt = time.perf_counter() - t0
+    print(f"{len(boards) / dt:,.0f} positions/s ({len(boards)} random boards in {dt:.2f}s)")
@@ -0,0 +1,283 @@
+"""
+Benchmarks for game_rules and ai.
+
+  perft     exact leaf counts at depth N from fixed positions (legal_moves /
+            apply_move / undo_move), plus nodes per second
+  search    ai.best_move_minimax at each difficulty depth: nodes, time, nodes/s
+  evaluate  ai.evaluate calls per second, incremental and from scratch
+  pvs       minimax vs negamax + PVS at hard depth on every position, fixed
+            depth and iterative deepening (with aspiration windows): nodes,
+            time, and whether the chosen move and score agree; then the same
+            totalled over random positions from each phase of the game, since
+            one position can go either way (a few re-searches cost more than
+            PVS saves on a small tree)
+
+Results go to JSON. With --baseline the run is compared against a saved result:
+perft counts must match exactly and no rate may drop by more than --threshold.
+
+    python bench.py --save-baseline bench_baseline.json
+    python bench.py --baseline bench_baseline.json --threshold 0.10
+"""
+import argparse
+import itertools
+import json
+import platform
+import random
+import sys
+import time
+
+import ai
+import game_rules as do
+from move_ordering import MoveOrderer
+from transposition import TranspositionTable
+
+# main.EASY_DEPTH / MEDIUM_DEPTH / HARD_DEPTH (main.py needs pygame, so they aren't imported)
+DIFFICULTY_DEPTHS = {"easy": 2, "medium": 4, "hard": 6}
+
+
+def _random_line(seed, plies):
+    rng = random.Random(seed)
+    s = do.new_game()
+    line = []
+    for _ in range(plies):
+        if ai.terminal_value(s)[0]:
+            break
+        b, c = rng.choice(ai.legal_moves(s))
+        do.apply_move(s, b, c, s.current_turn)
+        line.append((b, c))
+    return line
+
+# phase -> random plies from the start; bench_pvs totals PHASE_SAMPLES positions of each
+PHASES = {"opening": 8, "middlegame": 24, "endgame": 40}
+PHASE_SAMPLES = 20
+
+# name -> (moves from the start position, perft depth, quick perft depth)
+POSITIONS = {
+    "start":   ([], 4, 3),
+    "center":  ([(4, 4), (4, 0), (0, 4)], 4, 3),
+    "opening": (_random_line(11, 10), 4, 3),
+    "midgame": (_random_line(23, 30), 5, 4),
+    "late":    (_random_line(5, 50), 6, 4),
+}
+
+
+def setup(moves):
+    s = do.new_game()
+    for b, c in moves:
+        do.apply_move(s, b, c, s.current_turn)
+    return s
+
+def perft(s, depth):
+    """Leaf nodes at exactly `depth` plies. Finished games have no moves, so they count 0 before the last ply."""
+    if depth == 0:
+        return 1
+    if ai.terminal_value(s)[0]:
+        return 0
+    total = 0
+    for b, c in ai.legal_moves(s):
+        do.apply_move(s, b, c, s.current_turn)
+        total += perft(s, depth - 1)
+        do.undo_move(s)
+    return total
+
+def _best_of(repeat, fn, prepare=None):
+    """Run fn(*prepare()) `repeat` times; return (last result, fastest time). prepare() isn't timed."""
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        args = prepare() if prepare is not None else ()
+        t0 = time.perf_counter()
+        result = fn(*args)
+        best = min(best, time.perf_counter() - t0)
+    return result, best
+
+def bench_perft(quick=False, repeat=1):
+    out = {}
+    for name, (moves, depth, quick_depth) in POSITIONS.items():
+        d = quick_depth if quick else depth
+        s = setup(moves)
+        nodes, dt = _best_of(repeat, lambda: perft(s, d))
+        out[name] = {"depth": d, "nodes": nodes, "seconds": dt, "nodes_per_second": nodes / dt}
+    return out
+
+def bench_search(quick=False, repeat=1):
+    ai.micro_table(), ai.macro_table(), ai.status_tables()   # don't time the table loads
+    out = {}
+    for level, depth in DIFFICULTY_DEPTHS.items():
+        if quick:
+            depth = min(depth, 4)
+        nodes = 0
+        seconds = 0.0
+        for name in ("center", "opening", "midgame"):
+            s = setup(POSITIONS[name][0])
+
+            def run(tt, orderer):
+                ai.best_move_minimax(s, depth, tt=tt, orderer=orderer)
+                return ai.last_search.nodes
+            n, dt = _best_of(repeat, run, lambda: (TranspositionTable(), MoveOrderer()))
+            nodes += n
+            seconds += dt
+        out[level] = {"depth": depth, "nodes": nodes, "seconds": seconds, "nodes_per_second": nodes / seconds}
+    return out
+
+def bench_evaluate(quick=False, repeat=3):
+    # positions along a few random games, replayed with a tracker attached
+    lines = [_random_line(seed, 40) for seed in range(5 if quick else 20)]
+    out = {}
+
+    def incremental():
+        calls = 0
+        for line in lines:
+            s = do.new_game()
+            ai.attach_incremental(s, debug=False)
+            for b, c in line:
+                do.apply_move(s, b, c, s.current_turn)
+                ai.evaluate(s)
+                calls += 1
+        return calls
+
+    def full():
+        calls = 0
+        for line in lines:
+            s = do.new_game()
+            for b, c in line:
+                do.apply_move(s, b, c, s.current_turn)
+                ai.evaluate_full(s)
+                calls += 1
+        return calls
+
+    ai.micro_table(), ai.macro_table(), ai.status_tables()
+    for name, fn in (("incremental", incremental), ("full", full)):
+        calls, dt = _best_of(repeat, fn)
+        out[name] = {"calls": calls, "seconds": dt, "calls_per_second": calls / dt}
+    return out
+
+def _pvs_row(s, depth, repeat):
+    """minimax vs PVS on one position, fixed depth and iterative: {label_mode: {nodes, seconds, move, score}}."""
+    row = {}
+    for label, use_pvs in (("minimax", False), ("pvs", True)):
+        ai.USE_PVS = use_pvs
+        for mode in ("fixed", "iterative"):
+            def run(tt, orderer):
+                if mode == "fixed":
+                    result = ai.best_move_minimax(s, depth, tt=tt, orderer=orderer)
+                else:
+                    result = ai.best_move_iterative(s, 1e9, depth, tt=tt, orderer=orderer, use_book=False)
+                return result, ai.last_search.nodes
+            ((move, score), nodes), dt = _best_of(repeat, run, lambda: (TranspositionTable(), MoveOrderer()))
+            row[f"{label}_{mode}"] = {"nodes": nodes, "seconds": dt, "move": list(move), "score": score}
+    return row
+
+def _compare_pvs(row):
+    for mode in ("fixed", "iterative"):
+        a, b = row[f"minimax_{mode}"], row[f"pvs_{mode}"]
+        row[f"{mode}_node_ratio"] = b["nodes"] / a["nodes"]
+        row[f"{mode}_same"] = a["move"] == b["move"] and a["score"] == b["score"]
+    return row
+
+def bench_pvs(quick=False, repeat=1):
+    ai.micro_table(), ai.macro_table(), ai.status_tables()
+    depth = 4 if quick else DIFFICULTY_DEPTHS["hard"]
+    saved = ai.USE_PVS, ai.ENDGAME_CELLS
+    ai.ENDGAME_CELLS = 0   # compare the searches, not the solver
+    out = {}
+    try:
+        for name, (moves, _, _) in POSITIONS.items():
+            out[name] = _compare_pvs(_pvs_row(setup(moves), depth, repeat))
+        samples = 4 if quick else PHASE_SAMPLES
+        for phase, plies in PHASES.items():
+            lines = (_random_line(seed, plies) for seed in range(1000, 2000))
+            positions = list(itertools.islice((s for s in map(setup, lines) if not ai.terminal_value(s)[0]), samples))
+            total = {key: {"nodes": 0, "seconds": 0.0} for key in ("minimax_fixed", "minimax_iterative",
+                                                                    "pvs_fixed", "pvs_iterative")}
+            same = {"fixed": True, "iterative": True}
+            for s in positions:
+                row = _compare_pvs(_pvs_row(s, depth, repeat))
+                for key, t in total.items():
+                    t["nodes"] += row[key]["nodes"]
+                    t["seconds"] += row[key]["seconds"]
+                for mode in same:
+                    same[mode] = same[mode] and row[f"{mode}_same"]
+            for mode in same:
+                total[f"{mode}_node_ratio"] = total[f"pvs_{mode}"]["nodes"] / total[f"minimax_{mode}"]["nodes"]
+                total[f"{mode}_same"] = same[mode]
+            out[f"{phase} x{samples}"] = total
+    finally:
+        ai.USE_PVS, ai.ENDGAME_CELLS = saved
+    return out
+
+def run_all(quick=False, repeat=1):
+    return {
+        "meta": {
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "quick": quick,
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "perft": bench_perft(quick, repeat),
+        "search": bench_search(quick, repeat),
+        "evaluate": bench_evaluate(quick, max(repeat, 3)),
+        "pvs": bench_pvs(quick, repeat),
+    }
+
+def compare(current, baseline, threshold=0.10):
+    """List of problems: perft count mismatches and rates more than `threshold` below the baseline."""
+    problems = []
+    for name, res in current["perft"].items():
+        base = baseline.get("perft", {}).get(name)
+        if base is None:
+            continue
+        if base["depth"] == res["depth"] and base["nodes"] != res["nodes"]:
+            problems.append(f"perft {name} depth {res['depth']}: {res['nodes']} nodes, baseline {base['nodes']}")
+
+    rates = [("perft", "nodes_per_second"), ("search", "nodes_per_second"), ("evaluate", "calls_per_second")]
+    for section, key in rates:
+        for name, res in current[section].items():
+            base = baseline.get(section, {}).get(name)
+            if base is None:
+                continue
+            change = res[key] / base[key] - 1
+            if change < -threshold:
+                problems.append(f"{section} {name}: {res[key]:.0f} {key}, baseline {base[key]:.0f} ({change:+.1%})")
+    return problems
+
+def print_report(results):
+    for name, r in results["perft"].items():
+        print(f"perft    {name:<9} depth {r['depth']}: {r['nodes']:>9} nodes  {r['nodes_per_second']:>10.0f} n/s")
+    for name, r in results["search"].items():
+        print(f"search   {name:<9} depth {r['depth']}: {r['nodes']:>9} nodes  {r['nodes_per_second']:>10.0f} n/s")
+    for name, r in results["evaluate"].items():
+        print(f"evaluate {name:<11}: {r['calls_per_second']:>10.0f} calls/s")
+    for name, r in results.get("pvs", {}).items():
+        for mode in ("fixed", "iterative"):
+            a, b = r[f"minimax_{mode}"], r[f"pvs_{mode}"]
+            print(f"pvs      {name:<14} {mode:<9}: {a['nodes']:>7} -> {b['nodes']:>7} nodes "
+                  f"({r[f'{mode}_node_ratio']:.0%}), {a['seconds']:.2f}s -> {b['seconds']:.2f}s, "
+                  f"{'same move' if r[f'{mode}_same'] else 'DIFFERENT move/score'}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Super Tic-Tac-Toe benchmarks")
+    parser.add_argument("--out", default="bench_results.json")
+    parser.add_argument("--baseline", help="compare against this saved result")
+    parser.add_argument("--save-baseline", help="also write the result here")
+    parser.add_argument("--threshold", type=float, default=0.10, help="allowed slowdown (0.10 = 10%%)")
+    parser.add_argument("--repeat", type=int, default=1, help="best of N runs")
+    parser.add_argument("--quick", action="store_true", help="smaller depths")
+    args = parser.parse_args()
+
+    results = run_all(args.quick, args.repeat)
+    print_report(results)
+    for path in filter(None, (args.out, args.save_baseline)):
+        with open(path, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        problems = compare(results, baseline, args.threshold)
+        for p in problems:
+            print("REGRESSION:", p)
+        if problems:
+            sys.exit(1)
+        print(f"no regressions against {args.baseline} (threshold {args.threshold:.0%})")
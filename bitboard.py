@@ -0,0 +1,301 @@
+"""
+Bitboard backend for the game rules.
+
+Same API as game_rules (new_game / apply_move / undo_move / is_legal_move /
+playable_boards_list / check_game_over / reset_game), so ai.py and main.py can
+switch with a single import:
+
+    import bitboard as do
+
+Each mini-board is two 9-bit masks (one per player), the big board is two more
+9-bit masks, and `done` has a bit set for every board that is claimed or full.
+Win checks are a lookup into a 512-entry table instead of a loop over WIN_LINES.
+"""
+import random
+
+from game_rules import POW3, WIN_LINES
+from movegen import legal_moves   # bitboard.legal_moves: same moves and order as ai.legal_moves
+from zobrist import CELL_KEYS, SIDE_KEY, forced_key, full_hash
+
+FULL = 0x1FF  # all nine cells / all nine boards
+
+WIN_MASKS = [(1 << a) | (1 << b) | (1 << c) for a, b, c in WIN_LINES]
+
+# WIN_TABLE[m] is True if the 9-bit mask m contains a full line
+WIN_TABLE = [any((m & w) == w for w in WIN_MASKS) for m in range(1 << 9)]
+
+# BIT_INDICES[m] = the set bits of a 9-bit mask, e.g. BIT_INDICES[0b101] == (0, 2)
+BIT_INDICES = [tuple(i for i in range(9) if (m >> i) & 1) for m in range(1 << 9)]
+
+# B3[m] = base-3 value of a 9-bit mask with every set bit as digit 1
+B3 = [sum(POW3[i] for i in range(9) if (m >> i) & 1) for m in range(1 << 9)]
+
+
+class BitState:
+    __slots__ = ("x", "o", "macro_x", "macro_o", "done", "micro_keys", "main_key", "empty",
+                 "current_turn", "forced_board", "game_over", "game_result",
+                 "move_stack", "hash", "tracker")
+
+    def __init__(self) -> None:
+        self.x = [0] * 9         # X cells per mini-board
+        self.o = [0] * 9         # O cells per mini-board
+        self.macro_x = 0         # boards claimed by X
+        self.macro_o = 0         # boards claimed by O
+        self.done = 0            # boards claimed or full
+        # kept up to date by apply_move / undo_move like game_rules.State's, for
+        # ai.IncrementalEval, move_ordering and movegen
+        self.micro_keys = [0] * 9  # base-3 key per mini-board
+        self.main_key = 0        # same kind of key for the big board
+        self.empty = [FULL] * 9  # empty cells per mini-board
+        self.current_turn = 1
+        self.forced_board = None
+        self.game_over = False
+        self.game_result = 0
+        self.move_stack = []
+        self.hash = 0            # zobrist hash, same keys as game_rules
+        self.tracker = None      # optional on_apply/on_undo listener, e.g. ai.IncrementalEval
+
+    # list views so code written against game_rules.State keeps working; they're
+    # built on every access, so the searches stay off them (see micro_keys / empty)
+    @property
+    def boards(self):
+        return [[1 if (x >> c) & 1 else (-1 if (o >> c) & 1 else 0) for c in range(9)]
+                for x, o in zip(self.x, self.o)]
+
+    @property
+    def main_board(self):
+        mx, mo = self.macro_x, self.macro_o
+        return [1 if (mx >> i) & 1 else (-1 if (mo >> i) & 1 else 0) for i in range(9)]
+
+
+
+## Game Functions
+def new_game():
+    return BitState()
+
+def copy_state(s):
+    """Independent copy of s (without its tracker)."""
+    t = BitState()
+    t.x = s.x[:]
+    t.o = s.o[:]
+    t.macro_x, t.macro_o, t.done = s.macro_x, s.macro_o, s.done
+    t.micro_keys = s.micro_keys[:]
+    t.main_key = s.main_key
+    t.empty = s.empty[:]
+    t.current_turn = s.current_turn
+    t.forced_board = s.forced_board
+    t.game_over = s.game_over
+    t.game_result = s.game_result
+    t.move_stack = s.move_stack[:]
+    t.hash = s.hash
+    return t
+
+def from_state(src):
+    """Build a BitState from a game_rules.State (move history is not copied)."""
+    s = BitState()
+    for b in range(9):
+        for c in range(9):
+            v = src.boards[b][c]
+            if v == 1:
+                s.x[b] |= 1 << c
+            elif v == -1:
+                s.o[b] |= 1 << c
+        if src.main_board[b] == 1:
+            s.macro_x |= 1 << b
+        elif src.main_board[b] == -1:
+            s.macro_o |= 1 << b
+        if src.main_board[b] != 0 or (s.x[b] | s.o[b]) == FULL:
+            s.done |= 1 << b
+        s.micro_keys[b] = B3[s.x[b]] + 2 * B3[s.o[b]]
+        s.empty[b] = ~(s.x[b] | s.o[b]) & FULL
+    s.main_key = B3[s.macro_x] + 2 * B3[s.macro_o]
+    s.current_turn = src.current_turn
+    s.forced_board = src.forced_board
+    s.game_over = src.game_over
+    s.game_result = src.game_result
+    s.hash = full_hash(src.boards, s.current_turn, s.forced_board)
+    return s
+
+def mini_board_done(s, i):
+    return (s.done >> i) & 1 == 1
+
+def all_mini_boards_done(s):
+    return s.done == FULL
+
+def playable_boards_list(s):
+    fb = s.forced_board
+    if fb is not None and not (s.done >> fb) & 1:
+        return [fb]
+    done = s.done
+    return [i for i in range(9) if not (done >> i) & 1]
+
+def macro_winner(s):
+    """1 / -1 if someone has three boards in a row, else 0."""
+    if WIN_TABLE[s.macro_x]:
+        return 1
+    if WIN_TABLE[s.macro_o]:
+        return -1
+    return 0
+
+def check_game_over(s):
+
+    if s.game_over:
+        return
+
+    winner = macro_winner(s)
+    if winner != 0:
+        s.game_result = winner
+        s.game_over = True
+        return
+
+    if s.done == FULL:
+        s.game_over = True
+        s.game_result = 0
+
+def reset_game(s):
+    s.x[:] = [0] * 9
+    s.o[:] = [0] * 9
+    s.macro_x = s.macro_o = s.done = 0
+    s.micro_keys[:] = [0] * 9
+    s.main_key = 0
+    s.empty[:] = [FULL] * 9
+    s.current_turn = 1
+    s.forced_board = None
+    s.game_over = False
+    s.game_result = 0
+    s.move_stack.clear()
+    s.hash = 0
+
+def undo_move(s):
+    if s.move_stack:
+        b, c, player, prev_forced, prev_done, prev_hash = s.move_stack.pop()
+        bit = ~(1 << c)
+        if player == 1:
+            s.x[b] &= bit
+            s.micro_keys[b] -= POW3[c]
+        else:
+            s.o[b] &= bit
+            s.micro_keys[b] -= 2 * POW3[c]
+        s.empty[b] |= 1 << c
+
+        # the board was open before this move, so any claim on it came from this move
+        if not (prev_done >> b) & 1 and ((s.macro_x | s.macro_o) >> b) & 1:
+            s.macro_x &= ~(1 << b)
+            s.macro_o &= ~(1 << b)
+            s.main_key -= POW3[b] if player == 1 else 2 * POW3[b]
+        s.done = prev_done
+
+        s.forced_board = prev_forced
+        s.current_turn = player
+        s.game_over = False
+        s.game_result = 0
+        s.hash = prev_hash
+
+        if s.tracker is not None:
+            s.tracker.on_undo(s, b, c)
+
+def is_legal_move(s, board_idx, cell_idx) -> bool:
+    fb = s.forced_board
+    if fb is not None and board_idx != fb and not (s.done >> fb) & 1:
+        return False
+
+    if ((s.macro_x | s.macro_o) >> board_idx) & 1:
+        return False
+
+    return not ((s.x[board_idx] | s.o[board_idx]) >> cell_idx) & 1
+
+def apply_move(s, board_idx, cell_idx, player):
+
+    assert player == s.current_turn, "player must match s.current_turn"
+
+    prev_forced = s.forced_board
+    s.move_stack.append((board_idx, cell_idx, player, prev_forced, s.done, s.hash))
+
+    bit = 1 << cell_idx
+    board_bit = 1 << board_idx
+    if player == 1:
+        m = s.x[board_idx] = s.x[board_idx] | bit
+        s.micro_keys[board_idx] += POW3[cell_idx]
+        if WIN_TABLE[m]:
+            s.macro_x |= board_bit
+            s.done |= board_bit
+            s.main_key += POW3[board_idx]
+    else:
+        m = s.o[board_idx] = s.o[board_idx] | bit
+        s.micro_keys[board_idx] += 2 * POW3[cell_idx]
+        if WIN_TABLE[m]:
+            s.macro_o |= board_bit
+            s.done |= board_bit
+            s.main_key += 2 * POW3[board_idx]
+
+    empty = s.empty[board_idx] = s.empty[board_idx] & ~bit
+    if not empty:
+        s.done |= board_bit
+
+    s.forced_board = None if (s.done >> cell_idx) & 1 else cell_idx
+    s.current_turn = -player
+    s.hash ^= CELL_KEYS[board_idx][cell_idx][player] ^ SIDE_KEY ^ forced_key(prev_forced) ^ forced_key(s.forced_board)
+
+    if s.tracker is not None:
+        s.tracker.on_apply(s, board_idx, cell_idx)
+
+
+# -------------------------
+# Differential check against the list engine
+# -------------------------
+def differential_check(games=200, seed=0):
+    """
+    Play random games on a game_rules.State and a BitState side by side
+    (with random undos mixed in) and assert they agree at every step.
+    Returns the number of positions compared.
+    """
+    import game_rules
+
+    rng = random.Random(seed)
+    compared = 0
+
+    def same(ls, bs):
+        assert ls.boards == bs.boards
+        assert ls.main_board == bs.main_board
+        assert ls.forced_board == bs.forced_board
+        assert ls.current_turn == bs.current_turn
+        assert ls.game_over == bs.game_over and ls.game_result == bs.game_result
+        assert ls.hash == bs.hash == full_hash(ls.boards, ls.current_turn, ls.forced_board)
+        assert ls.micro_keys == bs.micro_keys
+        assert ls.main_key == bs.main_key
+        assert ls.empty == bs.empty and ls.done == bs.done
+        assert game_rules.playable_boards_list(ls) == playable_boards_list(bs)
+        assert legal_moves(bs) == [(b, c) for b in game_rules.playable_boards_list(ls)
+                                   for c in range(9) if ls.boards[b][c] == 0]
+        assert game_rules.all_mini_boards_done(ls) == all_mini_boards_done(bs)
+        for b in range(9):
+            assert game_rules.mini_board_done(ls, b) == mini_board_done(bs, b)
+            for c in range(9):
+                assert game_rules.is_legal_move(ls, b, c) == is_legal_move(bs, b, c)
+
+    for _ in range(games):
+        ls = game_rules.new_game()
+        bs = new_game()
+        while not ls.game_over:
+            moves = [(b, c) for b in game_rules.playable_boards_list(ls)
+                     for c in range(9) if ls.boards[b][c] == 0]
+            b, c = rng.choice(moves)
+            game_rules.apply_move(ls, b, c, ls.current_turn)
+            apply_move(bs, b, c, bs.current_turn)
+            game_rules.check_game_over(ls)
+            check_game_over(bs)
+            same(ls, bs)
+            compared += 1
+
+            if rng.random() < 0.1:
+                game_rules.undo_move(ls)
+                undo_move(bs)
+                same(ls, bs)
+                compared += 1
+
+    return compared
+
+
+if __name__ == "__main__":
+    n = differential_check()
+    print(f"bitboard matches game_rules on {n} positions")
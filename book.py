@@ -0,0 +1,164 @@
+"""
+Opening book: best moves for the first few plies, searched offline.
+
+The book file is an open-addressing hash table that is memory-mapped and read
+in place, so a lookup is a couple of struct reads with no loading step:
+
+    header  magic b"STTB", version, plies, slot count (a power of two), entries
+    slots   key u64 (canonical hash), move u8 (b*9+c), depth u8, 2 pad bytes, score f32
+
+Positions are stored once per symmetry class (symmetry.canonical), with the
+move given for the canonical orientation, so the book is about 8x smaller than
+one keyed by the plain hash.
+
+A slot with depth 0 is empty. Lookups start at key & (slots - 1) and probe
+linearly, and the table is at most half full.
+
+    python book.py --plies 3 --depth 7            # build opening_book.bin
+    python book.py --show                         # print the entries for the start position
+
+ai.best_move_iterative asks the book first (see ai.book_move).
+"""
+import argparse
+import mmap
+import os
+import struct
+import time
+
+import symmetry
+
+BOOK_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "opening_book.bin")
+MAGIC = b"STTB"
+VERSION = 2
+HEADER = struct.Struct("<4sHHII")
+SLOT = struct.Struct("<QBBxxf")
+
+
+class OpeningBook:
+    """Read-only view of a book file."""
+
+    def __init__(self, path=BOOK_PATH) -> None:
+        self.path = path
+        with open(path, "rb") as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.plies, self.slots, self.entries = HEADER.unpack_from(self.mm, 0)
+        if magic != MAGIC or version != VERSION:
+            self.mm.close()
+            raise ValueError(f"{path} is not a version {VERSION} opening book")
+        self.mask = self.slots - 1
+
+    def __len__(self):
+        return self.entries
+
+    def lookup(self, key):
+        """(move, depth, score) stored for a canonical hash, or None. The move is in the canonical orientation."""
+        mm = self.mm
+        i = key & self.mask
+        while True:
+            k, m, depth, score = SLOT.unpack_from(mm, HEADER.size + i * SLOT.size)
+            if depth == 0:
+                return None
+            if k == key:
+                return (m // 9, m % 9), depth, score
+            i = (i + 1) & self.mask
+
+    def close(self):
+        self.mm.close()
+
+
+def write_book(path, entries, plies):
+    """entries: {hash: ((b, c), depth, score)}. Writes to a temp file first, then renames."""
+    slots = 1
+    while slots < 2 * max(len(entries), 1):
+        slots *= 2
+    mask = slots - 1
+    buf = bytearray(HEADER.size + slots * SLOT.size)
+    HEADER.pack_into(buf, 0, MAGIC, VERSION, plies, slots, len(entries))
+    for key, ((b, c), depth, score) in entries.items():
+        i = key & mask
+        while SLOT.unpack_from(buf, HEADER.size + i * SLOT.size)[2] != 0:
+            i = (i + 1) & mask
+        SLOT.pack_into(buf, HEADER.size + i * SLOT.size, key, b * 9 + c, max(depth, 1), score)
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(buf)
+    os.replace(tmp, path)
+
+
+# -------------------------
+# Building
+# -------------------------
+def book_positions(plies):
+    """Move lists reaching every position (up to symmetry) with fewer than `plies` moves played (game not over)."""
+    import ai
+    import game_rules as do
+
+    seen = set()
+    frontier = [[]]
+    out = []
+    for _ in range(plies):
+        nxt = []
+        for moves in frontier:
+            s = do.new_game()
+            for b, c in moves:
+                do.apply_move(s, b, c, s.current_turn)
+            key, _ = symmetry.canonical(s)
+            if key in seen or ai.terminal_value(s)[0]:
+                continue
+            seen.add(key)
+            out.append(moves)
+            nxt.extend(moves + [m] for m in ai.legal_moves(s))
+        frontier = nxt
+    return out
+
+def _search_position(moves, depth):
+    import ai
+    import game_rules as do
+    from move_ordering import MoveOrderer
+    from transposition import TranspositionTable
+
+    s = do.new_game()
+    for b, c in moves:
+        do.apply_move(s, b, c, s.current_turn)
+    move, score = ai.best_move_minimax(s, depth, tt=TranspositionTable(16), orderer=MoveOrderer())
+    key, t = symmetry.canonical(s)
+    return key, symmetry.transform_move(move, t), score
+
+def build_book(plies=3, depth=7, workers=None, path=BOOK_PATH, progress=True):
+    """Search every position with fewer than `plies` moves at `depth` and write the book. Returns the entry count."""
+    from concurrent.futures import ProcessPoolExecutor
+
+    positions = book_positions(plies)
+    entries = {}
+    t0 = time.perf_counter()
+    with ProcessPoolExecutor(workers) as pool:
+        results = pool.map(_search_position, positions, [depth] * len(positions), chunksize=4)
+        for i, (key, move, score) in enumerate(results, 1):
+            entries[key] = (move, depth, score)
+            if progress and (i % 50 == 0 or i == len(positions)):
+                print(f"{i}/{len(positions)} positions, {time.perf_counter() - t0:.0f}s", flush=True)
+    write_book(path, entries, plies)
+    return len(entries)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the opening book")
+    parser.add_argument("--plies", type=int, default=3, help="book positions with fewer than this many moves played")
+    parser.add_argument("--depth", type=int, default=7, help="search depth per position")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--out", default=BOOK_PATH)
+    parser.add_argument("--show", action="store_true", help="print the start position's entry and book stats")
+    args = parser.parse_args()
+
+    if not args.show:
+        n = build_book(args.plies, args.depth, args.workers, args.out)
+        print(f"wrote {n} positions to {args.out}")
+
+    book = OpeningBook(args.out)
+    print(f"{len(book)} positions, {book.slots} slots, {os.path.getsize(args.out)} bytes")
+    print("start position:", book.lookup(0))   # the empty board hashes to 0 in every orientation
+    t0 = time.perf_counter()
+    for _ in range(100_000):
+        book.lookup(0)
+    print(f"lookup: {(time.perf_counter() - t0) * 10:.2f} us")
+    book.close()
@@ -0,0 +1,317 @@
+"""
+Run the quick self-checks in one go: the modules' own check functions (the
+ones their `python <module>.py` runs print), plus the public search entry
+points called the way outside code calls them, on every backend.
+
+    python check_all.py    # one line per check; exits non-zero if any failed
+"""
+import json
+import os
+import random
+import tempfile
+import time
+import warnings
+
+import ai
+import analysis
+import batch_eval
+import bitboard
+import endgame
+import game_rules as do
+import movegen
+import symmetry
+
+
+def random_position(rng, plies, backend=do):
+    s = backend.new_game()
+    for _ in range(plies):
+        if ai.terminal_value(s)[0]:
+            break
+        b, c = rng.choice(ai.legal_moves(s))
+        backend.apply_move(s, b, c, s.current_turn)
+    return s
+
+def check_searches(positions=20, depth=2, seed=0):
+    """minimax / negamax called directly (no SearchContext) agree with best_move_minimax without a table."""
+    rng = random.Random(seed)
+    for _ in range(positions):
+        s = random_position(rng, rng.randrange(0, 30))
+        if ai.terminal_value(s)[0]:
+            continue
+        _, want = ai.best_move_minimax(s, depth, tt=None, orderer=None)
+        move, score = ai.minimax(s, depth)
+        assert score == want and do.is_legal_move(s, *move)
+        sign = 1 if s.current_turn == ai.AI else -1
+        nm_score, pv = ai.negamax(s, depth)
+        assert sign * nm_score == want and do.is_legal_move(s, *pv[0])
+    return positions
+
+def check_notation(positions=50, seed=0):
+    """Position text round-trips, and malformed forced boards are rejected with ValueError."""
+    from notation import position_from_text, position_to_text
+
+    rng = random.Random(seed)
+    for _ in range(positions):
+        s = random_position(rng, rng.randrange(0, 40))
+        t = position_from_text(position_to_text(s))
+        assert (t.boards, t.current_turn, t.forced_board, t.hash) == (s.boards, s.current_turn, s.forced_board, s.hash)
+    cells = position_to_text(do.new_game()).rsplit(" ", 1)[0]
+    for forced in ("12", "45", "345", "9", "", "-1"):
+        try:
+            position_from_text(f"{cells} {forced}")
+        except ValueError:
+            continue
+        raise AssertionError(f"forced board {forced!r} accepted")
+    return positions
+
+def check_open_cells(positions=100, seed=0):
+    """ai.empty_playable_cells gives the same count on every backend."""
+    rng = random.Random(seed)
+    for _ in range(positions):
+        s = random_position(rng, rng.randrange(0, 60))
+        want = sum(row.count(0) for b, row in enumerate(s.boards) if not do.mini_board_done(s, b))
+        assert ai.empty_playable_cells(bitboard.from_state(s)) == want
+        assert ai.empty_playable_cells(s) == want
+    return positions
+
+def check_depth_caps(positions=10, seed=0):
+    """Without the book and solver, best_move_iterative stays within max_depth, also in endgames and openings."""
+    rng = random.Random(seed)
+    checked = 0
+    for _ in range(positions * 5):
+        s = random_position(rng, rng.randrange(45, 70))
+        if ai.terminal_value(s)[0] or ai.empty_playable_cells(s) > ai.ENDGAME_CELLS:
+            continue
+        ai.best_move_iterative(s, 10.0, 2, use_book=False, use_solver=False)
+        assert ai.last_search.proven is None and ai.last_search.depth_reached <= 2
+        checked += 1
+        if checked == positions:
+            break
+    ai.best_move_iterative(do.new_game(), 10.0, 2, use_book=False, use_solver=False)
+    assert ai.last_search.depth_reached == 2
+    return checked
+
+def check_stats_source(positions=5, seed=0):
+    """best_move_iterative fills `stats` for book and solver answers as well as for searches."""
+    from book import OpeningBook, write_book
+    from search_stats import SearchStats
+
+    start = do.new_game()
+    key, _ = symmetry.canonical(start)
+    saved = ai._book
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "book.bin")
+        write_book(path, {key: ((4, 4), 1, 0)}, 1)
+        ai._book = OpeningBook(path)
+        try:
+            stats = SearchStats()
+            assert ai.best_move_iterative(start, 1.0, 4, stats=stats) == ((4, 4), 0)
+            assert (stats.source, stats.depth, stats.nodes) == ("book", 0, 0)
+        finally:
+            ai._book.close()
+            ai._book = saved
+
+    rng = random.Random(seed)
+    checked = 0
+    while checked < positions:
+        s = random_position(rng, rng.randrange(50, 70))
+        if ai.terminal_value(s)[0] or ai.empty_playable_cells(s) > ai.ENDGAME_CELLS:
+            continue
+        stats = SearchStats()
+        ai.best_move_iterative(s, 10.0, 4, stats=stats)
+        assert stats.source == "solver" and stats.to_dict()["source"] == "solver"
+        assert (stats.depth, stats.nodes) == (ai.last_search.proven[1], ai.last_search.nodes) and stats.nodes > 0
+        stats = SearchStats()
+        ai.best_move_iterative(s, 10.0, 3, stats=stats, use_solver=False)
+        assert (stats.source, stats.depth, stats.nodes) == ("search", ai.last_search.depth_reached, ai.last_search.nodes)
+        checked += 1
+    return checked
+
+def check_parallel(positions=6, depth=3, seed=0):
+    """ParallelSearcher returns best_move_minimax's move and score, with and without move ordering."""
+    from move_ordering import MoveOrderer
+    from parallel_search import ParallelSearcher
+    from transposition import TranspositionTable
+
+    rng = random.Random(seed)
+    with ParallelSearcher(2) as searcher:
+        for i in range(positions):
+            s = random_position(rng, rng.randrange(1, 30))
+            if ai.terminal_value(s)[0]:
+                continue
+            searcher.reset_tables()
+            want = ai.best_move_minimax(s, depth, tt=None, orderer=None)
+            assert searcher.search(s, depth) == want
+            searcher.reset_tables()
+            want = ai.best_move_minimax(s, depth, tt=TranspositionTable(1), orderer=MoveOrderer())
+            assert searcher.search(s, depth, orderer=MoveOrderer()) == want
+    return positions
+
+def check_move_ordering(positions=100, seed=0):
+    """MoveOrderer's win / block table agrees with completes_line, and it orders the same on both backends."""
+    from move_ordering import WINNING_CELLS, MoveOrderer, completes_line
+
+    rng = random.Random(seed)
+    for _ in range(positions):
+        s = random_position(rng, rng.randrange(0, 60))
+        for b in range(9):
+            for player in (1, -1):
+                wins = WINNING_CELLS[player == -1][s.micro_keys[b]]
+                assert [(wins >> c) & 1 == 1 for c in range(9)] == [completes_line(s.boards[b], c, player) for c in range(9)]
+        if ai.terminal_value(s)[0]:
+            continue
+        moves = ai.legal_moves(s)
+        orderer = MoveOrderer()
+        orderer.history[0][rng.randrange(81)] = orderer.history[1][rng.randrange(81)] = 5
+        orderer.killers[0] = [rng.choice(moves)]
+        assert orderer.order(s, moves, 0) == orderer.order(bitboard.from_state(s), moves, 0)
+    return positions
+
+def check_backends(positions=15, depth=3, seed=0):
+    """
+    ai's searches give the same results with ai.do switched to bitboard (the
+    `import bitboard as do` swap) as on game_rules.
+    """
+    rng = random.Random(seed)
+    states = [random_position(rng, rng.randrange(0, 50)) for _ in range(positions)]
+    states = [s for s in states if not ai.terminal_value(s)[0]]
+
+    def results(backend):
+        out = []
+        for src in states:
+            s = src if backend is do else backend.from_state(src)
+            out.append((ai.best_move_minimax(s, depth, tt=None, orderer=None),
+                        ai.minimax(s, 2), ai.negamax(s, 2),
+                        ai.best_move_iterative(s, 1e9, depth, use_book=False, use_solver=False)))
+        return out
+
+    ai.TT.clear()
+    ai.ORDERER.clear()
+    want = results(do)
+    saved = ai.do
+    ai.do = bitboard
+    try:
+        ai.TT.clear()
+        ai.ORDERER.clear()
+        assert results(bitboard) == want
+    finally:
+        ai.do = saved
+    return len(states)
+
+def check_bad_weights():
+    """A truncated / hand-broken weights file warns and falls back to ai.DEFAULT_WEIGHTS."""
+    bad = ['{"W_CLAIM": 31, "W_TW', '{"W_CLAIM": 31, "W_NOPE": 1}', '{"W_CLAIM": "31"}', '[1, 2]', '']
+    saved = ai.get_weights()
+    try:
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, "weights.json")
+            for text in bad:
+                with open(path, "w") as f:
+                    f.write(text)
+                ai.set_weights(W_CLAIM=99)
+                with warnings.catch_warnings(record=True) as caught:
+                    warnings.simplefilter("always")
+                    assert ai.load_weights_or_defaults(path) is None
+                assert caught and ai.get_weights() == ai.DEFAULT_WEIGHTS, text
+            with open(path, "w") as f:
+                json.dump({"W_CLAIM": 31}, f)
+            assert ai.load_weights_or_defaults(path) == {"W_CLAIM": 31} and ai.W_CLAIM == 31
+    finally:
+        ai.set_weights(**saved)
+    return len(bad)
+
+def check_use_weights(positions=30, seed=0):
+    """Alternating weight sets with use_weights evaluates (tables and incremental) like set_weights."""
+    rng = random.Random(seed)
+    states = [random_position(rng, rng.randrange(0, 40)) for _ in range(positions)]
+
+    def scores():
+        out = []
+        for s in states:
+            out.append((ai.evaluate(s), ai.attach_incremental(s).value(s)))
+            s.tracker = None
+        return out
+
+    sets = [ai.DEFAULT_WEIGHTS, {**ai.DEFAULT_WEIGHTS, "WM_FORK": 12, "W_CLAIM": 25}]
+    saved = ai.get_weights()
+    try:
+        want = []
+        for w in sets:
+            ai.set_weights(**w)
+            want.append(scores())
+        for i in (0, 1, 0, 1):
+            ai.use_weights(sets[i])
+            assert scores() == want[i]
+    finally:
+        ai.set_weights(**saved)
+    return positions
+
+def check_ponder(positions=5, seed=0):
+    """A ponder run writes only its own cache, and nothing once its stop event is set."""
+    import threading
+    from ai_worker import AIWorker
+
+    rng = random.Random(seed)
+    worker = AIWorker()
+    try:
+        for _ in range(positions):
+            s = random_position(rng, rng.randrange(0, 20))
+            if ai.terminal_value(s)[0]:
+                continue
+            stop, cache = threading.Event(), {}
+            stop.set()
+            worker.pondering = "another run"
+            worker._ponder(do.copy_state(s), (0.05, 2, False, False), 3, stop, threading.Event(), cache)
+            assert cache == {} and worker.pondering == "another run"
+            worker.pondering = None
+
+            worker.ponder(s, 0.05, 2, use_book=False, use_solver=False, replies=3)
+            old_cache, old_future = worker.cache, worker.ponder_future
+            worker.ponder(s, 0.05, 2, use_book=False, use_solver=False, replies=3)
+            old_future.result()
+            worker.ponder_future.result()
+            assert worker.cache is not old_cache and worker.pondering is None
+            replies = set()
+            for b, c in ai.legal_moves(s):
+                do.apply_move(s, b, c, s.current_turn)
+                replies.add((s.hash, len(s.move_stack), 0.05, 2, False, False))
+                do.undo_move(s)
+            assert worker.cache and set(worker.cache) <= replies
+    finally:
+        worker.shutdown()
+    return positions
+
+
+CHECKS = [
+    ("movegen tables vs a board scan", movegen.check),
+    ("bitboard vs game_rules", bitboard.differential_check),
+    ("symmetry", lambda: symmetry.self_check(games=20)),
+    ("batch_eval vs ai.evaluate", batch_eval.check_agreement),
+    ("endgame solver vs minimax", endgame.check),
+    ("analysis vs per-move searches", analysis.check),
+    ("minimax / negamax without a context", check_searches),
+    ("notation", check_notation),
+    ("open cells on every backend", check_open_cells),
+    ("depth caps without book / solver", check_depth_caps),
+    ("search stats for book / solver answers", check_stats_source),
+    ("parallel root search", check_parallel),
+    ("move ordering on every backend", check_move_ordering),
+    ("ai on the bitboard backend", check_backends),
+    ("broken weights.json falls back to the defaults", check_bad_weights),
+    ("switching weight sets", check_use_weights),
+    ("ponder runs keep to their own cache", check_ponder),
+]
+
+
+if __name__ == "__main__":
+    failed = 0
+    for name, fn in CHECKS:
+        t0 = time.perf_counter()
+        try:
+            result = fn()
+        except Exception as e:   # keep going so one run shows every failure
+            failed += 1
+            print(f"FAIL {name}: {e!r}")
+        else:
+            print(f"ok   {name} ({result}, {time.perf_counter() - t0:.1f}s)")
+    raise SystemExit(1 if failed else 0)
@@ -0,0 +1,206 @@
+"""
+Endgame solver: exact win / draw / loss and distance to the end of the game.
+
+Once few empty cells are left in the open boards, the whole remaining tree can
+be searched. The solver runs negamax alpha-beta on a bitboard.BitState with no
+heuristic evaluation at all: a position is worth WIN - d if the side to move
+wins in d plies, -(WIN - d) if it loses in d plies, and 0 if the game is drawn.
+Faster wins and slower losses score better, so the solver plays the shortest
+win and the longest defence.
+
+Solved positions go in the solver's own TranspositionTable. They stay valid
+for the whole game, so the table is kept between calls.
+
+    solver = Solver()
+    move, result, plies = solver.solve(state)     # result: 1 win, 0 draw, -1 loss for the side to move
+
+ai.best_move_iterative hands positions with at most ai.ENDGAME_CELLS empty
+playable cells to the solver (see ai.solve_endgame).
+
+    python endgame.py    # check against a plain minimax, then solve times by empty-cell count
+"""
+import random
+import time
+
+import bitboard
+from transposition import TranspositionTable, EXACT, LOWER, UPPER
+
+WIN = 1000   # > 81, the longest possible game
+ENDGAME_TT_MB = 16
+CHECK_MASK = 1023   # look at the clock every 1024 nodes
+
+
+class SolveTimeout(Exception):
+    """Raised when the solver runs past its deadline or is asked to stop."""
+
+
+def _shift(v):
+    """Score one ply further from the end (a child's score seen from its parent, after negation)."""
+    return v - 1 if v > 0 else (v + 1 if v < 0 else 0)
+
+def _unshift(v):
+    return v + 1 if v > 0 else (v - 1 if v < 0 else 0)
+
+def empty_cells(s):
+    """Empty cells in open boards of a BitState (the most plies the game can last)."""
+    done = s.done
+    return sum(9 - bin(s.x[b] | s.o[b]).count("1") for b in range(9) if not (done >> b) & 1)
+
+
+class Solver:
+
+    def __init__(self, tt_mb=ENDGAME_TT_MB) -> None:
+        self.tt = TranspositionTable(tt_mb)
+        self.nodes = 0
+        self.deadline = None
+        self.stop = None
+
+    def solve(self, state, deadline=None, stop=None):
+        """
+        Solve `state` (a game_rules.State or BitState) for the side to move.
+        Returns (best move, result, plies to the end of the game), result being
+        1 / 0 / -1 for a win / draw / loss. Raises SolveTimeout if `deadline`
+        (a time.perf_counter() value) passes or `stop` (threading.Event) is set.
+        """
+        s = state if isinstance(state, bitboard.BitState) else bitboard.from_state(state)
+        self.nodes = 0
+        self.deadline = deadline
+        self.stop = stop
+        score, move = self._search(s, -WIN, WIN, empty_cells(s))
+        if score > 0:
+            return move, 1, WIN - score
+        if score < 0:
+            return move, -1, WIN + score
+        return move, 0, None
+
+    def _ordered_moves(self, s, tt_move):
+        """Board-claiming moves first, moves that give the opponent a free choice last."""
+        player = s.current_turn
+        mine = s.x if player == 1 else s.o
+        win = bitboard.WIN_TABLE
+        done = s.done
+        first, middle, last = [], [], []
+        for b in bitboard.playable_boards_list(s):
+            m = mine[b]
+            for c in bitboard.BIT_INDICES[~(s.x[b] | s.o[b]) & bitboard.FULL]:
+                move = (b, c)
+                if move == tt_move:
+                    continue
+                if win[m | (1 << c)]:
+                    first.append(move)
+                elif (done >> c) & 1:
+                    last.append(move)
+                else:
+                    middle.append(move)
+        head = [tt_move] if tt_move is not None else []
+        return head + first + middle + last
+
+    def _search(self, s, alpha, beta, empties):
+        """(score, move) for the side to move, fail-soft."""
+        self.nodes += 1
+        if self.nodes & CHECK_MASK == 0:
+            if self.deadline is not None and time.perf_counter() > self.deadline:
+                raise SolveTimeout
+            if self.stop is not None and self.stop.is_set():
+                raise SolveTimeout
+
+        # the previous move ended the game: the side to move has lost (or it's a draw)
+        if bitboard.macro_winner(s) != 0:
+            return -WIN, None
+        if s.done == bitboard.FULL:
+            return 0, None
+
+        alpha_orig = alpha
+        entry = self.tt.probe(s.hash)
+        tt_move = None
+        if entry is not None:
+            _, _, flag, value, tt_move, _ = entry
+            if flag == EXACT:
+                return value, tt_move
+            if flag == LOWER:
+                alpha = max(alpha, value)
+            else:
+                beta = min(beta, value)
+            if alpha >= beta:
+                return value, tt_move
+
+        best, best_move = -WIN - 1, None
+        player = s.current_turn
+        for b, c in self._ordered_moves(s, tt_move):
+            bitboard.apply_move(s, b, c, player)
+            child, _ = self._search(s, -_unshift(beta), -_unshift(alpha), empties - 1)
+            bitboard.undo_move(s)
+            score = _shift(-child)
+            if score > best:
+                best, best_move = score, (b, c)
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        break
+
+        if best <= alpha_orig:
+            flag = UPPER
+        elif best >= beta:
+            flag = LOWER
+        else:
+            flag = EXACT
+        self.tt.store(s.hash, empties, flag, best, best_move)
+        return best, best_move
+
+
+# -------------------------
+# Checks
+# -------------------------
+def _plain_minimax(s):
+    """Reference: full-width negamax with the same scoring, no pruning or cache."""
+    if bitboard.macro_winner(s) != 0:
+        return -WIN
+    if s.done == bitboard.FULL:
+        return 0
+    best = -WIN - 1
+    for b, c in bitboard.legal_moves(s):
+        bitboard.apply_move(s, b, c, s.current_turn)
+        best = max(best, _shift(-_plain_minimax(s)))
+        bitboard.undo_move(s)
+    return best
+
+def random_endgame(rng, max_empty):
+    """A random-game BitState with at most `max_empty` empty playable cells, game not over."""
+    while True:
+        s = bitboard.new_game()
+        while bitboard.macro_winner(s) == 0 and s.done != bitboard.FULL:
+            if empty_cells(s) <= max_empty:
+                return s
+            b, c = rng.choice(bitboard.legal_moves(s))
+            bitboard.apply_move(s, b, c, s.current_turn)
+
+def check(positions=60, max_empty=10, seed=0):
+    """Solver scores match a plain minimax, and the returned move achieves the score."""
+    rng = random.Random(seed)
+    solver = Solver()
+    for _ in range(positions):
+        s = random_endgame(rng, max_empty)
+        want = _plain_minimax(s)
+        move, result, plies = solver.solve(s)
+        score = result * (WIN - plies) if result else 0
+        assert score == want, (score, want)
+        bitboard.apply_move(s, move[0], move[1], s.current_turn)
+        assert _shift(-_plain_minimax(s)) == want
+        bitboard.undo_move(s)
+    return positions
+
+
+if __name__ == "__main__":
+    print(f"solver matches plain minimax on {check()} positions")
+    rng = random.Random(1)
+    for cells in (10, 14, 18, 22, 26):
+        times, nodes = [], []
+        for _ in range(10):
+            s = random_endgame(rng, cells)
+            solver = Solver()
+            t0 = time.perf_counter()
+            solver.solve(s)
+            times.append(time.perf_counter() - t0)
+            nodes.append(solver.nodes)
+        print(f"<= {cells:>2} empty cells: mean {sum(times) / len(times) * 1000:8.1f} ms, "
+              f"max {max(times) * 1000:8.1f} ms, max nodes {max(nodes)}")
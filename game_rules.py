@@ -1,3 +1,11 @@
+from zobrist import CELL_KEYS, SIDE_KEY, forced_key
+
+FULL = 0x1FF   # all nine cells / all nine boards
+
+# OPEN_BOARDS[done] = boards whose bit is clear in a `done` mask
+OPEN_BOARDS = [tuple(i for i in range(9) if not (m >> i) & 1) for m in range(1 << 9)]
+
+
 class State:
 
     def __init__(self) -> None:
@@ -8,7 +16,15 @@ class State:
         self.game_over = False
         self.game_result = 0
         self.move_stack = []
+        self.hash = 0            # zobrist hash, see zobrist.py
+        self.micro_keys = [0] * 9  # base-3 key per mini-board (0 empty, 1 X, 2 O), see ai.micro_table
+        self.main_key = 0        # same kind of key for main_board
+        self.tracker = None      # optional on_apply/on_undo listener, e.g. ai.IncrementalEval
+        self.empty = [FULL] * 9  # 9-bit mask of empty cells per mini-board, see movegen.py
+        self.done = 0            # bit b set once mini-board b is claimed or full
+
 
+POW3 = [3 ** i for i in range(9)]
 
 WIN_LINES = [
     (0,1,2),(3,4,5),(6,7,8),   # rows
@@ -35,24 +51,47 @@ def check_win(arr):
 def new_game():
     return State()
 
+def copy_state(s):
+    """Independent copy of s (without its tracker), e.g. for searching on another thread."""
+    t = State()
+    t.boards = [row[:] for row in s.boards]
+    t.current_turn = s.current_turn
+    t.main_board = s.main_board[:]
+    t.forced_board = s.forced_board
+    t.game_over = s.game_over
+    t.game_result = s.game_result
+    t.move_stack = s.move_stack[:]
+    t.hash = s.hash
+    t.micro_keys = s.micro_keys[:]
+    t.main_key = s.main_key
+    t.empty = s.empty[:]
+    t.done = s.done
+    return t
+
+def rebuild_masks(s):
+    """Recompute s.empty / s.done from boards and main_board (after filling a State in by hand)."""
+    s.empty = [sum(1 << c for c in range(9) if s.boards[b][c] == 0) for b in range(9)]
+    s.done = sum(1 << b for b in range(9) if s.main_board[b] != 0 or s.empty[b] == 0)
+
 def mini_board_done(s, i):
     """A mini-board is 'done' if someone claimed it or it's full."""
-    return (s.main_board[i] != 0) or board_full(s.boards[i])
+    return (s.done >> i) & 1 == 1
 
 def playable_boards_list(s):
 
-    if s.forced_board is not None:
+    fb = s.forced_board
+    if fb is not None:
         # Is the forced board still playable?
-        if s.main_board[s.forced_board] == 0 and not board_full(s.boards[s.forced_board]):
-            return [s.forced_board]
+        if not (s.done >> fb) & 1:
+            return [fb]
         # otherwise force is lifted (won or full) -> fall through to "free move"
 
     # Free move: any board that isn't claimed and isn't full
-    return [i for i in range(9) if s.main_board[i] == 0 and not board_full(s.boards[i])]
+    return list(OPEN_BOARDS[s.done])
 
 def all_mini_boards_done(s):
     """True if every mini-board is either claimed or full (no more moves anywhere)."""
-    return all(mini_board_done(s, i) for i in range(9))
+    return s.done == FULL
 
 def check_game_over(s):
   
@@ -78,25 +117,39 @@ def reset_game(s):
     s.game_result = 0
     s.boards[:] = [[0]*9 for _ in range(9)]
     s.main_board[:] = [0]*9
+    s.move_stack.clear()
+    s.hash = 0
+    s.micro_keys[:] = [0]*9
+    s.main_key = 0
+    s.empty[:] = [FULL]*9
+    s.done = 0
 
 def undo_move(s):
     global move_stack, boards, main_board, forced_board, current_turn, game_over, game_result
 
     if s.move_stack:
-        b, c, player, prev_forced, prev_main_val = s.move_stack.pop()
+        b, c, player, prev_forced, prev_main_val, prev_hash = s.move_stack.pop()
         s.boards[b][c] = 0
+        s.micro_keys[b] -= POW3[c] * (player % 3)
+        s.main_key += POW3[b] * (prev_main_val % 3 - s.main_board[b] % 3)
         s.main_board[b] = prev_main_val
+        s.empty[b] |= 1 << c
+        s.done &= ~(1 << b)   # the board was open before this move
 
         s.forced_board  = prev_forced
         s.current_turn  = player
         s.game_over   = False
         s.game_result = 0
+        s.hash = prev_hash
+
+        if s.tracker is not None:
+            s.tracker.on_undo(s, b, c)
 
 def is_legal_move(s, board_idx, cell_idx) -> bool :
     # 1) If there IS a forced board, you must play there...
     if s.forced_board is not None and board_idx != s.forced_board:
         # ...unless that forced board is already won or full (then it's "free move" or smth this is getting confusing)
-        if s.main_board[s.forced_board] == 0 and (not board_full(s.boards[s.forced_board])):
+        if not (s.done >> s.forced_board) & 1:
             return False
 
     # 2) You can't play in a mini-board that's already been claimed.
@@ -110,20 +163,26 @@ def apply_move(s, board_idx, cell_idx, player):
 
     assert player == s.current_turn, "player must match s.current_turn"
 
-    record = (board_idx, cell_idx, s.current_turn, s.forced_board, s.main_board[board_idx])
+    record = (board_idx, cell_idx, s.current_turn, s.forced_board, s.main_board[board_idx], s.hash)
     s.move_stack.append(record)  # save the move for potential undo
 
     # 1) Place the mark.
     s.boards[board_idx][cell_idx] = player
+    s.micro_keys[board_idx] += POW3[cell_idx] * (player % 3)   # X -> 1, O -> 2
+    empty = s.empty[board_idx] = s.empty[board_idx] & ~(1 << cell_idx)
 
     # 2) Did this win that mini-board?
     w = check_win(s.boards[board_idx])     # returns 1 (X), -1 (O), or 0 (no win)
     if w != 0:
         s.main_board[board_idx] = w
+        s.main_key += POW3[board_idx] * (w % 3)
+    if w != 0 or empty == 0:
+        s.done |= 1 << board_idx
 
     # 3) Choose the next forced board.
+    prev_forced = s.forced_board
     target = cell_idx
-    if s.main_board[target] == 0 and not board_full(s.boards[target]):
+    if not (s.done >> target) & 1:
         s.forced_board = target
     else:
         s.forced_board = None
@@ -131,3 +190,9 @@ def apply_move(s, board_idx, cell_idx, player):
     # 4) Flip the turn.
     s.current_turn *= -1
 
+    # 5) Update the hash: new mark, side to move, forced board.
+    s.hash ^= CELL_KEYS[board_idx][cell_idx][player] ^ SIDE_KEY ^ forced_key(prev_forced) ^ forced_key(s.forced_board)
+
+    if s.tracker is not None:
+        s.tracker.on_apply(s, board_idx, cell_idx)
+
@@ -1,9 +1,11 @@
 import pygame
 from pygame import Rect
 from view import WIDTH, HEIGHT, MARGIN, GRID_SIZE, BIG_CELL, SMALL_CELL
-from view import draw_grid, draw_marks, draw_big_marks, draw_playable_tint, draw_banner
+from view import Renderer, heat_level
 import game_rules as do
 import ai
+from ai_worker import AIWorker, AnalysisWorker
+from mcts import MCTS
 
 
 
@@ -11,6 +13,25 @@ EASY_DEPTH = 2
 MEDIUM_DEPTH = 4
 HARD_DEPTH = 6
 
+# per-move time budgets (seconds); the AI deepens until the budget or its depth cap runs out
+EASY_TIME = 0.25
+MEDIUM_TIME = 0.75
+HARD_TIME = 2.0
+MCTS_TIME = 2.0
+
+# with nothing to redraw and no AI search running, sleep until an event arrives (at most this long)
+IDLE_WAIT_MS = 1000
+
+# search the likely human replies while the human thinks (P during a game toggles it)
+PONDER = True
+
+# hint heatmap (H during a game): background analysis of every move for the side to move
+HINT_TIME = 1.5
+HINT_DEPTH = HARD_DEPTH
+HEAT_RANGE = 40      # a move this far (or more) below the best one shows fully red
+HEAT_CLAMP = 200     # wins/losses are clamped to this before comparing
+
+
 # -------------------------
 # Helpers: pixels -> board
 # -------------------------
@@ -52,6 +73,16 @@ def run():
     # game rules state
     state = do.new_game()
 
+    # only repaints what changed; frames where nothing changed are skipped
+    renderer = Renderer(screen)
+    menu_shown = None       # (page, hovered button) last drawn, None = redraw the menu
+
+    # AI searches run in the background so the window keeps drawing
+    worker = AIWorker()
+    analyzer = AnalysisWorker()    # hint heatmap, on its own table so it never slows the AI down
+    SHOW_HINTS = False
+    PONDERING = PONDER
+
     # -------------------
     # Menu / mode state
     # -------------------
@@ -61,7 +92,10 @@ def run():
 
     # AI settings (used when VS_AI=True)
     AI_DEPTH    = 2
+    AI_TIME     = EASY_TIME
     USE_MINIMAX = True      
+    AI_HARD     = False     # opening book and endgame solver, which play perfectly whatever the depth
+    MCTS_ENGINE = None      # mcts.MCTS when playing the MCTS difficulty (keeps its tree between moves)
 
     # fonts
     pygame.font.init()
@@ -70,8 +104,15 @@ def run():
 
     def update_caption():
         mode = "AI" if VS_AI else "2-Player"
-        alg  = "minimax" if USE_MINIMAX else "greedy"
-        extra = f" — {mode}" + (f" ({alg}, depth {AI_DEPTH})" if VS_AI else "")
+        if MCTS_ENGINE is not None:
+            extra = f" — {mode}" + (f" (mcts, {AI_TIME:g}s)" if VS_AI else "")
+        else:
+            alg  = "minimax" if USE_MINIMAX else "greedy"
+            extra = f" — {mode}" + (f" ({alg}, depth {AI_DEPTH}, {AI_TIME:g}s)" if VS_AI else "")
+        if SHOW_HINTS:
+            extra += " — hints"
+        if VS_AI and PONDERING and MCTS_ENGINE is None:
+            extra += " — pondering"
         pygame.display.set_caption("Super Tic-Tac-Toe" + extra)
 
     update_caption()
@@ -101,10 +142,11 @@ def run():
             menu_buttons.append(make_button(x, top + 1*gap, bw, bh, "2 Players", start_pvp))
         else:
             # AI difficulty submenu
-            menu_buttons.append(make_button(x, top + 0*gap, bw, bh, "Easy",   lambda: start_ai(depth=EASY_DEPTH, use_minimax=True)))  # greedy
-            menu_buttons.append(make_button(x, top + 1*gap, bw, bh, "Medium", lambda: start_ai(depth=MEDIUM_DEPTH, use_minimax=True)))   # minimax d2
-            menu_buttons.append(make_button(x, top + 2*gap, bw, bh, "Hard",   lambda: start_ai(depth=HARD_DEPTH, use_minimax=True)))   # minimax d3
-            menu_buttons.append(make_button(x, top + 3*gap, bw, bh, "Back",   lambda: set_menu_page("root")))
+            menu_buttons.append(make_button(x, top + 0*gap, bw, bh, "Easy",   lambda: start_ai(depth=EASY_DEPTH, time_budget=EASY_TIME, use_minimax=True)))  # greedy
+            menu_buttons.append(make_button(x, top + 1*gap, bw, bh, "Medium", lambda: start_ai(depth=MEDIUM_DEPTH, time_budget=MEDIUM_TIME, use_minimax=True)))   # minimax d2
+            menu_buttons.append(make_button(x, top + 2*gap, bw, bh, "Hard",   lambda: start_ai(depth=HARD_DEPTH, time_budget=HARD_TIME, use_minimax=True, hard=True)))   # minimax d3
+            menu_buttons.append(make_button(x, top + 3*gap, bw, bh, "MCTS",   start_mcts))
+            menu_buttons.append(make_button(x, top + 4*gap, bw, bh, "Back",   lambda: set_menu_page("root")))
 
     def draw_menu():
         screen.fill((0, 0, 0))
@@ -132,21 +174,39 @@ def run():
     def start_pvp():
         nonlocal GAME_STATE, VS_AI
         VS_AI = False
+        worker.cancel()
         do.reset_game(state)
         GAME_STATE = "PLAY"
         update_caption()
 
-    def start_ai(depth, use_minimax=True):
-        nonlocal GAME_STATE, VS_AI, AI_DEPTH, USE_MINIMAX
+    def start_ai(depth, time_budget, use_minimax=True, hard=False):
+        nonlocal GAME_STATE, VS_AI, AI_DEPTH, AI_TIME, USE_MINIMAX, MCTS_ENGINE, AI_HARD
         VS_AI = True
+        MCTS_ENGINE = None
+        AI_HARD = hard
         AI_DEPTH = depth
+        AI_TIME = time_budget
         USE_MINIMAX = use_minimax
+        worker.cancel()
         do.reset_game(state)
         GAME_STATE = "PLAY"
         update_caption()
 
+    def start_mcts():
+        nonlocal MCTS_ENGINE
+        start_ai(depth=HARD_DEPTH, time_budget=MCTS_TIME)
+        MCTS_ENGINE = MCTS()
+        update_caption()
+
     build_menu()
 
+    def hint_heat(lines):
+        """analysis lines -> {(b, c): heat level}, rated for the side to move."""
+        sign = 1 if state.current_turn == ai.AI else -1
+        scores = {m: max(-HEAT_CLAMP, min(HEAT_CLAMP, sign * score)) for m, score, _ in lines}
+        best = max(scores.values())
+        return {m: heat_level(1 - min((best - s) / HEAT_RANGE, 1)) for m, s in scores.items()}
+
     # small helper to avoid repeating two lines
     def commit_move_and_check(s, b, c):
         do.apply_move(s, b, c, s.current_turn)
@@ -161,8 +221,15 @@ def run():
             if event.type == pygame.QUIT:
                 running = False
 
+            # window uncovered / restored: repaint everything
+            elif event.type in (pygame.WINDOWEXPOSED, pygame.WINDOWRESTORED):
+                renderer.invalidate()
+                menu_shown = None
+
             # R anywhere -> go back to MENU and reset the board
             elif event.type == pygame.KEYDOWN and event.key == pygame.K_r:
+                worker.cancel()
+                analyzer.cancel()
                 GAME_STATE = "MENU"
                 set_menu_page("root")
                 do.reset_game(state)
@@ -183,6 +250,8 @@ def run():
                 if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
                     if state.game_over:
                         continue
+                    if VS_AI and state.current_turn == ai.AI:
+                        continue  # AI's turn, it's still thinking
                     px, py = pygame.mouse.get_pos()
                     hit = pixel_to_board_cell(px, py)
                     if hit is not None:
@@ -192,41 +261,95 @@ def run():
 
                 # undo
                 elif event.type == pygame.KEYDOWN and event.key == pygame.K_z:
+                    worker.cancel()
                     do.undo_move(state)
 
+                # hints on/off
+                elif event.type == pygame.KEYDOWN and event.key == pygame.K_h:
+                    SHOW_HINTS = not SHOW_HINTS
+                    if not SHOW_HINTS:
+                        analyzer.cancel()
+                    update_caption()
+
+                # pondering on/off
+                elif event.type == pygame.KEYDOWN and event.key == pygame.K_p:
+                    PONDERING = not PONDERING
+                    if not PONDERING:
+                        worker.stop_pondering()
+                    update_caption()
+
         # -------------
         # Drawing
         # -------------
+        thinking = False
         if GAME_STATE == "MENU":
-            draw_menu()
+            renderer.invalidate()   # the menu covers the whole screen
+            mouse = pygame.mouse.get_pos()
+            hovered = next((i for i, btn in enumerate(menu_buttons) if btn["rect"].collidepoint(mouse)), None)
+            drawn = menu_shown != (MENU_PAGE, hovered)
+            if drawn:
+                menu_shown = (MENU_PAGE, hovered)
+                draw_menu()
+                pygame.display.flip()
         else:
-            draw_grid(screen)
-            draw_marks(screen, state.boards)
-            draw_big_marks(screen, state.main_board)
-
+            menu_shown = None
             playable = do.playable_boards_list(state)
+            banner = status = heat = None
 
             if state.game_over:
                 playable = []
                 if state.game_result == 1:
-                    draw_banner(screen, "X wins! Press R for menu")
+                    banner = "X wins! Press R for menu"
                 elif state.game_result == -1:
-                    draw_banner(screen, "O wins! Press R for menu")
+                    banner = "O wins! Press R for menu"
                 else:
-                    draw_banner(screen, "Tie game. Press R for menu")
-
-            draw_playable_tint(screen, playable, alpha=64)
+                    banner = "Tie game. Press R for menu"
 
             # AI move (only when playing vs AI and it's AI's turn)
             if not state.game_over and VS_AI and state.current_turn == ai.AI:
-                best_move, _ = ai.best_move_minimax(state, depth=AI_DEPTH)
+                if not worker.busy:
+                    worker.start(state, time_budget=AI_TIME, max_depth=AI_DEPTH, engine=MCTS_ENGINE,
+                                 use_book=AI_HARD, use_solver=AI_HARD)
+                best_move = worker.poll(state)
                 if best_move:
                     b, c = best_move
                     commit_move_and_check(state, b, c)
+                else:
+                    thinking = True
+                    dots = "." * (1 + pygame.time.get_ticks() // 400 % 3)
+                    status = "O is thinking" + dots
+
+            # human's turn vs the minimax AI: think ahead on the likely replies
+            elif (not state.game_over and VS_AI and PONDERING and MCTS_ENGINE is None and not worker.busy
+                  and worker.ponder_position != (state.hash, len(state.move_stack))):
+                worker.ponder(state, time_budget=AI_TIME, max_depth=AI_DEPTH, use_book=AI_HARD, use_solver=AI_HARD)
+
+            # hints for the human (either side in a 2-player game)
+            if SHOW_HINTS and not state.game_over and not (VS_AI and state.current_turn == ai.AI):
+                if not analyzer.is_for(state):
+                    analyzer.start(state, time_budget=HINT_TIME, max_depth=HINT_DEPTH)
+                lines, depth = analyzer.result(state)
+                if lines:
+                    heat = hint_heat(lines)
+                    status = f"Hints: depth {depth}"
+                thinking = thinking or analyzer.running
+            elif analyzer.position is not None:
+                analyzer.cancel()
+
+            dirty = renderer.draw(state.boards, state.main_board, playable, banner, status, heat)
+            drawn = bool(dirty)
+            if dirty:
+                pygame.display.update(dirty)
 
-        pygame.display.flip()
         clock.tick(60)
-
+        if not drawn and not thinking:
+            # idle: block instead of spinning at 60 FPS, then hand the event to the loop above
+            event = pygame.event.wait(IDLE_WAIT_MS)
+            if event.type != pygame.NOEVENT:
+                pygame.event.post(event)
+
+    worker.shutdown()
+    analyzer.shutdown()
     pygame.quit()
 
 
@@ -0,0 +1,196 @@
+"""
+Monte Carlo Tree Search (UCT) engine, an alternative to ai.best_move_minimax.
+
+Playouts run on a bitboard.BitState copy of the position. The search runs until
+its time or iteration budget is used up and plays the most-visited root move.
+The tree is kept between calls: if the new position follows from the last
+searched one (same game, more moves played), the matching subtree becomes the
+new root.
+
+    engine = MCTS()
+    move, win_rate = engine.best_move(state, time_budget=2.0)
+
+batch_size > 1 runs several playouts from each new leaf and backs them up
+together, which spends less time walking the tree per playout.
+"""
+import math
+import random
+import time
+
+import bitboard
+
+UCT_C = 1.4
+
+
+class Node:
+    __slots__ = ("move", "parent", "player", "children", "untried", "visits", "wins")
+
+    def __init__(self, move, parent, player, untried) -> None:
+        self.move = move          # move that led here
+        self.parent = parent
+        self.player = player      # who played `move` (wins are counted for this player)
+        self.children = []
+        self.untried = untried    # legal moves not expanded yet
+        self.visits = 0
+        self.wins = 0.0           # 1 per win, 0.5 per draw
+
+    def child_for(self, move):
+        for child in self.children:
+            if child.move == move:
+                return child
+        return None
+
+
+def is_over(s):
+    """Winner (1 / -1) or 0 for a tie if the game is over, else None."""
+    w = bitboard.macro_winner(s)
+    if w != 0:
+        return w
+    if s.done == bitboard.FULL:
+        return 0
+    return None
+
+def _winning_moves(s, moves):
+    player = s.current_turn
+    masks = s.x if player == 1 else s.o
+    win = bitboard.WIN_TABLE
+    return [m for m in moves if win[masks[m[0]] | (1 << m[1])]]
+
+
+class MCTS:
+
+    def __init__(self, c=UCT_C, batch_size=1, policy="light", seed=None) -> None:
+        self.c = c
+        self.batch_size = batch_size
+        self.policy = policy          # "random" or "light" (take mini-board wins when there are any)
+        self.rng = random.Random(seed)
+        self.root = None
+        self.history = []             # moves from the start of the game to self.root
+        self.root_state = None        # BitState of self.root
+        self.playouts = 0
+
+    # ---------------------------
+    # tree reuse
+    # ---------------------------
+    def _find_root(self, state):
+        history = [(rec[0], rec[1]) for rec in state.move_stack]
+        node = None
+        if self.root is not None and history[:len(self.history)] == self.history:
+            node = self.root
+            for move in history[len(self.history):]:
+                node = node.child_for(move)
+                if node is None:
+                    break
+                bitboard.apply_move(self.root_state, move[0], move[1], self.root_state.current_turn)
+            # same moves but a different board (e.g. a reset game): start over
+            if node is not None and self.root_state.hash != state.hash:
+                node = None
+        if node is None:
+            self.root_state = bitboard.from_state(state)
+            node = Node(None, None, -state.current_turn, self._expandable(self.root_state))
+        node.parent = None
+        self.root = node
+        self.history = history
+        return node
+
+    def _expandable(self, s):
+        return [] if is_over(s) is not None else bitboard.legal_moves(s)
+
+    # ---------------------------
+    # search
+    # ---------------------------
+    def _select_child(self, node):
+        log_n = math.log(node.visits)
+        c = self.c
+        return max(node.children, key=lambda ch: ch.wins / ch.visits + c * math.sqrt(log_n / ch.visits))
+
+    def _playout(self, s):
+        """Play to the end from s, undo back, and return the result (1 / -1 / 0)."""
+        rng = self.rng
+        light = self.policy == "light"
+        played = 0
+        while True:
+            result = is_over(s)
+            if result is not None:
+                break
+            moves = bitboard.legal_moves(s)
+            if light:
+                wins = _winning_moves(s, moves)
+                if wins:
+                    moves = wins
+            b, c = rng.choice(moves)
+            bitboard.apply_move(s, b, c, s.current_turn)
+            played += 1
+        for _ in range(played):
+            bitboard.undo_move(s)
+        return result
+
+    def iterate(self, s, root):
+        """One selection / expansion / playout / backup pass. s is the root position and is restored."""
+        node = root
+        depth = 0
+
+        # 1) select
+        while not node.untried and node.children:
+            node = self._select_child(node)
+            b, c = node.move
+            bitboard.apply_move(s, b, c, s.current_turn)
+            depth += 1
+
+        # 2) expand
+        if node.untried:
+            move = node.untried.pop(self.rng.randrange(len(node.untried)))
+            player = s.current_turn
+            bitboard.apply_move(s, move[0], move[1], player)
+            depth += 1
+            child = Node(move, node, player, self._expandable(s))
+            node.children.append(child)
+            node = child
+
+        # 3) playouts
+        results = [self._playout(s) for _ in range(self.batch_size)]
+        self.playouts += len(results)
+
+        # 4) backup
+        n = len(results)
+        while node is not None:
+            node.visits += n
+            for r in results:
+                if r == node.player:
+                    node.wins += 1.0
+                elif r == 0:
+                    node.wins += 0.5
+            node = node.parent
+
+        for _ in range(depth):
+            bitboard.undo_move(s)
+
+    def best_move(self, state, time_budget=1.0, iterations=None, stop=None):
+        """
+        Search `state` (a game_rules.State) for up to `time_budget` seconds and/or
+        `iterations` passes; returns (move, win rate of that move for the side to move).
+        `stop` is an optional threading.Event that ends the search early.
+        """
+        root = self._find_root(state)
+        s = bitboard.from_state(state)
+        self.playouts = 0
+
+        deadline = time.perf_counter() + time_budget if time_budget is not None else None
+        done = 0
+        while True:
+            if iterations is not None and done >= iterations:
+                break
+            if deadline is not None and done & 15 == 0 and time.perf_counter() >= deadline:
+                break
+            if stop is not None and stop.is_set():
+                break
+            if not root.untried and not root.children:
+                break   # game over at the root
+            self.iterate(s, root)
+            done += 1
+
+        if not root.children:
+            moves = bitboard.legal_moves(s)
+            return (moves[0] if moves else None), 0.0
+        best = max(root.children, key=lambda ch: ch.visits)
+        return best.move, best.wins / best.visits
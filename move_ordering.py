@@ -0,0 +1,147 @@
+"""
+Move ordering for alpha-beta (ai.minimax).
+
+MoveOrderer.order sorts a node's moves so cutoffs come early:
+  1. moves that win the mini-board
+  2. moves that block the opponent from winning the mini-board
+  3. killer moves for this ply (quiet moves that caused a cutoff in a sibling)
+  4. everything else by history score (how often the move caused cutoffs, weighted by depth)
+Quiet moves that send the opponent to a finished board (a free move) go last.
+
+Plug it into a search with best_move_minimax(..., orderer=MoveOrderer()).
+"""
+import game_rules as do
+
+WIN_BONUS = 40_000_000
+BLOCK_BONUS = 20_000_000
+KILLER_BONUS = 10_000_000
+FREE_MOVE_PENALTY = 30_000_000
+HISTORY_CAP = KILLER_BONUS - 1
+
+KILLER_SLOTS = 2
+MAX_PLY = 82
+
+# LINES_THROUGH[c] = the other two cells of every win line through cell c
+LINES_THROUGH = [[tuple(x for x in line if x != c) for line in do.WIN_LINES if c in line] for c in range(9)]
+
+
+def _winning_cells():
+    """
+    WINNING_CELLS[player == -1][key] = 9-bit mask of the cells that would give
+    `player` three in a row on a mini-board with base-3 key `key` (the
+    state.micro_keys encoding), occupied cells included.
+    """
+    xs, os_ = [0], [0]   # X / O cells of every key, built one digit at a time
+    for i in range(9):
+        bit = 1 << i
+        xs = xs + [m | bit for m in xs] + xs
+        os_ = os_ + os_ + [m | bit for m in os_]
+    lines = [(sum(1 << x for x in line), c) for c in range(9) for line in LINES_THROUGH[c]]
+    wins = [0] * 512   # cells completing a line for the owner of 9-bit mask m
+    for m in range(512):
+        for pair, c in lines:
+            if m & pair == pair:
+                wins[m] |= 1 << c
+    return [wins[m] for m in xs], [wins[m] for m in os_]
+
+WINNING_CELLS = _winning_cells()
+
+
+def completes_line(cells, c, player):
+    """True if `player` playing cell c of this mini-board makes three in a row."""
+    for x, y in LINES_THROUGH[c]:
+        if cells[x] == player and cells[y] == player:
+            return True
+    return False
+
+
+class MoveOrderer:
+
+    def __init__(self) -> None:
+        self.killers = [[] for _ in range(MAX_PLY)]
+        # history[0] for X, history[1] for O, indexed by b*9+c
+        self.history = [[0] * 81, [0] * 81]
+
+    def new_search(self):
+        """Forget killers and age the history so old searches fade out."""
+        for k in self.killers:
+            k.clear()
+        for h in self.history:
+            for i in range(81):
+                h[i] >>= 1
+
+    def clear(self):
+        self.killers = [[] for _ in range(MAX_PLY)]
+        self.history = [[0] * 81, [0] * 81]
+
+    def order(self, state, moves, ply):
+        player = state.current_turn
+        hist = self.history[0 if player == 1 else 1]
+        killers = self.killers[ply]
+        # micro_keys / empty are kept up to date by both backends, so nothing is built here
+        keys, empty, done = state.micro_keys, state.empty, state.done
+        mine = WINNING_CELLS[player == -1]
+        theirs = WINNING_CELLS[player == 1]
+
+        scored = []
+        for move in moves:
+            b, c = move
+            if (mine[keys[b]] >> c) & 1:
+                score = WIN_BONUS
+            elif (theirs[keys[b]] >> c) & 1:
+                score = BLOCK_BONUS
+            else:
+                score = min(hist[b * 9 + c], HISTORY_CAP)
+                if move in killers:
+                    score += KILLER_BONUS
+                # opponent gets a free move if the target board is finished,
+                # including this board when the move fills its last cell
+                if (done >> c) & 1 or (c == b and empty[b] == 1 << c):
+                    score -= FREE_MOVE_PENALTY
+            scored.append((score, move))
+
+        scored.sort(key=lambda t: t[0], reverse=True)   # stable: ties keep board/cell order
+        return [m for _, m in scored]
+
+    def record_cutoff(self, state, move, ply, depth):
+        """Called by minimax when `move` caused a beta cutoff (state is the node's position)."""
+        killers = self.killers[ply]
+        if move not in killers:
+            killers.insert(0, move)
+            del killers[KILLER_SLOTS:]
+        b, c = move
+        self.history[0 if state.current_turn == 1 else 1][b * 9 + c] += depth * depth
+
+
+def nodes_per_depth(state, max_depth, orderer=None):
+    """Nodes searched by a plain fixed-depth search (no table) at depths 1..max_depth."""
+    import ai
+
+    counts = []
+    for depth in range(1, max_depth + 1):
+        if orderer is not None:
+            orderer.clear()
+        ai.best_move_minimax(state, depth, tt=None, orderer=orderer)
+        counts.append(ai.last_search.nodes)
+    return counts
+
+
+if __name__ == "__main__":
+    import random
+
+    rng = random.Random(7)
+    positions = []
+    for plies in (3, 8, 14, 20):
+        s = do.new_game()
+        for _ in range(plies):
+            moves = [(b, c) for b in do.playable_boards_list(s) for c in range(9) if s.boards[b][c] == 0]
+            b, c = rng.choice(moves)
+            do.apply_move(s, b, c, s.current_turn)
+        positions.append((plies, s))
+
+    max_depth = 5
+    print("depth  " + "  ".join(f"{d:>15}" for d in range(1, max_depth + 1)))
+    for plies, s in positions:
+        before = nodes_per_depth(s, max_depth)
+        after = nodes_per_depth(s, max_depth, MoveOrderer())
+        print(f"ply {plies:>2} " + "  ".join(f"{a:>7}->{o:<7}" for a, o in zip(before, after)))
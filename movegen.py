@@ -0,0 +1,147 @@
+"""
+Move generation from the empty-cell masks kept on game_rules.State.
+
+apply_move / undo_move keep `s.empty[b]` (a 9-bit mask of the empty cells of
+mini-board b) and `s.done` (a bit per board that is claimed or full) up to
+date, so generating moves is a few table lookups instead of scanning boards:
+
+    MOVE_INTS[b][mask]    move codes b*9+c for the set bits of mask, in cell order
+    MOVE_PAIRS[b][mask]   the same moves as (b, c) tuples, shared with MOVES
+
+Nothing in the tables is built per call: legal_moves concatenates prebuilt
+tuples, and the (b, c) tuples it returns are the same objects every time.
+
+    moves = legal_moves(s)      # [(b, c), ...] in the same order as before (ai.legal_moves)
+    codes = move_codes(s)       # [b*9+c, ...]
+    for m in iter_moves(s):     # lazy: one board at a time, nothing built for boards never reached
+        ...
+
+iter_moves suits callers that stop at the first good move (a cutoff, a
+"does any move win" test). The searches go one step further and try the TT /
+PV move before generating anything (see ai._staged_moves).
+
+Works on any state with `empty` and `done` (bitboard.BitState keeps them up
+to date the same way).
+
+    python movegen.py    # check against a board scan, then time the generators
+"""
+import random
+import time
+
+import game_rules as do
+from game_rules import OPEN_BOARDS
+
+MOVES = tuple((m // 9, m % 9) for m in range(81))   # move code -> (b, c)
+
+MOVE_INTS = [[tuple(b * 9 + c for c in range(9) if (m >> c) & 1) for m in range(1 << 9)] for b in range(9)]
+MOVE_PAIRS = [[tuple(MOVES[i] for i in codes) for codes in row] for row in MOVE_INTS]
+EMPTY_COUNT = [bin(m).count("1") for m in range(1 << 9)]
+
+
+def open_boards(s):
+    """Boards the side to move may play in (a tuple; game_rules.playable_boards_list returns a list)."""
+    fb = s.forced_board
+    if fb is not None and not (s.done >> fb) & 1:
+        return (fb,)
+    return OPEN_BOARDS[s.done]
+
+def legal_moves(s):
+    """All legal (board, cell) moves, board by board, cells in order."""
+    empty = s.empty
+    fb = s.forced_board
+    if fb is not None and not (s.done >> fb) & 1:
+        return list(MOVE_PAIRS[fb][empty[fb]])
+    moves = []
+    for b in OPEN_BOARDS[s.done]:
+        moves += MOVE_PAIRS[b][empty[b]]
+    return moves
+
+def move_codes(s):
+    """legal_moves as move codes b*9+c."""
+    empty = s.empty
+    fb = s.forced_board
+    if fb is not None and not (s.done >> fb) & 1:
+        return list(MOVE_INTS[fb][empty[fb]])
+    moves = []
+    for b in OPEN_BOARDS[s.done]:
+        moves += MOVE_INTS[b][empty[b]]
+    return moves
+
+def iter_moves(s, codes=False):
+    """
+    Lazily yield the legal moves ((b, c), or codes b*9+c with codes=True) in
+    legal_moves order. Don't apply moves to s while the generator is running.
+    """
+    table = MOVE_INTS if codes else MOVE_PAIRS
+    empty = s.empty
+    for b in open_boards(s):
+        yield from table[b][empty[b]]
+
+def count_moves(s):
+    empty = s.empty
+    return sum(EMPTY_COUNT[empty[b]] for b in open_boards(s))
+
+def count_open_cells(s):
+    """Empty cells in every board that isn't claimed or full, forced board or not."""
+    empty = s.empty
+    return sum(EMPTY_COUNT[empty[b]] for b in OPEN_BOARDS[s.done])
+
+
+# -------------------------
+# Check / timing
+# -------------------------
+def _scan_moves(s):
+    """Reference: the old board scan."""
+    return [(b, c) for b in do.playable_boards_list(s) for c in range(9) if s.boards[b][c] == 0]
+
+def check(games=300, seed=0):
+    """Random games with undos: the generators agree with a board scan and the masks with the boards."""
+    rng = random.Random(seed)
+    compared = 0
+    for _ in range(games):
+        s = do.new_game()
+        while not s.game_over:
+            want = _scan_moves(s)
+            assert legal_moves(s) == want
+            assert move_codes(s) == [b * 9 + c for b, c in want]
+            assert list(iter_moves(s)) == want
+            assert count_moves(s) == len(want)
+            t = do.copy_state(s)
+            do.rebuild_masks(t)
+            assert (t.empty, t.done) == (s.empty, s.done)
+            compared += 1
+            b, c = rng.choice(want)
+            do.apply_move(s, b, c, s.current_turn)
+            do.check_game_over(s)
+            if rng.random() < 0.1:
+                do.undo_move(s)
+    return compared
+
+
+if __name__ == "__main__":
+    print(f"generators match a board scan on {check()} positions")
+
+    rng = random.Random(1)
+    positions = []
+    while len(positions) < 2000:
+        s = do.new_game()
+        for _ in range(rng.randrange(40)):
+            if s.game_over:
+                break
+            b, c = rng.choice(legal_moves(s))
+            do.apply_move(s, b, c, s.current_turn)
+            do.check_game_over(s)
+        if not s.game_over:
+            positions.append(s)
+
+    def per_call(fn, rounds=20):
+        t0 = time.perf_counter()
+        for _ in range(rounds):
+            for s in positions:
+                fn(s)
+        return (time.perf_counter() - t0) / (rounds * len(positions)) * 1e6
+
+    print(f"board scan       {per_call(_scan_moves):6.2f} us")
+    print(f"legal_moves      {per_call(legal_moves):6.2f} us")
+    print(f"move_codes       {per_call(move_codes):6.2f} us")
+    print(f"first move only  {per_call(lambda s: next(iter_moves(s))):6.2f} us   (iter_moves)")
@@ -0,0 +1,59 @@
+"""
+Text notation for positions.
+
+A position is the 81 cells in board order (board 0 cells 0-8, then board 1,
+...), each `x`, `o` or `.`, then the side to move and the forced board (`-`
+for a free move), separated by spaces:
+
+    ....x............................................................................ o 4
+
+    text = position_to_text(state)
+    state = position_from_text(text)    # a game_rules.State, hash and keys filled in
+"""
+import game_rules as do
+from zobrist import full_hash
+
+CELL_CHARS = {0: ".", 1: "x", -1: "o"}
+CHAR_CELLS = {".": 0, "x": 1, "o": -1}
+TURN_CHARS = {1: "x", -1: "o"}
+CHAR_TURNS = {"x": 1, "o": -1}
+
+
+def position_to_text(state):
+    cells = "".join(CELL_CHARS[v] for row in state.boards for v in row)
+    fb = "-" if state.forced_board is None else str(state.forced_board)
+    return f"{cells} {TURN_CHARS[state.current_turn]} {fb}"
+
+def position_from_text(text):
+    """game_rules.State for a position string; raises ValueError if it isn't a valid position."""
+    parts = text.split()
+    if len(parts) != 3 or len(parts[0]) != 81:
+        raise ValueError("expected '<81 cells> <x|o> <forced board or ->'")
+    cells, turn, forced = parts
+    if any(ch not in CHAR_CELLS for ch in cells.lower()):
+        raise ValueError("cells must be x, o or .")
+    if turn.lower() not in CHAR_TURNS:
+        raise ValueError("side to move must be x or o")
+    if forced != "-" and (len(forced) != 1 or forced not in "012345678"):
+        raise ValueError("forced board must be 0-8 or -")
+
+    s = do.new_game()
+    values = [CHAR_CELLS[ch] for ch in cells.lower()]
+    for b in range(9):
+        s.boards[b] = values[b * 9:b * 9 + 9]
+        s.main_board[b] = do.check_win(s.boards[b])
+        s.micro_keys[b] = sum(do.POW3[c] * (v % 3) for c, v in enumerate(s.boards[b]))
+    s.main_key = sum(do.POW3[b] * (v % 3) for b, v in enumerate(s.main_board))
+    do.rebuild_masks(s)
+
+    x, o = values.count(1), values.count(-1)
+    s.current_turn = CHAR_TURNS[turn.lower()]
+    if x - o != (0 if s.current_turn == 1 else 1):
+        raise ValueError(f"{x} x and {o} o marks, but {turn} is to move")
+    fb = None if forced == "-" else int(forced)
+    if fb is not None and do.mini_board_done(s, fb):
+        fb = None
+    s.forced_board = fb
+    s.hash = full_hash(s.boards, s.current_turn, s.forced_board)
+    do.check_game_over(s)
+    return s
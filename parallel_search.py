@@ -0,0 +1,179 @@
+"""
+Parallel root search: the root moves from ai.legal_moves are handed out one at a
+time to a process pool, and every worker reads and raises a shared bound (alpha
+for the AI, beta for the human) so later root moves get searched with a tighter
+window. Each worker keeps its own ai.TT and ai.ORDERER between tasks and
+searches; reset_tables() empties them in every worker.
+
+The result is the same (move, score) a serial alpha-beta search gives when it
+tries the root moves in the same order: moves are searched with a window that
+is a hair wider than the shared bound, so every move that ties or beats it
+comes back with an exact score, and ties go to the earliest move. search()
+orders the root the way best_move_minimax does with an empty table (mirror
+images dropped, then the given move orderer), so it returns the same move.
+
+    searcher = ParallelSearcher(workers=8)
+    move, score = searcher.search(state, depth=6)
+    searcher.close()
+
+`python parallel_search.py --depth 6 --max-workers 16` prints how the speedup
+over 1 worker scales up to N workers, every search starting from empty tables.
+"""
+import multiprocessing as mp
+import os
+import pickle
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import ai
+import game_rules as do
+import symmetry
+from move_ordering import MoveOrderer
+from transposition import TranspositionTable
+
+TIE_EPS = 1e-9
+
+_bound = None     # shared multiprocessing.Value in each worker
+_barrier = None   # multiprocessing.Barrier for one task per worker
+
+
+def _init_worker(bound, barrier):
+    global _bound, _barrier
+    _bound = bound
+    _barrier = barrier
+
+def _reset_tables():
+    ai.TT.clear()
+    ai.ORDERER.clear()
+    _barrier.wait(timeout=60)   # hold this worker until every worker has taken one of these tasks
+    return os.getpid()
+
+def _search_move(payload, index, move, depth, maximizing):
+    state = pickle.loads(payload)
+    b, c = move
+    do.apply_move(state, b, c, state.current_turn)
+
+    bound = _bound.value
+    if maximizing:
+        alpha, beta = bound - TIE_EPS, ai.INF
+    else:
+        alpha, beta = -ai.INF, bound + TIE_EPS
+    _, score = ai.best_move_minimax(state, depth - 1, alpha=alpha, beta=beta)
+
+    with _bound.get_lock():
+        if (maximizing and score > _bound.value) or (not maximizing and score < _bound.value):
+            _bound.value = score
+    return index, score, ai.last_search.nodes
+
+
+class ParallelSearcher:
+
+    def __init__(self, workers=None) -> None:
+        self.workers = workers or os.cpu_count() or 1
+        self.bound = mp.Value("d", 0.0)
+        self.barrier = mp.Barrier(self.workers)
+        self.pool = ProcessPoolExecutor(self.workers, initializer=_init_worker, initargs=(self.bound, self.barrier))
+        self.nodes = 0
+
+    def search(self, state, depth=3, moves=None, orderer=None):
+        """
+        Best (move, score) at `depth`, the same as best_move_minimax(state, depth)
+        with an empty table and `orderer` in the same state (None: no ordering),
+        as long as the worker tables are empty too (reset_tables); entries left
+        by deeper searches can legitimately change the score.
+        `moves` fixes the root order instead.
+        """
+        if moves is None:
+            moves = root_moves(state, orderer)
+        maximizing = state.current_turn == ai.AI
+
+        is_term, _ = ai.terminal_value(state)
+        if depth == 0 or is_term or len(moves) == 1:
+            move, score = ai.best_move_minimax(state, depth, tt=None, orderer=orderer)
+            self.nodes = ai.last_search.nodes
+            return move if move is not None else (moves[0] if moves else None), score
+
+        tracker, state.tracker = state.tracker, None
+        try:
+            payload = pickle.dumps(state)
+        finally:
+            state.tracker = tracker
+
+        self.bound.value = -ai.INF if maximizing else ai.INF
+        futures = [self.pool.submit(_search_move, payload, i, m, depth, maximizing)
+                   for i, m in enumerate(moves)]
+        results = [f.result() for f in futures]
+
+        self.nodes = sum(n for _, _, n in results)
+        best = self.bound.value
+        # earliest move whose exact score matches the best (anything else failed low)
+        for index, score, _ in results:
+            if score == best:
+                return moves[index], score
+        index, score, _ = (max if maximizing else min)(results, key=lambda r: r[1])
+        return moves[index], score
+
+    def reset_tables(self):
+        """Empty ai.TT and ai.ORDERER in every worker (starting all workers if needed)."""
+        pids = {f.result() for f in [self.pool.submit(_reset_tables) for _ in range(self.workers)]}
+        assert len(pids) == self.workers
+
+    def close(self):
+        self.pool.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def root_moves(state, orderer=None):
+    """The root moves in the order best_move_minimax tries them when its table has no entry for `state`."""
+    moves = ai.legal_moves(state)
+    if ai.SYMMETRY_PLIES > 0:
+        moves = symmetry.unique_moves(state, moves)
+    if orderer is not None:
+        moves = orderer.order(state, moves, 0)
+    return moves
+
+def scaling_report(state, depth, max_workers):
+    """
+    Time a parallel search with 1..max_workers workers. Every search (the
+    serial reference too) starts with an empty table and move orderer, so the
+    speedup over 1 worker comes from the extra workers alone.
+    """
+    ai.best_move_minimax(state, 1, tt=None, orderer=None)   # build the lookup tables
+    tt = TranspositionTable(ai.TT.max_mb)
+    t0 = time.perf_counter()
+    serial_move, serial_score = ai.best_move_minimax(state, depth, tt=tt, orderer=MoveOrderer())
+    serial_time = time.perf_counter() - t0
+    print(f"serial    : move={serial_move} score={serial_score} time={serial_time:.2f}s nodes={ai.last_search.nodes}")
+
+    base_time = None
+    for workers in range(1, max_workers + 1):
+        with ParallelSearcher(workers) as searcher:
+            searcher.search(state, 1)   # warm up the pool and the lookup tables
+            searcher.reset_tables()
+            t0 = time.perf_counter()
+            move, score = searcher.search(state, depth, orderer=MoveOrderer())
+            dt = time.perf_counter() - t0
+        base_time = base_time or dt
+        same = "same" if (move, score) == (serial_move, serial_score) else "DIFFERENT"
+        print(f"{workers:>2} workers: move={move} score={score} time={dt:.2f}s "
+              f"speedup={base_time / dt:.2f}x vs 1 worker, {serial_time / dt:.2f}x vs serial "
+              f"nodes={searcher.nodes} ({same})")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Parallel root search scaling report")
+    parser.add_argument("--depth", type=int, default=6)
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    s = do.new_game()
+    for b, c in [(4, 4), (4, 0), (0, 4), (4, 8), (8, 4)]:
+        do.apply_move(s, b, c, s.current_turn)
+    scaling_report(s, args.depth, args.max_workers)
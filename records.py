@@ -0,0 +1,276 @@
+"""
+Game records: a compact binary format, a text notation, and streaming readers.
+
+Binary file:
+
+    header  b"STTR", version u16, 2 reserved bytes
+    games   per game: move count u8, result u8 (0 unfinished, 1 X won, 2 O won,
+            3 draw), then one byte per move (b*9+c)
+    index   (written by RecordWriter.close) one u64 offset per game, then the
+            game count u64 and b"STTI"
+
+A file without the index (e.g. the writer was killed) is still readable: the
+archive rebuilds the index by walking the game headers.
+
+Text notation: moves as two digits "bc" (board, cell), then the result token
+("1-0" X won, "0-1" O won, "1/2" draw, "*" unfinished):
+
+    44 40 04 48 84 ... 1-0
+
+    with RecordWriter("games.bin") as w:
+        w.write(moves, result)
+    for moves, result in read_games("games.bin"): ...          # streaming, constant memory
+    archive = GameArchive("games.bin"); moves, result = archive[123456]
+    for boards, forced, turn, result in feature_batches("games.bin", 4096): ...
+"""
+import mmap
+import struct
+
+import game_rules as do
+
+MAGIC = b"STTR"
+INDEX_MAGIC = b"STTI"
+VERSION = 1
+FILE_HEADER = struct.Struct("<4sHxx")
+GAME_HEADER = struct.Struct("<BB")
+FOOTER = struct.Struct("<Q4s")
+
+# result byte <-> game_result (None = unfinished)
+RESULT_CODES = {None: 0, 1: 1, -1: 2, 0: 3}
+CODE_RESULTS = {v: k for k, v in RESULT_CODES.items()}
+RESULT_TOKENS = {None: "*", 1: "1-0", -1: "0-1", 0: "1/2"}
+TOKEN_RESULTS = {v: k for k, v in RESULT_TOKENS.items()}
+
+MOVES = tuple((m // 9, m % 9) for m in range(81))   # move byte -> (b, c)
+
+
+# -------------------------
+# Text notation
+# -------------------------
+def game_to_text(moves, result=None):
+    return " ".join([f"{b}{c}" for b, c in moves] + [RESULT_TOKENS[result]])
+
+def game_from_text(text):
+    """(moves, result) from the text notation; the result token is optional."""
+    tokens = text.split()
+    result = None
+    if tokens and tokens[-1] in TOKEN_RESULTS:
+        result = TOKEN_RESULTS[tokens.pop()]
+    moves = []
+    for tok in tokens:
+        if len(tok) != 2 or not tok.isdigit() or "9" in tok:
+            raise ValueError(f"bad move {tok!r}")
+        moves.append((int(tok[0]), int(tok[1])))
+    return moves, result
+
+def state_record(state):
+    """(moves, result) for a game_rules.State, from its move_stack."""
+    moves = [(rec[0], rec[1]) for rec in state.move_stack]
+    return moves, (state.game_result if state.game_over else None)
+
+
+# -------------------------
+# Binary writer / readers
+# -------------------------
+class RecordWriter:
+    """Appends games to a new file; close() writes the index. Usable as a context manager."""
+
+    def __init__(self, path) -> None:
+        self.f = open(path, "wb")
+        self.f.write(FILE_HEADER.pack(MAGIC, VERSION))
+        self.offsets = []
+        self.pos = FILE_HEADER.size
+
+    def write(self, moves, result=None):
+        if len(moves) > 81:
+            raise ValueError("a game has at most 81 moves")
+        data = GAME_HEADER.pack(len(moves), RESULT_CODES[result]) + bytes(b * 9 + c for b, c in moves)
+        self.f.write(data)
+        self.offsets.append(self.pos)
+        self.pos += len(data)
+
+    def close(self):
+        if self.f.closed:
+            return
+        self.f.write(struct.pack(f"<{len(self.offsets)}Q", *self.offsets))
+        self.f.write(FOOTER.pack(len(self.offsets), INDEX_MAGIC))
+        self.f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def write_games(path, games):
+    """Write an iterable of (moves, result); returns the number of games."""
+    with RecordWriter(path) as w:
+        for moves, result in games:
+            w.write(moves, result)
+        return len(w.offsets)
+
+def _decode(mm, offset):
+    n, code = GAME_HEADER.unpack_from(mm, offset)
+    start = offset + GAME_HEADER.size
+    data = mm[start:start + n]
+    return [MOVES[m] for m in data], CODE_RESULTS[code]
+
+
+class GameArchive:
+    """Memory-mapped, random-access view of a record file: len(), archive[i], iteration."""
+
+    def __init__(self, path) -> None:
+        with open(path, "rb") as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version = FILE_HEADER.unpack_from(self.mm, 0)
+        if magic != MAGIC or version != VERSION:
+            self.mm.close()
+            raise ValueError(f"{path} is not a version {VERSION} game record file")
+        self.offsets, self.end = self._load_index()
+
+    def _load_index(self):
+        mm = self.mm
+        size = len(mm)
+        if size >= FILE_HEADER.size + FOOTER.size:
+            count, magic = FOOTER.unpack_from(mm, size - FOOTER.size)
+            index_start = size - FOOTER.size - 8 * count
+            if magic == INDEX_MAGIC and index_start >= FILE_HEADER.size:
+                return memoryview(mm)[index_start:size - FOOTER.size].cast("Q"), index_start
+        # no index: walk the game headers, stopping at a truncated game
+        offsets = []
+        pos = FILE_HEADER.size
+        while pos + GAME_HEADER.size <= size:
+            n = mm[pos]
+            if pos + GAME_HEADER.size + n > size:
+                break
+            offsets.append(pos)
+            pos += GAME_HEADER.size + n
+        return offsets, pos
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self.offsets)
+        return _decode(self.mm, self.offsets[i])
+
+    def __iter__(self):
+        for off in self.offsets:
+            yield _decode(self.mm, off)
+
+    def close(self):
+        if isinstance(self.offsets, memoryview):
+            self.offsets.release()
+        self.mm.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def read_games(path):
+    """Stream (moves, result) from a record file, one game at a time."""
+    archive = GameArchive(path)
+    try:
+        yield from archive
+    finally:
+        archive.close()
+
+
+# -------------------------
+# Replaying
+# -------------------------
+def replay(moves, backend=do):
+    """Yield the position after each move. The same state object is reused, so copy it to keep one."""
+    s = backend.new_game()
+    for b, c in moves:
+        backend.apply_move(s, b, c, s.current_turn)
+        yield s
+
+def iter_positions(path, backend=do):
+    """Stream (game index, ply, state, result) for every position in a file (state reused per game)."""
+    for i, (moves, result) in enumerate(read_games(path)):
+        for ply, s in enumerate(replay(moves, backend), 1):
+            yield i, ply, s, result
+
+def feature_batches(path, batch_size=4096):
+    """
+    Stream every position as NumPy batches (boards (N,9,9) int8, forced (N,) int8
+    with -1 for a free move, turn (N,) int8, result (N,) int8 with 2 for an
+    unfinished game), the input format of batch_eval.
+    """
+    import numpy as np
+
+    boards = np.zeros((batch_size, 9, 9), dtype=np.int8)
+    forced = np.empty(batch_size, dtype=np.int8)
+    turn = np.empty(batch_size, dtype=np.int8)
+    result = np.empty(batch_size, dtype=np.int8)
+    grid = np.zeros((9, 9), dtype=np.int8)
+    n = 0
+    for moves, res in read_games(path):
+        grid[:] = 0
+        label = 2 if res is None else res
+        for s in replay(moves):
+            b, c = s.move_stack[-1][0], s.move_stack[-1][1]
+            grid[b, c] = -s.current_turn    # the side that just moved
+            boards[n] = grid
+            forced[n] = -1 if s.forced_board is None else s.forced_board
+            turn[n] = s.current_turn
+            result[n] = label
+            n += 1
+            if n == batch_size:
+                yield boards.copy(), forced.copy(), turn.copy(), result.copy()
+                n = 0
+    if n:
+        yield boards[:n].copy(), forced[:n].copy(), turn[:n].copy(), result[:n].copy()
+
+
+if __name__ == "__main__":
+    import os
+    import random
+    import tempfile
+    import time
+
+    # round trip random games through both formats, then time streaming and random access
+    rng = random.Random(0)
+    games = []
+    for _ in range(20_000):
+        s = do.new_game()
+        while not s.game_over:
+            moves = [(b, c) for b in do.playable_boards_list(s) for c in range(9) if s.boards[b][c] == 0]
+            do.apply_move(s, *rng.choice(moves), s.current_turn)
+            do.check_game_over(s)
+        if rng.random() < 0.1:
+            do.undo_move(s)   # some unfinished games
+        games.append(state_record(s))
+
+    for g in games[:1000]:
+        assert game_from_text(game_to_text(*g)) == g
+
+    path = os.path.join(tempfile.mkdtemp(), "games.bin")
+    t0 = time.perf_counter()
+    write_games(path, games)
+    t_write = time.perf_counter() - t0
+    size = os.path.getsize(path)
+
+    t0 = time.perf_counter()
+    assert list(read_games(path)) == games
+    t_read = time.perf_counter() - t0
+
+    with GameArchive(path) as archive:
+        picks = [rng.randrange(len(archive)) for _ in range(10_000)]
+        t0 = time.perf_counter()
+        for i in picks:
+            assert archive[i] == games[i]
+        t_random = time.perf_counter() - t0
+
+    plies = sum(len(m) for m, _ in games)
+    print(f"{len(games)} games, {plies} moves: {size} bytes ({size / len(games):.1f} per game)")
+    print(f"write {len(games) / t_write:,.0f} games/s, stream {len(games) / t_read:,.0f} games/s, "
+          f"random access {t_random / len(picks) * 1e6:.1f} us/game")
+
+    t0 = time.perf_counter()
+    positions = sum(len(batch[0]) for batch in feature_batches(path))
+    print(f"feature_batches: {positions} positions, {positions / (time.perf_counter() - t0):,.0f} positions/s")
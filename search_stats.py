@@ -0,0 +1,120 @@
+"""
+Optional instrumentation for ai.minimax.
+
+Pass a SearchStats to best_move_minimax / best_move_iterative (stats=...) and it
+is filled in during the search; with no SearchStats attached, minimax only pays
+for a few `is None` checks per node.
+
+    stats = SearchStats()
+    ai.best_move_iterative(state, 2.0, stats=stats)
+    print(stats.report())
+
+Hooks: `profiler` is anything with enable()/disable() (e.g. cProfile.Profile()),
+switched on for the duration of the search. `on_sample(stats, state, ply)` is
+called every `sample_every` nodes, e.g. to record where a slow search spends
+its time.
+"""
+import time
+
+MAX_PLY = 82
+
+
+class SearchStats:
+
+    def __init__(self, profiler=None, on_sample=None, sample_every=1024) -> None:
+        self.profiler = profiler
+        self.on_sample = on_sample
+        self.sample_every = sample_every
+
+        self.source = "search"           # or "book" / "solver" when best_move_iterative didn't search
+        self.depth = 0                   # last completed depth (solver: plies to the end of the game)
+        self.nodes = 0
+        self.nodes_per_ply = [0] * MAX_PLY
+        self.interior_nodes = 0          # nodes that generated and searched moves
+        self.cutoffs = 0
+        self.cutoff_index = [0] * MAX_PLY  # cutoff_index[i]: cutoffs on the i-th move tried
+        self.eval_calls = 0
+        self.eval_time = 0.0
+        self.movegen_calls = 0
+        self.movegen_time = 0.0
+        self.tt_probes = 0
+        self.tt_hits = 0
+        self.time_to_depth = []          # (depth, seconds since start, nodes so far)
+        self.elapsed = 0.0
+        self._start = 0.0
+
+    def start(self):
+        self._start = time.perf_counter()
+        if self.profiler is not None:
+            self.profiler.enable()
+
+    def finish(self, nodes):
+        if self.profiler is not None:
+            self.profiler.disable()
+        self.nodes = nodes
+        self.elapsed = time.perf_counter() - self._start
+
+    def answered(self, source, depth, nodes, elapsed):
+        """Fill in a move that came from `source` ("book" or "solver") instead of a search."""
+        self.source = source
+        self.depth = depth
+        self.nodes = nodes
+        self.elapsed = elapsed
+
+    def depth_done(self, depth, nodes):
+        self.depth = depth
+        self.time_to_depth.append((depth, time.perf_counter() - self._start, nodes))
+
+    def record_cutoff(self, index):
+        self.cutoffs += 1
+        self.cutoff_index[index] += 1
+
+    def cutoff_rate(self):
+        """Share of expanded nodes that ended in a beta cutoff."""
+        return self.cutoffs / self.interior_nodes if self.interior_nodes else 0.0
+
+    def first_move_cutoff_rate(self):
+        """Share of cutoffs that came from the first move tried (move ordering quality)."""
+        return self.cutoff_index[0] / self.cutoffs if self.cutoffs else 0.0
+
+    def to_dict(self):
+        last_ply = max((i for i, n in enumerate(self.nodes_per_ply) if n), default=-1)
+        last_cut = max((i for i, n in enumerate(self.cutoff_index) if n), default=-1)
+        return {
+            "source": self.source,
+            "depth": self.depth,
+            "nodes": self.nodes,
+            "elapsed": self.elapsed,
+            "nodes_per_second": self.nodes / self.elapsed if self.elapsed else 0.0,
+            "nodes_per_ply": self.nodes_per_ply[:last_ply + 1],
+            "interior_nodes": self.interior_nodes,
+            "cutoffs": self.cutoffs,
+            "cutoff_rate": self.cutoff_rate(),
+            "first_move_cutoff_rate": self.first_move_cutoff_rate(),
+            "cutoff_index": self.cutoff_index[:last_cut + 1],
+            "eval_calls": self.eval_calls,
+            "eval_time": self.eval_time,
+            "movegen_calls": self.movegen_calls,
+            "movegen_time": self.movegen_time,
+            "tt_probes": self.tt_probes,
+            "tt_hits": self.tt_hits,
+            "tt_hit_rate": self.tt_hits / self.tt_probes if self.tt_probes else 0.0,
+            "time_to_depth": self.time_to_depth,
+        }
+
+    def report(self):
+        d = self.to_dict()
+        lines = [
+            f"{d['source']}, depth {d['depth']}",
+            f"nodes {d['nodes']} in {d['elapsed']:.3f}s ({d['nodes_per_second']:.0f}/s)",
+            f"nodes per ply: {d['nodes_per_ply']}",
+            f"cutoffs: {d['cutoffs']} ({d['cutoff_rate']:.1%} of expanded nodes, "
+            f"{d['first_move_cutoff_rate']:.1%} on the first move)",
+            f"cutoff position in move list: {d['cutoff_index'][:10]}",
+            f"evaluate: {d['eval_calls']} calls, {d['eval_time'] * 1000:.1f} ms",
+            f"legal_moves: {d['movegen_calls']} calls, {d['movegen_time'] * 1000:.1f} ms",
+            f"tt: {d['tt_hits']}/{d['tt_probes']} hits ({d['tt_hit_rate']:.1%})",
+        ]
+        for depth, seconds, nodes in d["time_to_depth"]:
+            lines.append(f"  depth {depth:>2}: {seconds * 1000:8.1f} ms, {nodes} nodes")
+        return "\n".join(lines)
@@ -0,0 +1,202 @@
+"""
+Headless AI-vs-AI matches for comparing search settings and evaluation weights.
+
+Each player is a config string of key=value pairs: `depth` (fixed-depth search),
+`time` (seconds per move, iterative deepening capped at `depth`), `weights` (a
+weights file from tune.py) and any of the weights in ai.WEIGHT_NAMES. Weights
+not given keep their hand-picked values (ai.DEFAULT_WEIGHTS). Games are played in pairs from the same random
+opening with colours swapped, spread over a process pool, and written to JSONL
+as they finish.
+
+    python selfplay.py --games 1000 --a "depth=3" --b "depth=3,WM_FORK=12" --out match.jsonl
+    python selfplay.py --games 400 --a "depth=3,weights=weights.json" --b "depth=3"
+"""
+import argparse
+import json
+import math
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import ai
+import game_rules as do
+from move_ordering import MoveOrderer
+from records import RecordWriter
+from transposition import TranspositionTable
+
+SELFPLAY_TT_MB = 8
+
+_search_tables = {}   # per worker process: config name -> (TranspositionTable, MoveOrderer)
+
+
+def parse_config(text, name):
+    """'depth=4,time=0.5,WM_FORK=10' -> config dict."""
+    config = {"name": name, "depth": 3, "time": None, "weights": {}}
+    for item in filter(None, (p.strip() for p in text.split(","))):
+        key, _, value = item.partition("=")
+        key = key.strip()
+        if key == "depth":
+            config["depth"] = int(value)
+        elif key == "time":
+            config["time"] = float(value)
+        elif key == "weights":
+            config["weights"].update(ai.read_weights(value.strip()))
+        elif key in ai.WEIGHT_NAMES:
+            config["weights"][key] = float(value)
+        else:
+            raise ValueError(f"unknown config key {key!r}")
+    config["all_weights"] = {**ai.DEFAULT_WEIGHTS, **config["weights"]}
+    return config
+
+def random_opening(state, plies, rng):
+    """Play `plies` random legal moves; returns them."""
+    opening = []
+    for _ in range(plies):
+        if ai.terminal_value(state)[0]:
+            break
+        b, c = rng.choice(ai.legal_moves(state))
+        do.apply_move(state, b, c, state.current_turn)
+        opening.append((b, c))
+    return opening
+
+def choose_move(state, config):
+    tt, orderer = _search_tables[config["name"]]
+    ai.use_weights(config["all_weights"])   # a no-op unless the other side moved last with different weights
+    if config["time"] is not None:
+        # no book: it was built with the default weights, and it would hide the difference being measured
+        return ai.best_move_iterative(state, config["time"], config["depth"], tt=tt, orderer=orderer, use_book=False)
+    return ai.best_move_minimax(state, config["depth"], tt=tt, orderer=orderer)
+
+def play_game(index, config_x, config_o, opening_plies, seed):
+    """Play one game; returns its JSON record (result is from X's point of view)."""
+    t0 = time.perf_counter()
+    for config in (config_x, config_o):
+        # fresh tables every game so results don't depend on which games a worker ran before
+        _search_tables[config["name"]] = (TranspositionTable(SELFPLAY_TT_MB), MoveOrderer())
+
+    state = do.new_game()
+    opening = random_opening(state, opening_plies, random.Random(seed))
+    moves = []
+    nodes = 0
+    while True:
+        is_term, _ = ai.terminal_value(state)
+        if is_term:
+            break
+        config = config_x if state.current_turn == ai.HUMAN else config_o   # HUMAN is X
+        (b, c), _ = choose_move(state, config)
+        nodes += ai.last_search.nodes
+        do.apply_move(state, b, c, state.current_turn)
+        moves.append((b, c))
+    do.check_game_over(state)
+
+    return {
+        "game": index,
+        "x": config_x["name"],
+        "o": config_o["name"],
+        "result": state.game_result,
+        "opening": opening,
+        "moves": moves,
+        "nodes": nodes,
+        "seconds": round(time.perf_counter() - t0, 4),
+    }
+
+def score_for(record, name):
+    """1 / 0.5 / 0 for the player called `name`."""
+    if record["result"] == 0:
+        return 0.5
+    winner = record["x"] if record["result"] == 1 else record["o"]
+    return 1.0 if winner == name else 0.0
+
+def elo_from_score(p):
+    p = min(max(p, 1e-6), 1 - 1e-6)
+    return -400 * math.log10(1 / p - 1)
+
+def summarize(records, name="A", z=1.96):
+    """Win/draw/loss counts for `name`, Elo difference and its confidence interval."""
+    scores = [score_for(r, name) for r in records]
+    n = len(scores)
+    wins = sum(1 for x in scores if x == 1.0)
+    draws = sum(1 for x in scores if x == 0.5)
+    losses = n - wins - draws
+    if n == 0:
+        return {"games": 0, "wins": 0, "draws": 0, "losses": 0}
+    p = sum(scores) / n
+    var = sum((x - p) ** 2 for x in scores) / n
+    se = math.sqrt(var / n)
+    return {
+        "games": n,
+        "wins": wins,
+        "draws": draws,
+        "losses": losses,
+        "score": p,
+        "elo": elo_from_score(p),
+        "elo_low": elo_from_score(p - z * se),
+        "elo_high": elo_from_score(p + z * se),
+    }
+
+def run_match(config_a, config_b, games, workers=None, opening_plies=4, out=None, seed=0, game_records=None,
+              paired=True):
+    """
+    Play `games` games between two configs and stream records to `out` (a path) as
+    they finish. `game_records` is an optional path for the games in the binary
+    records.py format. With paired=False every game gets its own opening (for
+    generating data rather than comparing configs). Returns (records, summary);
+    the summary includes games_per_second.
+    """
+    jobs = []
+    for i in range(games):
+        pair_seed = seed * 1_000_003 + (i // 2 if paired else i)   # paired: both colours get the same opening
+        x, o = (config_a, config_b) if i % 2 == 0 else (config_b, config_a)
+        jobs.append((i, x, o, opening_plies, pair_seed))
+
+    records = []
+    t0 = time.perf_counter()
+    sink = open(out, "w") if out else None
+    writer = RecordWriter(game_records) if game_records else None
+    try:
+        with ProcessPoolExecutor(workers) as pool:
+            futures = [pool.submit(play_game, *job) for job in jobs]
+            for future in as_completed(futures):
+                record = future.result()
+                records.append(record)
+                if sink is not None:
+                    sink.write(json.dumps(record) + "\n")
+                    sink.flush()
+                if writer is not None:
+                    writer.write(record["opening"] + record["moves"], record["result"])
+    finally:
+        if sink is not None:
+            sink.close()
+        if writer is not None:
+            writer.close()
+    elapsed = time.perf_counter() - t0
+
+    summary = summarize(records, config_a["name"])
+    summary["seconds"] = elapsed
+    summary["games_per_second"] = len(records) / elapsed if elapsed > 0 else 0.0
+    return records, summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Headless AI-vs-AI match")
+    parser.add_argument("--a", default="depth=3", help="config for player A, e.g. 'depth=3,WM_FORK=10'")
+    parser.add_argument("--b", default="depth=3", help="config for player B")
+    parser.add_argument("--games", type=int, default=100)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--opening-plies", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default="selfplay.jsonl")
+    parser.add_argument("--records", help="also save the games here in the binary records.py format")
+    args = parser.parse_args()
+
+    a = parse_config(args.a, "A")
+    b = parse_config(args.b, "B")
+    _, summary = run_match(a, b, args.games, args.workers, args.opening_plies, args.out, args.seed,
+                            args.records)
+    print(f"A: {args.a}  vs  B: {args.b}")
+    print(f"games={summary['games']}  A wins={summary['wins']} draws={summary['draws']} losses={summary['losses']}")
+    if summary["games"]:
+        print(f"score={summary['score']:.3f}  elo={summary['elo']:+.1f} "
+              f"[{summary['elo_low']:+.1f}, {summary['elo_high']:+.1f}]")
+    print(f"{summary['games_per_second']:.2f} games/s over {summary['seconds']:.1f}s")
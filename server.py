@@ -0,0 +1,381 @@
+"""
+AI move server: JSON lines over TCP, searches in a process pool.
+
+Each request is one JSON object per line, and each response is one line with
+the same "id":
+
+    {"id": 1, "position": "<notation.py position>", "depth": 6}
+    {"id": 2, "position": "...", "time": 0.5, "depth": 12}     # iterative deepening, depth as a cap
+    {"id": 3, "cmd": "stats"}
+
+    -> {"id": 1, "move": [4, 0], "score": -9.0, "pv": [[4, 0], ...], "nodes": 611,
+        "depth": 6, "search_time": 0.05, "cached": false}
+
+Requests are keyed by symmetry.canonical() plus the search settings. A result
+already in the LRU cache is answered right away. A request identical to one
+being searched waits for that search instead of starting another. Everything
+else goes on a bounded queue, and when the queue is full the server answers
+{"error": "overloaded"} instead of letting latency grow. A dispatcher takes
+queued jobs in batches of up to --batch, each batch one pool task, with at most
+one batch per worker in flight. If a worker process dies, the requests in its
+batch get an error and the pool is replaced ("pool_restarts" in the stats).
+
+    python server.py serve --port 7878 --workers 4
+    python server.py loadtest --port 7878 --requests 2000 --concurrency 32
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import time
+from collections import OrderedDict
+from concurrent.futures import BrokenExecutor, ProcessPoolExecutor
+
+import ai
+import game_rules as do
+import symmetry
+from notation import position_from_text, position_to_text
+
+HOST = "127.0.0.1"
+PORT = 7878
+DEFAULT_DEPTH = 4
+MAX_DEPTH = 12
+MAX_TIME = 10.0
+
+
+def _init_worker():
+    ai.micro_table(), ai.macro_table(), ai.status_tables()
+
+def _search(text, depth, time_budget):
+    state = position_from_text(text)
+    if time_budget is not None:
+        move, score = ai.best_move_iterative(state, time_budget, depth)
+    else:
+        move, score = ai.best_move_minimax(state, depth)
+    ctx = ai.last_search
+    return {
+        "move": list(move),
+        "score": score,
+        "pv": [list(m) for m in ctx.pv],
+        "nodes": ctx.nodes,
+        "depth": ctx.depth_reached,
+        "proven": ctx.proven,
+    }
+
+def _search_batch(jobs):
+    """One pool task: [(text, depth, time)] -> [result or {"error": ...}]."""
+    out = []
+    for text, depth, time_budget in jobs:
+        t0 = time.perf_counter()
+        try:
+            result = _search(text, depth, time_budget)
+        except Exception as e:   # report it to the client rather than killing the batch
+            result = {"error": f"{type(e).__name__}: {e}"}
+        result["search_time"] = time.perf_counter() - t0
+        out.append(result)
+    return out
+
+
+class Job:
+    __slots__ = ("key", "text", "depth", "time", "future")
+
+    def __init__(self, key, text, depth, time_budget, future) -> None:
+        self.key = key
+        self.text = text
+        self.depth = depth
+        self.time = time_budget
+        self.future = future
+
+
+class MoveServer:
+
+    def __init__(self, workers=None, max_pending=256, batch_size=8, batch_wait=0.002, cache_size=10_000) -> None:
+        self.workers = workers or os.cpu_count() or 1
+        self.pool = ProcessPoolExecutor(self.workers, initializer=_init_worker)
+        self.batches = set()                 # running batch tasks (kept so they aren't garbage collected)
+        self.max_pending = max_pending
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait        # seconds to wait for a batch to fill up
+        self.cache_size = cache_size
+        self.cache = OrderedDict()           # key -> result (canonical orientation)
+        self.inflight = {}                   # key -> asyncio.Future of a queued or running search
+        self.queue = None
+        self.slots = None
+        self.counts = {"requests": 0, "cache_hits": 0, "deduplicated": 0, "rejected": 0,
+                       "errors": 0, "searches": 0, "batches": 0, "pool_restarts": 0}
+
+    # ---------------------------
+    # requests
+    # ---------------------------
+    def _localize(self, result, t):
+        """Map a cached (canonical orientation) result back to the requester's orientation."""
+        if "error" in result:
+            return dict(result)
+        out = dict(result)
+        out["move"] = list(symmetry.inverse_move(result["move"], t))
+        out["pv"] = [list(symmetry.inverse_move(m, t)) for m in result["pv"]]
+        return out
+
+    async def handle(self, request):
+        if request.get("cmd") == "stats":
+            return {**self.counts, "cached_positions": len(self.cache),
+                    "queued": self.queue.qsize(), "in_flight": len(self.inflight)}
+        self.counts["requests"] += 1
+
+        try:
+            position = request["position"]
+            if not isinstance(position, str):
+                raise TypeError("position must be a string")
+            state = position_from_text(position)
+            depth = int(request.get("depth", DEFAULT_DEPTH))
+            time_budget = request.get("time")
+            if time_budget is not None:
+                time_budget = float(time_budget)
+                if not (math.isfinite(time_budget) and time_budget > 0):
+                    raise ValueError("time must be a positive number of seconds")
+                time_budget = min(time_budget, MAX_TIME)
+            depth = max(1, min(depth, MAX_DEPTH))
+        except (KeyError, TypeError, ValueError) as e:
+            self.counts["errors"] += 1
+            return {"error": f"bad request: {e}"}
+        if ai.terminal_value(state)[0]:
+            return {"error": "game is over"}
+
+        h, t = symmetry.canonical(state)
+        key = (h, depth, time_budget)
+        if key in self.cache:
+            self.cache.move_to_end(key)
+            self.counts["cache_hits"] += 1
+            return {**self._localize(self.cache[key], t), "cached": True}
+
+        future = self.inflight.get(key)
+        if future is not None:
+            self.counts["deduplicated"] += 1
+        else:
+            if self.queue.full():
+                self.counts["rejected"] += 1
+                return {"error": "overloaded"}
+            future = asyncio.get_running_loop().create_future()
+            self.inflight[key] = future
+            text = position_to_text(symmetry.transform_state(state, t))
+            self.queue.put_nowait(Job(key, text, depth, time_budget, future))
+        result = await asyncio.shield(future)
+        return {**self._localize(result, t), "cached": False}
+
+    # ---------------------------
+    # batching
+    # ---------------------------
+    def _restart_pool(self):
+        """Replace a broken pool; batches already on the old one fail on their own."""
+        old, self.pool = self.pool, ProcessPoolExecutor(self.workers, initializer=_init_worker)
+        self.counts["pool_restarts"] += 1
+        old.shutdown(wait=False, cancel_futures=True)
+
+    async def _dispatch(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.batch_wait
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                    continue
+                except asyncio.QueueEmpty:
+                    pass
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            await self.slots.acquire()
+            self.counts["batches"] += 1
+            task = loop.create_task(self._run_batch(batch))
+            self.batches.add(task)
+            task.add_done_callback(self.batches.discard)
+
+    async def _run_batch(self, batch):
+        loop = asyncio.get_running_loop()
+        try:
+            results = await loop.run_in_executor(self.pool, _search_batch, [(j.text, j.depth, j.time) for j in batch])
+        except Exception as e:   # worker crashed or the pool is broken: fail the batch, keep serving
+            if isinstance(e, BrokenExecutor):
+                self._restart_pool()
+            for job in batch:
+                self.inflight.pop(job.key, None)
+                if not job.future.done():
+                    job.future.set_exception(e)
+            return
+        finally:
+            self.slots.release()
+        for job, result in zip(batch, results):
+            self.counts["searches"] += 1
+            if "error" not in result:
+                self.cache[job.key] = result
+                if len(self.cache) > self.cache_size:
+                    self.cache.popitem(last=False)
+            self.inflight.pop(job.key, None)
+            if not job.future.done():
+                job.future.set_result(result)
+
+    # ---------------------------
+    # connections
+    # ---------------------------
+    async def _client(self, reader, writer):
+        lock = asyncio.Lock()
+        tasks = set()
+
+        async def respond(line):
+            try:
+                request = json.loads(line)
+                if not isinstance(request, dict):
+                    raise ValueError("request must be a JSON object")
+            except ValueError as e:
+                response = {"error": f"bad json: {e}"}
+                request = {}
+            else:
+                try:
+                    response = await self.handle(request)
+                except Exception as e:   # always answer, or the client waits forever
+                    self.counts["errors"] += 1
+                    response = {"error": f"{type(e).__name__}: {e}"}
+            if "id" in request:
+                response["id"] = request["id"]
+            async with lock:
+                writer.write(json.dumps(response).encode() + b"\n")
+                await writer.drain()
+
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                if line.strip():
+                    task = asyncio.create_task(respond(line))
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host=HOST, port=PORT, ready=None):
+        self.queue = asyncio.Queue(self.max_pending)
+        self.slots = asyncio.Semaphore(self.workers)
+        dispatcher = asyncio.create_task(self._dispatch())
+        server = await asyncio.start_server(self._client, host, port)
+        if ready is not None:
+            ready.set()
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            dispatcher.cancel()
+            self.pool.shutdown(cancel_futures=True)
+
+
+# -------------------------
+# Load test client
+# -------------------------
+def sample_positions(count, seed=0, max_plies=30):
+    """Position strings from random games."""
+    rng = random.Random(seed)
+    out = []
+    while len(out) < count:
+        s = do.new_game()
+        for _ in range(rng.randrange(max_plies)):
+            if ai.terminal_value(s)[0]:
+                break
+            b, c = rng.choice(ai.legal_moves(s))
+            do.apply_move(s, b, c, s.current_turn)
+        if not ai.terminal_value(s)[0]:
+            out.append(position_to_text(s))
+    return out
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return 0.0
+    i = min(len(sorted_values) - 1, int(round(p / 100 * (len(sorted_values) - 1))))
+    return sorted_values[i]
+
+async def load_test(host=HOST, port=PORT, requests=1000, concurrency=16, depth=DEFAULT_DEPTH,
+                    distinct=200, seed=0):
+    """
+    `concurrency` connections send `requests` in total, one at a time each,
+    drawn from `distinct` positions (so some repeat and hit the cache).
+    Returns latency percentiles, throughput and the outcome counts.
+    """
+    positions = sample_positions(distinct, seed)
+    rng = random.Random(seed + 1)
+    work = [rng.choice(positions) for _ in range(requests)]
+    latencies = []
+    outcomes = {"ok": 0, "cached": 0, "overloaded": 0, "error": 0}
+
+    async def client(index):
+        reader, writer = await asyncio.open_connection(host, port)
+        try:
+            for i in range(index, len(work), concurrency):
+                t0 = time.perf_counter()
+                writer.write(json.dumps({"id": i, "position": work[i], "depth": depth}).encode() + b"\n")
+                await writer.drain()
+                response = json.loads(await reader.readline())
+                latencies.append(time.perf_counter() - t0)
+                if response.get("error") == "overloaded":
+                    outcomes["overloaded"] += 1
+                elif "error" in response:
+                    outcomes["error"] += 1
+                else:
+                    outcomes["cached" if response["cached"] else "ok"] += 1
+        finally:
+            writer.close()
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(client(i) for i in range(concurrency)))
+    elapsed = time.perf_counter() - t0
+    latencies.sort()
+    return {
+        "requests": requests,
+        "elapsed": elapsed,
+        "requests_per_second": requests / elapsed,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "max_ms": latencies[-1] * 1000 if latencies else 0.0,
+        **outcomes,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="AI move server")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("serve")
+    p.add_argument("--host", default=HOST)
+    p.add_argument("--port", type=int, default=PORT)
+    p.add_argument("--workers", type=int, default=None)
+    p.add_argument("--max-pending", type=int, default=256, help="queued searches before answering 'overloaded'")
+    p.add_argument("--batch", type=int, default=8, help="max searches per pool task")
+    p.add_argument("--cache", type=int, default=10_000, help="cached results")
+    p = sub.add_parser("loadtest")
+    p.add_argument("--host", default=HOST)
+    p.add_argument("--port", type=int, default=PORT)
+    p.add_argument("--requests", type=int, default=1000)
+    p.add_argument("--concurrency", type=int, default=16)
+    p.add_argument("--depth", type=int, default=DEFAULT_DEPTH)
+    p.add_argument("--distinct", type=int, default=200, help="distinct positions to draw requests from")
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        server = MoveServer(args.workers, args.max_pending, args.batch, cache_size=args.cache)
+        print(f"serving on {args.host}:{args.port} with {server.workers} workers")
+        try:
+            asyncio.run(server.serve(args.host, args.port))
+        except KeyboardInterrupt:
+            pass
+    else:
+        report = asyncio.run(load_test(args.host, args.port, args.requests, args.concurrency,
+                                       args.depth, args.distinct))
+        print(json.dumps(report, indent=2))
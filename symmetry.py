@@ -0,0 +1,181 @@
+"""
+The 8 symmetries of the board (rotations and reflections).
+
+A symmetry moves both levels the same way: mini-board b goes to T[b], and cell
+c inside it goes to T[c]. The forced board goes along with the boards. The
+evaluation only looks at lines, centres and corners, so symmetric positions
+have the same score and symmetric moves have the same value.
+
+    h, t = canonical(state)           # smallest of the 8 hashes, and which transform gives it
+    m = inverse_move(stored, t)       # move stored for the canonical position -> move in `state`
+    moves = unique_moves(state, moves)  # drop moves that are mirror images of an earlier one
+
+ai.minimax uses unique_moves in the first SYMMETRY_PLIES plies, and the
+opening book is keyed by canonical().
+
+    python symmetry.py    # consistency checks and the effect on a search from the start position
+"""
+import random
+
+import game_rules as do
+from zobrist import CELL_KEYS, SIDE_KEY, FORCED_KEYS, full_hash
+
+
+def _perm(f):
+    return tuple(f(i // 3, i % 3)[0] * 3 + f(i // 3, i % 3)[1] for i in range(9))
+
+# TRANSFORMS[t][i] = where cell (or board) i goes under transform t; 0 is the identity
+TRANSFORMS = (
+    _perm(lambda r, c: (r, c)),
+    _perm(lambda r, c: (c, 2 - r)),        # rotate 90
+    _perm(lambda r, c: (2 - r, 2 - c)),    # rotate 180
+    _perm(lambda r, c: (2 - c, r)),        # rotate 270
+    _perm(lambda r, c: (r, 2 - c)),        # mirror left/right
+    _perm(lambda r, c: (2 - r, c)),        # mirror top/bottom
+    _perm(lambda r, c: (c, r)),            # main diagonal
+    _perm(lambda r, c: (2 - c, 2 - r)),    # anti-diagonal
+)
+INVERSE = tuple(next(u for u, U in enumerate(TRANSFORMS) if all(U[T[i]] == i for i in range(9)))
+                for T in TRANSFORMS)
+
+# SYM_KEYS[t][b][c][player]: the zobrist key of cell (b, c) after transform t
+SYM_KEYS = tuple(tuple(tuple(CELL_KEYS[T[b]][T[c]] for c in range(9)) for b in range(9)) for T in TRANSFORMS)
+SYM_FORCED = tuple(tuple(FORCED_KEYS[T[b]] for b in range(9)) for T in TRANSFORMS)
+
+
+def transform_move(move, t):
+    T = TRANSFORMS[t]
+    return T[move[0]], T[move[1]]
+
+def inverse_move(move, t):
+    return transform_move(move, INVERSE[t])
+
+def transform_state(state, t):
+    """New game_rules.State with transform t applied (no move history)."""
+    T = TRANSFORMS[t]
+    s = do.new_game()
+    boards, main = state.boards, state.main_board
+    for b in range(9):
+        for c in range(9):
+            s.boards[T[b]][T[c]] = boards[b][c]
+        s.main_board[T[b]] = main[b]
+    for b in range(9):
+        s.micro_keys[b] = sum(do.POW3[c] * (v % 3) for c, v in enumerate(s.boards[b]))
+    s.main_key = sum(do.POW3[b] * (v % 3) for b, v in enumerate(s.main_board))
+    do.rebuild_masks(s)
+    s.current_turn = state.current_turn
+    s.forced_board = None if state.forced_board is None else T[state.forced_board]
+    s.game_over = state.game_over
+    s.game_result = state.game_result
+    s.hash = full_hash(s.boards, s.current_turn, s.forced_board)
+    return s
+
+def symmetric_hashes(state):
+    """The zobrist hash of the position under each of the 8 transforms (index 0 == state.hash)."""
+    hashes = [0] * 8
+    boards = state.boards
+    for b in range(9):
+        row = boards[b]
+        for c in range(9):
+            v = row[c]
+            if v != 0:
+                for t in range(8):
+                    hashes[t] ^= SYM_KEYS[t][b][c][v]
+    base = SIDE_KEY if state.current_turn == -1 else 0
+    fb = state.forced_board
+    for t in range(8):
+        hashes[t] ^= base ^ (0 if fb is None else SYM_FORCED[t][fb])
+    return hashes
+
+def canonical(state):
+    """(canonical hash, transform): the smallest symmetric hash, first transform reaching it."""
+    hashes = symmetric_hashes(state)
+    h = min(hashes)
+    return h, hashes.index(h)
+
+def stabilizer(state):
+    """Transforms other than the identity that map the position onto itself."""
+    boards = state.boards
+    fb = state.forced_board
+    out = []
+    for t in range(1, 8):
+        T = TRANSFORMS[t]
+        if fb is not None and T[fb] != fb:
+            continue
+        if all(boards[T[b]][T[c]] == boards[b][c] for b in range(9) for c in range(9)):
+            out.append(t)
+    return out
+
+def unique_moves(state, moves):
+    """
+    `moves` without the ones that are a symmetric copy of another move, keeping
+    the smallest (b, c) of each group; order is otherwise unchanged.
+    """
+    stab = stabilizer(state)
+    if not stab:
+        return moves
+    return [m for m in moves if all(transform_move(m, t) >= m for t in stab)]
+
+def move_classes(state, moves):
+    """
+    {move: (representative, t)} for `moves`: the representative is the smallest
+    move of the move's mirror-image group (the one unique_moves keeps) and
+    transform t maps the move onto it (0 for the representative itself).
+    """
+    stab = [0] + stabilizer(state)
+    out = {}
+    for m in moves:
+        rep, t = min((transform_move(m, t), t) for t in stab)
+        out[m] = (rep, t)
+    return out
+
+
+# -------------------------
+# Checks
+# -------------------------
+def self_check(games=100, seed=0):
+    """Transforms agree with the zobrist keys, the evaluation and move legality; returns positions checked."""
+    import ai
+
+    rng = random.Random(seed)
+    checked = 0
+    for _ in range(games):
+        s = do.new_game()
+        while not ai.terminal_value(s)[0]:
+            hashes = symmetric_hashes(s)
+            score = ai.evaluate_full(s)
+            legal = set(ai.legal_moves(s))
+            for t in range(8):
+                u = transform_state(s, t)
+                assert u.hash == hashes[t]
+                assert ai.evaluate_full(u) == score
+                assert set(ai.legal_moves(u)) == {transform_move(m, t) for m in legal}
+                assert transform_state(u, INVERSE[t]).boards == s.boards
+            for t in stabilizer(s):
+                assert hashes[t] == s.hash
+            checked += 1
+            b, c = rng.choice(ai.legal_moves(s))
+            do.apply_move(s, b, c, s.current_turn)
+    return checked
+
+
+if __name__ == "__main__":
+    import ai
+    from move_ordering import MoveOrderer
+    from transposition import TranspositionTable
+
+    print(f"symmetry checks passed on {self_check()} positions")
+
+    starts = {"start": [], "center": [(4, 4)], "center reply": [(4, 4), (4, 0)]}
+    for name, line in starts.items():
+        s = do.new_game()
+        for b, c in line:
+            do.apply_move(s, b, c, s.current_turn)
+        moves = ai.legal_moves(s)
+        results = []
+        for plies in (0, ai.SYMMETRY_PLIES):
+            ai.SYMMETRY_PLIES = plies
+            move, score = ai.best_move_minimax(s, 4, tt=TranspositionTable(16), orderer=MoveOrderer())
+            results.append((plies, move, score, ai.last_search.nodes))
+        print(f"{name:<13} root moves {len(moves):>2} -> {len(unique_moves(s, moves)):>2}   "
+              + "   ".join(f"sym plies {p}: {mv} {sc:+g}, {n} nodes" for p, mv, sc, n in results))
@@ -0,0 +1,100 @@
+"""
+Bounded transposition table for ai.minimax, keyed by the zobrist hash (s.hash).
+
+Entries are (key, depth, flag, value, move, generation). The table is a fixed
+array of slots indexed by the low bits of the key; on a collision the deeper
+entry wins, except that entries left over from an older search are always
+replaced.
+"""
+
+EXACT = 0   # value is the true minimax value
+LOWER = 1   # search failed high: true value >= value
+UPPER = 2   # search failed low:  true value <= value
+
+# rough size of one stored entry in CPython (tuple + key + value + slot pointer)
+ENTRY_BYTES = 160
+
+
+class TranspositionTable:
+
+    def __init__(self, max_mb=64) -> None:
+        self.max_mb = max_mb
+        size = 1
+        while size * 2 * ENTRY_BYTES <= max_mb * 1024 * 1024:
+            size *= 2
+        self.size = size
+        self.mask = size - 1
+        self.slots = [None] * size
+        self.generation = 0
+        self.probes = 0
+        self.hits = 0
+        self.stores = 0
+
+    def new_search(self):
+        """Call once per root search so stale entries can be replaced first."""
+        self.generation += 1
+
+    def clear(self):
+        self.slots = [None] * self.size
+        self.generation = 0
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.probes = self.hits = self.stores = 0
+
+    def probe(self, key):
+        self.probes += 1
+        entry = self.slots[key & self.mask]
+        if entry is not None and entry[0] == key:
+            self.hits += 1
+            return entry
+        return None
+
+    def store(self, key, depth, flag, value, move):
+        i = key & self.mask
+        old = self.slots[i]
+        # depth-preferred: keep a deeper entry from the current search
+        if old is not None and old[0] != key and old[5] == self.generation and old[1] > depth:
+            return
+        self.slots[i] = (key, depth, flag, value, move, self.generation)
+        self.stores += 1
+
+    def hit_rate(self):
+        return self.hits / self.probes if self.probes else 0.0
+
+    def stats(self):
+        used = sum(1 for e in self.slots if e is not None)
+        return {
+            "probes": self.probes,
+            "hits": self.hits,
+            "hit_rate": self.hit_rate(),
+            "stores": self.stores,
+            "used": used,
+            "size": self.size,
+        }
+
+
+if __name__ == "__main__":
+    # Node counts for the AI's first few hard-mode moves with and without the table.
+    import random
+    import time
+    import ai
+    import game_rules as do
+
+    depth = 6   # main.HARD_DEPTH
+    for label, tt in (("no table", None), ("table", TranspositionTable())):
+        rng = random.Random(1)
+        s = do.new_game()
+        nodes = 0
+        t0 = time.perf_counter()
+        for ply in range(8):
+            if s.current_turn == ai.AI:
+                move, _ = ai.best_move_minimax(s, depth, tt=tt)
+                nodes += ai.last_search.nodes
+            else:
+                move = rng.choice(ai.legal_moves(s))
+            do.apply_move(s, move[0], move[1], s.current_turn)
+        line = f"{label:>9}: nodes={nodes} time={time.perf_counter() - t0:.2f}s"
+        if tt is not None:
+            line += f" hit_rate={tt.hit_rate():.1%}"
+        print(line)
@@ -0,0 +1,261 @@
+"""
+Texel-style tuning of the evaluation weights from self-play games.
+
+  generate  headless games (selfplay.run_match, the same config on both sides,
+            a random opening per game) saved in the records.py binary format
+  extract   stream every position of a record file through batch_eval in
+            chunks and append its features and label to flat float32 files
+  fit       fit the weights so that sigmoid(K * evaluation) predicts the game
+            result, by Adam on the squared error, reading the feature files
+            back chunk by chunk through np.memmap
+            -> weights.json, which ai loads at import (ai.WEIGHTS_PATH)
+
+The evaluation is linear in the eight batch_eval.FEATURE_NAMES weights, and
+the micro features are linear in MICRO_FORCED_MULT as well: with multiplier m
+they are F1 + (m - 1) * FF, F1 being the features at m = 1 and FF the forced
+board's share. So the model is
+
+    eval = (F1 + (m - 1) * FF) @ w
+
+and m is fitted together with w. MICRO_SCALE is folded into w and written as 1.
+Labels are the game result from the AI's (O's) side: 1 win, 0.5 draw, 0 loss.
+Finished positions and unfinished games are skipped. K is fitted first with
+the starting weights and then held fixed, since K and the scale of w would
+otherwise trade off.
+
+    python tune.py all --games 4000 --depth 2              # generate + extract + fit
+    python tune.py generate --games 4000 --records tune_data/games.bin
+    python tune.py extract --records tune_data/games.bin --data tune_data/positions
+    python tune.py fit --data tune_data/positions --epochs 20 --match 200
+"""
+import argparse
+import json
+import math
+import os
+import random
+import time
+
+import numpy as np
+
+import ai
+import batch_eval
+import records
+import selfplay
+
+TUNE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tune_data")
+GAMES_PATH = os.path.join(TUNE_DIR, "games.bin")
+DATA_PREFIX = os.path.join(TUNE_DIR, "positions")
+NF = len(batch_eval.FEATURE_NAMES)
+
+
+# -------------------------
+# Stage 1: games
+# -------------------------
+def generate(path=GAMES_PATH, games=4000, depth=2, workers=None, opening_plies=8, seed=0):
+    """Play `games` self-play games at `depth` (hand-picked weights) into a record file. Returns the match summary."""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    config = f"depth={depth}"
+    _, summary = selfplay.run_match(selfplay.parse_config(config, "A"), selfplay.parse_config(config, "B"),
+                                    games, workers, opening_plies, seed=seed, game_records=path, paired=False)
+    return summary
+
+
+# -------------------------
+# Stage 2: features on disk
+# -------------------------
+def _data_paths(prefix):
+    return prefix + ".f1", prefix + ".ff", prefix + ".y"
+
+def extract(records_path=GAMES_PATH, prefix=DATA_PREFIX, batch_size=8192):
+    """
+    Stream the positions of a record file into `prefix`.f1 / .ff (N x 8 float32)
+    and .y (N float32 labels). Returns N.
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(prefix)), exist_ok=True)
+    paths = _data_paths(prefix)
+    n = 0
+    with open(paths[0], "wb") as f1, open(paths[1], "wb") as ff, open(paths[2], "wb") as fy:
+        for boards, forced, _, result in records.feature_batches(records_path, batch_size):
+            at1, terminal, _ = batch_eval.batch_features(boards, forced, forced_mult=1.0)
+            at2, _, _ = batch_eval.batch_features(boards, forced, forced_mult=2.0)
+            keep = ~terminal & (result != 2)
+            at1[keep].astype(np.float32).tofile(f1)
+            (at2 - at1)[keep].astype(np.float32).tofile(ff)
+            (0.5 + 0.5 * ai.AI * result[keep]).astype(np.float32).tofile(fy)
+            n += int(keep.sum())
+    with open(prefix + ".json", "w") as f:
+        json.dump({"positions": n, "features": list(batch_eval.FEATURE_NAMES), "records": records_path}, f)
+    return n
+
+def load_data(prefix=DATA_PREFIX):
+    """(F1, FF, y) as read-only memmaps."""
+    with open(prefix + ".json") as f:
+        meta = json.load(f)
+    if meta["features"] != list(batch_eval.FEATURE_NAMES):
+        raise ValueError(f"{prefix} was extracted with features {meta['features']}")
+    n = meta["positions"]
+    p1, pf, py = _data_paths(prefix)
+    return (np.memmap(p1, np.float32, "r", shape=(n, NF)),
+            np.memmap(pf, np.float32, "r", shape=(n, NF)),
+            np.memmap(py, np.float32, "r", shape=(n,)))
+
+
+# -------------------------
+# Stage 3: fit
+# -------------------------
+def sigmoid(z):
+    return 1.0 / (1.0 + np.exp(-np.clip(z, -50.0, 50.0)))
+
+def start_params():
+    """(w, m) for the current ai weights (w as in batch_eval.weight_vector)."""
+    return batch_eval.weight_vector(), float(ai.MICRO_FORCED_MULT)
+
+def _chunk(data, span):
+    f1, ff, y = data
+    lo, hi = span
+    return (np.asarray(f1[lo:hi], dtype=np.float64), np.asarray(ff[lo:hi], dtype=np.float64),
+            np.asarray(y[lo:hi], dtype=np.float64))
+
+def loss(data, spans, w, m, k):
+    """Mean squared error of sigmoid(k * eval) against the labels over the given chunks."""
+    total, count = 0.0, 0
+    for span in spans:
+        f1, ff, y = _chunk(data, span)
+        err = sigmoid(k * ((f1 + (m - 1.0) * ff) @ w)) - y
+        total += float(err @ err)
+        count += len(y)
+    return total / max(count, 1)
+
+def fit_k(data, spans, w, m, lo=1e-4, hi=1.0, steps=40):
+    """Golden-section search for K on a log scale."""
+    a, b = math.log(lo), math.log(hi)
+    g = (math.sqrt(5) - 1) / 2
+    c, d = b - g * (b - a), a + g * (b - a)
+    fc, fd = loss(data, spans, w, m, math.exp(c)), loss(data, spans, w, m, math.exp(d))
+    for _ in range(steps):
+        if fc < fd:
+            b, d, fd = d, c, fc
+            c = b - g * (b - a)
+            fc = loss(data, spans, w, m, math.exp(c))
+        else:
+            a, c, fc = c, d, fd
+            d = a + g * (b - a)
+            fd = loss(data, spans, w, m, math.exp(d))
+    return math.exp((a + b) / 2)
+
+def fit(prefix=DATA_PREFIX, epochs=20, lr=0.1, chunk=4096, holdout=0.1, seed=0, progress=True):
+    """
+    Fit (w, m) on `prefix`, one Adam step per `chunk` positions. The last
+    `holdout` fraction of the positions (stored in game order, so mostly
+    games never seen in training) is kept out for validation. Returns (weights dict for
+    ai.set_weights, report dict).
+    """
+    data = load_data(prefix)
+    n = len(data[2])
+    if n < 2:
+        raise ValueError(f"{prefix} has too few positions")
+    split = max(1, min(n - 1, int(n * (1 - holdout))))
+    train = [(i, min(i + chunk, split)) for i in range(0, split, chunk)]
+    val = [(i, min(i + chunk, n)) for i in range(split, n, chunk)]
+
+    w, m = start_params()
+    k = fit_k(data, train, w, m)
+    start = {"train": loss(data, train, w, m, k), "val": loss(data, val, w, m, k)}
+    if progress:
+        print(f"{n} positions, K={k:.5f}, start loss train {start['train']:.5f} val {start['val']:.5f}")
+
+    # Adam over p = (w, m)
+    p = np.append(w, m)
+    mom, vel = np.zeros_like(p), np.zeros_like(p)
+    b1, b2, eps = 0.9, 0.999, 1e-8
+    rng = random.Random(seed)
+    step = 0
+    for epoch in range(1, epochs + 1):
+        order = train[:]
+        rng.shuffle(order)
+        for span in order:
+            f1, ff, y = _chunk(data, span)
+            w, m = p[:NF], p[NF]
+            feats = f1 + (m - 1.0) * ff
+            s = sigmoid(k * (feats @ w))
+            g = 2.0 * (s - y) * s * (1.0 - s) * k / len(y)    # d loss / d eval
+            grad = np.append(feats.T @ g, (ff @ w) @ g)
+            step += 1
+            mom = b1 * mom + (1 - b1) * grad
+            vel = b2 * vel + (1 - b2) * grad * grad
+            p -= lr * (mom / (1 - b1 ** step)) / (np.sqrt(vel / (1 - b2 ** step)) + eps)
+            p[NF] = max(p[NF], 0.0)   # the forced board can't count negatively
+        if progress:
+            print(f"epoch {epoch:>3}: train {loss(data, train, p[:NF], p[NF], k):.5f} "
+                  f"val {loss(data, val, p[:NF], p[NF], k):.5f}", flush=True)
+
+    w, m = p[:NF], float(p[NF])
+    report = {"positions": n, "K": k, "start": start,
+              "end": {"train": loss(data, train, w, m, k), "val": loss(data, val, w, m, k)}}
+    return params_to_weights(w, m), report
+
+def params_to_weights(w, m):
+    """(w, m) -> {name: value} for every ai weight, with MICRO_SCALE folded into w."""
+    weights = {name: round(float(v), 4) for name, v in zip(batch_eval.FEATURE_NAMES, w)}
+    weights["MICRO_FORCED_MULT"] = round(m, 4)
+    weights["MICRO_SCALE"] = 1.0
+    return weights
+
+def write_weights(weights, path=ai.WEIGHTS_PATH):
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(weights, f, indent=2)
+        f.write("\n")
+    os.replace(tmp, path)
+
+def compare(weights_path, games=200, depth=3, workers=None, seed=1):
+    """Match the weights file (A) against the hand-picked weights (B) at the same depth."""
+    a = selfplay.parse_config(f"depth={depth},weights={weights_path}", "A")
+    b = selfplay.parse_config(f"depth={depth}", "B")
+    _, summary = selfplay.run_match(a, b, games, workers, seed=seed)
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tune the evaluation weights from self-play")
+    sub = parser.add_subparsers(dest="command", required=True)
+    commands = {name: sub.add_parser(name) for name in ("generate", "extract", "fit", "all")}
+    for name in ("generate", "all"):
+        p = commands[name]
+        p.add_argument("--games", type=int, default=4000)
+        p.add_argument("--depth", type=int, default=2, help="search depth of the self-play games")
+        p.add_argument("--opening-plies", type=int, default=8)
+        p.add_argument("--seed", type=int, default=0)
+    for name in ("generate", "extract", "all"):
+        commands[name].add_argument("--records", default=GAMES_PATH)
+    for name in ("extract", "fit", "all"):
+        commands[name].add_argument("--data", default=DATA_PREFIX, help="path prefix of the feature files")
+    for name in ("fit", "all"):
+        p = commands[name]
+        p.add_argument("--epochs", type=int, default=20)
+        p.add_argument("--lr", type=float, default=0.1)
+        p.add_argument("--weights", default=ai.WEIGHTS_PATH, help="weights file to write")
+        p.add_argument("--match", type=int, default=0, help="then play this many depth-3 games against the defaults")
+    for p in commands.values():
+        p.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    if args.command in ("generate", "all"):
+        t0 = time.perf_counter()
+        summary = generate(args.records, args.games, args.depth, args.workers, args.opening_plies, args.seed)
+        print(f"generated {summary['games']} games in {time.perf_counter() - t0:.1f}s -> {args.records}")
+    if args.command in ("extract", "all"):
+        t0 = time.perf_counter()
+        n = extract(args.records, args.data)
+        print(f"extracted {n} positions in {time.perf_counter() - t0:.1f}s -> {args.data}.*")
+    if args.command in ("fit", "all"):
+        weights, report = fit(args.data, args.epochs, args.lr)
+        write_weights(weights, args.weights)
+        print(f"loss train {report['start']['train']:.5f} -> {report['end']['train']:.5f}, "
+              f"val {report['start']['val']:.5f} -> {report['end']['val']:.5f}")
+        print(json.dumps(weights))
+        print(f"wrote {args.weights}")
+        if args.match:
+            s = compare(args.weights, args.match, workers=args.workers)
+            print(f"tuned vs hand-picked, {s['games']} games at depth 3: +{s['wins']} ={s['draws']} -{s['losses']}, "
+                  f"elo {s['elo']:+.1f} [{s['elo_low']:+.1f}, {s['elo_high']:+.1f}]")
@@ -1,3 +1,6 @@
+import time
+from collections import deque
+
 import pygame
 
 # --- Constants ---
@@ -21,6 +24,11 @@ O_COLOR = (250, 7, 120)
 MAIN_W = 8
 THIN_W = 3
 GAP = MAIN_W // 2 + 10
+TINT_INSET = 2
+BANNER_H = 64
+HEAT_INSET = THIN_W      # keep hint squares off the mini grid lines
+HEAT_STEPS = 10          # heat values are rounded to this many steps (one cached overlay each)
+HEAT_ALPHA = 120
 
 
 
@@ -113,29 +121,298 @@ def draw_playable_tint(screen, boards_to_tint, alpha=64):
     Draw a translucent fill over each playable big board.
     alpha: 0..255 (higher = more opaque). 64 is subtle.
     """
-    inset = 2  # keep inside the thick borders
+    inset = TINT_INSET  # keep inside the thick borders
+    overlay = _overlay(BIG_CELL - 2*inset, BIG_CELL - 2*inset, (255, 255, 255, alpha))
     for b in boards_to_tint:
         br, bc = divmod(b, 3)
         x0 = MARGIN + bc * BIG_CELL
         y0 = MARGIN + br * BIG_CELL
-
-        w = BIG_CELL - 2*inset
-        h = BIG_CELL - 2*inset
-
-        # Make a per-pixel-alpha surface and fill with RGBA (white with alpha)
-        overlay = pygame.Surface((w, h), pygame.SRCALPHA)
-        overlay.fill((255, 255, 255, alpha))
         screen.blit(overlay, (x0 + inset, y0 + inset))
 
 def draw_banner(screen, text):
     # Backdrop strip
-    strip_h = 64
-    overlay = pygame.Surface((WIDTH, strip_h), pygame.SRCALPHA)
-    overlay.fill((0, 0, 0, 160))  # semi-transparent black
-    screen.blit(overlay, (0, 0))
+    screen.blit(_overlay(WIDTH, BANNER_H, (0, 0, 0, 160)), (0, 0))  # semi-transparent black
 
     # Text
-    font = pygame.font.SysFont(None, 42)  # default font, size 42
-    surf = font.render(text, True, WHITE)
-    rect = surf.get_rect(center=(WIDTH // 2, strip_h // 2))
+    surf = _text(text, 42)
+    rect = surf.get_rect(center=(WIDTH // 2, BANNER_H // 2))
     screen.blit(surf, rect.topleft)
+
+def draw_status(screen, text):
+    """Small line of text in the strip under the board (e.g. the AI's 'thinking' note)."""
+    surf = _text(text, 32)
+    rect = surf.get_rect(center=(WIDTH // 2, (MARGIN + GRID_SIZE + HEIGHT) // 2))
+    screen.blit(surf, rect.topleft)
+
+def heat_level(v):
+    """A 0..1 move rating (1 = best) rounded to one of HEAT_STEPS + 1 levels."""
+    return round(min(max(v, 0.0), 1.0) * HEAT_STEPS)
+
+def heat_overlay(level):
+    """Translucent cell square for a heat level: red (bad) through yellow to green (best)."""
+    t = level / HEAT_STEPS
+    if t < 0.5:
+        rgb = (220, int(60 + 340 * t), 40)
+    else:
+        rgb = (int(220 - 360 * (t - 0.5)), 230, int(40 + 60 * (t - 0.5)))
+    side = SMALL_CELL - 2 * HEAT_INSET
+    return _overlay(side, side, (*rgb, HEAT_ALPHA))
+
+def draw_heat(screen, heat):
+    """Hint heatmap: heat maps (b, c) to a level from heat_level."""
+    for (b, c), level in heat.items():
+        r = cell_rect(b, c)
+        screen.blit(heat_overlay(level), (r.x + HEAT_INSET, r.y + HEAT_INSET))
+
+
+# -------------------------
+# Cached surfaces and fonts
+# -------------------------
+_overlays = {}
+_fonts = {}
+_texts = {}
+
+def _overlay(w, h, rgba):
+    """A filled per-pixel-alpha surface, made once per size and color."""
+    key = (w, h, rgba)
+    surf = _overlays.get(key)
+    if surf is None:
+        surf = pygame.Surface((w, h), pygame.SRCALPHA)
+        surf.fill(rgba)
+        _overlays[key] = surf
+    return surf
+
+def _font(size):
+    font = _fonts.get(size)
+    if font is None:
+        font = _fonts[size] = pygame.font.SysFont(None, size)   # default font
+    return font
+
+def _text(text, size, color=WHITE):
+    """Rendered text, cached (the banner and status lines only ever show a handful of strings)."""
+    key = (text, size, color)
+    surf = _texts.get(key)
+    if surf is None:
+        if len(_texts) > 64:
+            _texts.clear()
+        surf = _texts[key] = _font(size).render(text, True, color)
+    return surf
+
+
+# -------------------------
+# Dirty-rect renderer
+# -------------------------
+def cell_rect(b, c):
+    br, bc = divmod(b, 3)
+    cr, cc = divmod(c, 3)
+    return pygame.Rect(MARGIN + bc * BIG_CELL + cc * SMALL_CELL, MARGIN + br * BIG_CELL + cr * SMALL_CELL,
+                       SMALL_CELL, SMALL_CELL)
+
+def board_rect(b):
+    br, bc = divmod(b, 3)
+    return pygame.Rect(MARGIN + bc * BIG_CELL, MARGIN + br * BIG_CELL, BIG_CELL, BIG_CELL)
+
+CELL_RECTS = [cell_rect(b, c) for b in range(9) for c in range(9)]   # index b*9+c
+BOARD_RECTS = [board_rect(b) for b in range(9)]
+BANNER_RECT = pygame.Rect(0, 0, WIDTH, BANNER_H)
+STATUS_RECT = pygame.Rect(0, MARGIN + GRID_SIZE, WIDTH, HEIGHT - MARGIN - GRID_SIZE)
+
+
+class Renderer:
+    """
+    Draws the game screen the way the draw_* functions above do, but only
+    repaints what changed since the last frame.
+
+    The grid is drawn once onto a background surface and the X / O marks once
+    as sprites. Each frame draw() compares the board with the previous frame
+    and collects dirty rects: single cells for new or undone marks, whole
+    boards when a big mark or the tint changes, and the banner and status
+    strips when their text changes. Every dirty rect is repainted from the
+    background up, clipped to the rect, so overlapping layers come out the
+    same as a full redraw. When nothing changed draw() returns [] without
+    touching the screen, and the caller can skip the display update.
+
+        renderer = Renderer(screen)
+        dirty = renderer.draw(state.boards, state.main_board, playable, banner, status)
+        if dirty:
+            pygame.display.update(dirty)
+    """
+
+    def __init__(self, screen, tint_alpha=64) -> None:
+        self.screen = screen
+        self.background = pygame.Surface(screen.get_size()).convert(screen)
+        draw_grid(self.background)
+
+        # sprites, drawn with the same coordinates as draw_marks / draw_big_marks
+        self.marks = {}
+        self.big_marks = {}
+        for v in (1, -1):
+            small = pygame.Surface((SMALL_CELL, SMALL_CELL), pygame.SRCALPHA)
+            board = [[0] * 9 for _ in range(9)]
+            board[0][0] = v
+            _draw_at(small, draw_marks, board)
+            self.marks[v] = small
+            big = pygame.Surface((BIG_CELL, BIG_CELL), pygame.SRCALPHA)
+            _draw_at(big, draw_big_marks, [v] + [0] * 8)
+            self.big_marks[v] = big
+        self.tint = _overlay(BIG_CELL - 2*TINT_INSET, BIG_CELL - 2*TINT_INSET, (255, 255, 255, tint_alpha))
+
+        self.frame_times = deque(maxlen=600)   # seconds per drawn frame
+        self.frames = 0
+        self.skipped = 0
+        self.invalidate()
+
+    def invalidate(self):
+        """Forget the last frame so the next draw() repaints everything (after a menu, a window expose, ...)."""
+        self.cells = None
+        self.big = None
+        self.tinted = frozenset()
+        self.heat = {}
+        self.banner = None
+        self.status = None
+
+    def draw(self, boards, main_board, tint=(), banner=None, status=None, heat=None):
+        """
+        Bring the screen up to date; returns the list of repainted rects ([] if
+        nothing changed). heat is an optional {(b, c): heat_level} hint overlay.
+        """
+        t0 = time.perf_counter()
+        cells = tuple(v for row in boards for v in row)
+        big = tuple(main_board)
+        tinted = frozenset(tint)
+        heat = heat or {}
+
+        if self.cells is None:
+            dirty = [self.screen.get_rect()]
+        else:
+            dirty = []
+            if cells != self.cells:
+                dirty.extend(CELL_RECTS[i] for i, (a, b) in enumerate(zip(cells, self.cells)) if a != b)
+            if big != self.big or tinted != self.tinted:
+                dirty.extend(BOARD_RECTS[b] for b in range(9)
+                             if big[b] != self.big[b] or (b in tinted) != (b in self.tinted))
+            if heat != self.heat:
+                old = self.heat
+                dirty.extend(CELL_RECTS[b * 9 + c] for (b, c) in old.keys() | heat.keys()
+                             if old.get((b, c)) != heat.get((b, c)))
+            if banner != self.banner:
+                dirty.append(BANNER_RECT)
+            if status != self.status:
+                dirty.append(STATUS_RECT)
+
+        self.cells, self.big, self.tinted, self.banner, self.status = cells, big, tinted, banner, status
+        self.heat = heat
+        if not dirty:
+            self.skipped += 1
+            return dirty
+
+        for rect in dirty:
+            self._repaint(rect)
+        self.frames += 1
+        self.frame_times.append(time.perf_counter() - t0)
+        return dirty
+
+    def _repaint(self, rect):
+        screen = self.screen
+        screen.set_clip(rect)
+        screen.blit(self.background, rect.topleft, rect)
+        cells = self.cells
+        for (b, c), level in self.heat.items():
+            r = CELL_RECTS[b * 9 + c]
+            if r.colliderect(rect):
+                screen.blit(heat_overlay(level), (r.x + HEAT_INSET, r.y + HEAT_INSET))
+        for b in range(9):
+            if not BOARD_RECTS[b].colliderect(rect):
+                continue
+            for i in range(b * 9, b * 9 + 9):
+                v = cells[i]
+                if v and CELL_RECTS[i].colliderect(rect):
+                    screen.blit(self.marks[v], CELL_RECTS[i])
+            if self.big[b]:
+                screen.blit(self.big_marks[self.big[b]], BOARD_RECTS[b])
+            if b in self.tinted:
+                screen.blit(self.tint, BOARD_RECTS[b].move(TINT_INSET, TINT_INSET))
+        if self.banner is not None and rect.colliderect(BANNER_RECT):
+            draw_banner(screen, self.banner)
+        if self.status is not None and rect.colliderect(STATUS_RECT):
+            draw_status(screen, self.status)
+        screen.set_clip(None)
+
+    def stats(self):
+        """Frames drawn and skipped, and the mean / max time of the drawn ones (ms)."""
+        times = self.frame_times
+        return {
+            "frames": self.frames,
+            "skipped": self.skipped,
+            "mean_ms": sum(times) / len(times) * 1000 if times else 0.0,
+            "max_ms": max(times) * 1000 if times else 0.0,
+        }
+
+def _draw_at(surf, draw, marks):
+    """Run a draw_* function for board 0 / cell 0 onto a sprite surface (shifted to its origin)."""
+    tmp = pygame.Surface((MARGIN + BIG_CELL, MARGIN + BIG_CELL), pygame.SRCALPHA)
+    draw(tmp, marks)
+    surf.blit(tmp, (0, 0), pygame.Rect(MARGIN, MARGIN, surf.get_width(), surf.get_height()))
+
+
+if __name__ == "__main__":
+    import os
+    import random
+    import sys
+
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import game_rules as do
+
+    # play random games drawing every frame both ways: the screens must match,
+    # then compare the time per frame (full redraw vs dirty rects vs an idle frame)
+    pygame.init()
+    screen = pygame.display.set_mode((WIDTH, HEIGHT))
+    full = pygame.Surface((WIDTH, HEIGHT))
+    renderer = Renderer(screen)
+    rng = random.Random(0)
+    t_full = t_dirty = t_idle = 0.0
+    frames = 0
+    for game in range(20):
+        s = do.new_game()
+        renderer.invalidate()
+        while True:
+            playable = [] if s.game_over else do.playable_boards_list(s)
+            banner = "X wins! Press R for menu" if s.game_over else None
+            status = None if s.game_over else "O is thinking" + "." * (1 + frames % 3)
+            heat = {} if frames % 4 else {(b, c): rng.randrange(HEAT_STEPS + 1)
+                                           for b in playable for c in range(9) if s.boards[b][c] == 0}
+
+            t0 = time.perf_counter()
+            draw_grid(full)
+            draw_heat(full, heat)
+            draw_marks(full, s.boards)
+            draw_big_marks(full, s.main_board)
+            draw_playable_tint(full, playable)
+            if banner:
+                draw_banner(full, banner)
+            if status:
+                draw_status(full, status)
+            t1 = time.perf_counter()
+            renderer.draw(s.boards, s.main_board, playable, banner, status, heat)
+            t2 = time.perf_counter()
+            renderer.draw(s.boards, s.main_board, playable, banner, status, heat)   # nothing changed
+            t3 = time.perf_counter()
+            t_full += t1 - t0
+            t_dirty += t2 - t1
+            t_idle += t3 - t2
+            frames += 1
+            assert pygame.image.tobytes(full, "RGB") == pygame.image.tobytes(screen, "RGB"), (game, len(s.move_stack))
+
+            if s.game_over:
+                break
+            moves = [(b, c) for b in playable for c in range(9) if s.boards[b][c] == 0]
+            do.apply_move(s, *rng.choice(moves), s.current_turn)
+            do.check_game_over(s)
+            if rng.random() < 0.05 and len(s.move_stack) > 1 and not s.game_over:
+                do.undo_move(s)
+
+    print(f"{frames} frames, screens identical")
+    print(f"full redraw {t_full / frames * 1000:.3f} ms/frame, dirty rects {t_dirty / frames * 1000:.3f} ms/frame, "
+          f"idle frame {t_idle / frames * 1000:.4f} ms")
+    print(renderer.stats())
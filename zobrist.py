@@ -0,0 +1,31 @@
+"""
+Zobrist keys for Super Tic-Tac-Toe positions.
+
+A position hash is the XOR of one key per occupied cell, SIDE_KEY when O is to
+move, and FORCED_KEYS[b] when play is forced into board b. game_rules keeps
+s.hash up to date on every apply_move / undo_move.
+"""
+import random
+
+_rng = random.Random(0x5EED_7AC7)
+
+# CELL_KEYS[b][c][player]: index 1 is X, index -1 (the last slot) is O
+CELL_KEYS = [[(0, _rng.getrandbits(64), _rng.getrandbits(64)) for c in range(9)] for b in range(9)]
+SIDE_KEY = _rng.getrandbits(64)
+FORCED_KEYS = [_rng.getrandbits(64) for b in range(9)]
+
+
+def forced_key(forced_board):
+    return 0 if forced_board is None else FORCED_KEYS[forced_board]
+
+def full_hash(boards, current_turn, forced_board):
+    """Hash from scratch (for setting up positions and for checking the incremental hash)."""
+    h = 0
+    for b in range(9):
+        for c in range(9):
+            v = boards[b][c]
+            if v != 0:
+                h ^= CELL_KEYS[b][c][v]
+    if current_turn == -1:
+        h ^= SIDE_KEY
+    return h ^ forced_key(forced_board)